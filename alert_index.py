@@ -0,0 +1,202 @@
+"""Area-wide NWS alert ingestion with a local spatial index.
+
+Instead of one `alerts/active?point=` poll per site, the whole area feed
+(ALERT_AREAS) is pulled once per refresh and every alert is reduced to
+polygons: its own geometry, or the geometry of its affected zones for the many
+alerts issued by zone only (zone shapes are static and cached for a week, so
+that traffic depends on the alerts, not on how many sites are watched). Zones
+are fetched concurrently within the page deadline. A zone that cannot be
+fetched falls back to the shape the previous rebuild used; failing that the
+refresh fails as a whole, so the fetchers serve their last good alerts rather
+than an alert that silently matches nothing.
+Polygons are binned on a BIN_SIZE degree grid by bounding box; matching a site
+is a dict lookup for its bin, a bounding-box check and a ray-casting test on the
+few candidate polygons. Every registered location is matched once per rebuild.
+"""
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from upstream_guard import guarded_get, set_deadline, time_left
+from memory_cache import bounded_cache
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+ALERT_AREAS = ('NC',)       # state/marine area codes pulled by each refresh
+BIN_SIZE = 0.25             # degrees per index bin
+ZONE_CACHE_ENTRIES = 1024   # forecast, county and fire zones the area feed can name
+ZONE_FETCH_WORKERS = 8
+NWS_HEADERS = {'User-Agent': '(webster_app)', 'Accept': 'application/geo+json'}
+
+
+def _polygons(geometry):
+    """[(outer ring, [holes])] as (n x 2) lon/lat arrays for a GeoJSON Polygon or MultiPolygon"""
+    if not geometry:
+        return []
+    if geometry['type'] == 'Polygon':
+        parts = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        parts = geometry['coordinates']
+    else:
+        return []
+    return [(np.asarray(rings[0], dtype=float)[:, :2], [np.asarray(r, dtype=float)[:, :2] for r in rings[1:]])
+            for rings in parts if rings]
+
+
+def _in_ring(ring, lat, lon):
+    """Ray casting: whether (lat, lon) is inside a closed lon/lat ring"""
+    x, y = ring[:, 0], ring[:, 1]
+    x2, y2 = np.roll(x, -1), np.roll(y, -1)
+    straddles = (y > lat) != (y2 > lat)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = x + (lat - y) * (x2 - x) / (y2 - y)
+    return bool(np.count_nonzero(straddles & (lon < crossing)) % 2)
+
+
+class ZoneLookupError(RuntimeError):
+    """Raised when alert zones needed for matching could not be fetched"""
+
+
+@bounded_cache(ttl=7 * 24 * 3600, max_entries=ZONE_CACHE_ENTRIES, max_bytes=32 * 1024 * 1024)
+def zone_geometry(zone_url):
+    """GeoJSON geometry of an NWS forecast/county/fire zone (static; cached for a week)"""
+    return guarded_get('nws', zone_url, headers=NWS_HEADERS).json().get('geometry')
+
+
+_zone_pool = ThreadPoolExecutor(max_workers=ZONE_FETCH_WORKERS, thread_name_prefix='alert-zone')
+
+
+def zone_geometries(urls):
+    """({url: geometry}, {url: error}) for the zones, fetched concurrently within this thread's deadline"""
+    left = time_left()
+
+    def lookup(url):
+        set_deadline(left)  # the caller's page deadline carries over to the pool thread
+        try:
+            return zone_geometry(url)
+        finally:
+            set_deadline(None)
+
+    futures = {url: _zone_pool.submit(lookup, url) for url in urls}
+    geometries, failed = {}, {}
+    for url, future in futures.items():
+        try:
+            geometries[url] = future.result()
+        except Exception as e:
+            failed[url] = e
+    return geometries, failed
+
+
+def _zone_urls(features):
+    """Affected zones of the features that have no geometry of their own, in feed order"""
+    urls = {}
+    for feature in features:
+        if not _polygons(feature.get('geometry')):
+            urls.update(dict.fromkeys(feature.get('properties', {}).get('affectedZones', [])))
+    return list(urls)
+
+
+class AlertIndex:
+    """Grid-binned polygons of the active alerts, with precomputed matches for registered locations"""
+
+    def __init__(self, bin_size=BIN_SIZE):
+        self.bin_size = bin_size
+        self._lock = threading.Lock()
+        self._locations = {}
+        self._state = {'features': [], 'polygons': [], 'bins': {}, 'matches': {}, 'zones': {}}
+
+    def _bin(self, lat, lon):
+        return int(np.floor(lat / self.bin_size)), int(np.floor(lon / self.bin_size))
+
+    def register(self, name, lat, lon):
+        """Watch a location; its matches are precomputed from the next rebuild on"""
+        with self._lock:
+            self._locations[name] = (lat, lon)
+
+    def locations(self):
+        with self._lock:
+            return dict(self._locations)
+
+    def _match(self, state, lat, lon):
+        """Indices into state['features'] of the alerts covering the point, in feed order"""
+        hits = set()
+        for polygon in state['bins'].get(self._bin(lat, lon), ()):
+            feature, (west, south, east, north), outer, holes = state['polygons'][polygon]
+            if feature in hits or not (west <= lon <= east and south <= lat <= north):
+                continue
+            if _in_ring(outer, lat, lon) and not any(_in_ring(hole, lat, lon) for hole in holes):
+                hits.add(feature)
+        return sorted(hits)
+
+    def zones(self):
+        """{url: geometry} of the zones the current index was built with"""
+        return dict(self._state['zones'])
+
+    def rebuild(self, features, zones):
+        """Index a feed's features; alerts without geometry use their zones' shapes from zones {url: geometry}"""
+        polygons = []
+        bins = {}
+        for i, feature in enumerate(features):
+            shapes = _polygons(feature.get('geometry'))
+            if not shapes:
+                for zone in feature.get('properties', {}).get('affectedZones', []):
+                    shapes.extend(_polygons(zones.get(zone)))
+            for outer, holes in shapes:
+                (west, south), (east, north) = outer.min(axis=0), outer.max(axis=0)
+                (row0, col0), (row1, col1) = self._bin(south, west), self._bin(north, east)
+                for row in range(row0, row1 + 1):
+                    for col in range(col0, col1 + 1):
+                        bins.setdefault((row, col), []).append(len(polygons))
+                polygons.append((i, (west, south, east, north), outer, holes))
+
+        state = {'features': features, 'polygons': polygons, 'bins': bins, 'zones': zones}
+        state['matches'] = {name: self._match(state, lat, lon) for name, (lat, lon) in self.locations().items()}
+        with self._lock:
+            self._state = state
+
+    def alerts_at(self, lat, lon):
+        """Active alert features covering any point (not only registered ones)"""
+        state = self._state
+        return [state['features'][i] for i in self._match(state, lat, lon)]
+
+    def alerts_for(self, name):
+        """Active alert features for a registered location"""
+        state = self._state
+        matches = state['matches'].get(name)
+        if matches is None:
+            # Registered since the last rebuild
+            matches = self._match(state, *self.locations()[name])
+        return [state['features'][i] for i in matches]
+
+
+alert_index = AlertIndex()
+
+
+def register_location(name, lat, lon):
+    alert_index.register(name, lat, lon)
+
+
+def refresh_alert_index():
+    """Pull the area feed once and rebuild the index; returns the number of alerts in the feed.
+
+    Raises ZoneLookupError, leaving the previous index in place, when a zone some
+    alert depends on can be neither fetched nor taken from the previous index.
+    """
+    feed = guarded_get('nws', "https://api.weather.gov/alerts/active",
+                       params={'area': ','.join(ALERT_AREAS)}, headers=NWS_HEADERS).json()
+    features = feed.get('features', [])
+
+    zones, failed = zone_geometries(_zone_urls(features))
+    known = alert_index.zones()
+    for url in [url for url in failed if url in known]:
+        logger.warning("Alert zone %s unavailable (%s); using its previous shape", url, failed.pop(url))
+        zones[url] = known[url]
+    if failed:
+        url, error = next(iter(failed.items()))
+        raise ZoneLookupError(f"{len(failed)} alert zone(s) unavailable, e.g. {url}: {error}")
+
+    alert_index.rebuild(features, zones)
+    return len(features)
@@ -0,0 +1,71 @@
+"""Upstream request budget for Open-Meteo and api.weather.gov.
+
+Counts every HTTP call per upstream per day (US/Eastern calendar day) so the
+adaptive refresh intervals in cache_refresh can stay inside the daily quota.
+"""
+import os
+import threading
+
+import pandas as pd
+
+# --- CONFIGURATION ---
+# Open-Meteo's free tier allows 10,000 calls/day across all of its endpoints
+DAILY_QUOTAS = {
+    'open-meteo': int(os.environ.get("SNOW_OPEN_METEO_QUOTA", "10000")),
+    'nws': int(os.environ.get("SNOW_NWS_QUOTA", "5000"))
+}
+# Share of the quota the adaptive refresher may plan to spend; the rest is headroom
+# for manual refreshes, the JSON API and restarts.
+PLANNING_SHARE = 0.8
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised instead of calling an upstream whose daily quota is used up"""
+
+
+class UpstreamBudget:
+    """Thread-safe per-upstream daily call counter"""
+
+    def __init__(self, quotas=DAILY_QUOTAS):
+        self.quotas = dict(quotas)
+        self._lock = threading.Lock()
+        self._day = None
+        self._counts = {}
+
+    def _roll_day(self):
+        today = pd.Timestamp.now(tz='US/Eastern').strftime('%Y-%m-%d')
+        if today != self._day:
+            self._day = today
+            self._counts = {name: 0 for name in self.quotas}
+
+    def count(self, upstream, calls=1):
+        """Reserve calls against the upstream's quota, raising if they don't fit"""
+        with self._lock:
+            self._roll_day()
+            used = self._counts.get(upstream, 0)
+            if used + calls > self.quotas.get(upstream, float('inf')):
+                raise BudgetExceeded(f"daily {upstream} quota of {self.quotas[upstream]} calls used")
+            self._counts[upstream] = used + calls
+
+    def used(self, upstream):
+        with self._lock:
+            self._roll_day()
+            return self._counts.get(upstream, 0)
+
+    def remaining(self, upstream):
+        return max(self.quotas.get(upstream, 0) - self.used(upstream), 0)
+
+    def report(self):
+        """{upstream: {'used', 'quota', 'remaining'}} for display"""
+        return {
+            name: {'used': self.used(name), 'quota': quota, 'remaining': self.remaining(name)}
+            for name, quota in self.quotas.items()
+        }
+
+
+def seconds_left_today():
+    now = pd.Timestamp.now(tz='US/Eastern')
+    return max((now.normalize() + pd.Timedelta(days=1) - now).total_seconds(), 1)
+
+
+budget = UpstreamBudget()
@@ -0,0 +1,212 @@
+"""Targeted cache invalidation and adaptive refresh for the dashboard's data sources.
+
+Replaces the global st.cache_data.clear() behind "Refresh Data": each source is
+cleared on its own (per location and call arguments), only when its cached copy
+is old enough to possibly be stale, and refreshes are rate limited per session
+and for the whole process so a single viewer cannot trigger a refetch storm.
+
+apply_adaptive_ttls() shortens each source's refresh interval while it is
+snowing or winter alerts are active and lengthens it in clear weather, scaled
+so the planned calls fit the daily upstream quota tracked in api_budget.
+"""
+import importlib
+import math
+import threading
+import time
+
+from api_budget import budget, seconds_left_today, PLANNING_SHARE
+from weather_data import (
+    get_nws_alerts, get_current_conditions, get_model_run, source_age, MODEL_RUNS, MODEL_RUN_POLL
+)
+
+# --- CONFIGURATION ---
+SESSION_REFRESH_COOLDOWN = 30  # seconds between refreshes from one browser session
+GLOBAL_REFRESH_INTERVAL = 10   # seconds between refresh rounds across all sessions
+
+# min_age: cached data younger than this cannot have changed upstream in a useful way
+# calls: upstream requests per fetch, ttls: refresh interval (s) per weather regime
+# run_model: model payloads refresh when a new run is published, not on a TTL
+# func and point-list calls are "module.name" paths, imported on first use so the
+# dashboard's sidebar does not load every feature module before the page paints
+SOURCES = {
+    'alerts': {'label': "NWS Alerts", 'func': 'weather_data.fetch_nws_alerts', 'args': (), 'min_age': 60,
+               'upstream': 'nws', 'calls': 1, 'ttls': {'storm': 120, 'normal': 300, 'calm': 900}},
+    'current': {'label': "Current Conditions", 'func': 'weather_data.fetch_current_conditions', 'args': (), 'min_age': 60,
+                'upstream': 'open-meteo', 'calls': 1, 'ttls': {'storm': 120, 'normal': 300, 'calm': 900}},
+    'ecmwf': {'label': "ECMWF Forecast", 'func': 'weather_data.fetch_euro_snow_ice', 'args': (), 'min_age': 300,
+              'upstream': 'open-meteo', 'calls': 2, 'run_model': 'ecmwf'},
+    'gfs': {'label': "GFS Forecast", 'func': 'weather_data.fetch_gfs_forecast', 'args': (), 'min_age': 300,
+            'upstream': 'open-meteo', 'calls': 1, 'run_model': 'gfs'},
+    'corridors': {'label': "Road Corridors", 'func': 'road_corridors.fetch_corridor_forecast', 'args': (), 'min_age': 300,
+                  'upstream': 'open-meteo', 'calls': 'road_corridors.POINTS', 'run_model': 'ecmwf'},
+    'grid': {'label': "County Snow Grid", 'func': 'snow_grid.fetch_snow_grid', 'args': (), 'min_age': 300,
+             'upstream': 'open-meteo', 'calls': 'snow_grid.POINTS', 'run_model': 'ecmwf'},
+    'history': {'label': "Historical (7 days)", 'func': 'weather_data.fetch_historical_snow', 'args': (7,), 'min_age': 900,
+                'upstream': 'open-meteo', 'calls': 1, 'ttls': {'storm': 1800, 'normal': 1800, 'calm': 3600}},
+    'observations': {'label': "NWS Station Observations", 'func': 'station_observations.fetch_station_observations', 'args': (), 'min_age': 300,
+                     'upstream': 'nws', 'calls': 'station_observations.STATION_COUNT', 'ttls': {'storm': 600, 'normal': 1800, 'calm': 3600}},
+    'season': {'label': "Season Observations", 'func': 'storm_events.get_season_observations', 'args': (), 'min_age': 3600,
+               'upstream': 'open-meteo', 'calls': 1, 'ttls': {'storm': 3 * 3600, 'normal': 6 * 3600, 'calm': 6 * 3600}}
+}
+
+WINTER_ALERT_WORDS = ("Winter", "Ice", "Snow", "Freez", "Blizzard", "Wind Chill")
+CLEAR_WEATHER_CODES = (0, 1, 2)
+
+_global_lock = threading.Lock()
+_last_global_refresh = 0.0
+
+
+def resolve(path):
+    """The attribute at a "module.name" path, importing its module if needed"""
+    module, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def source_calls(name):
+    """Upstream requests per fetch of a source (one per point for the point-list sources)"""
+    calls = SOURCES[name]['calls']
+    if isinstance(calls, str):
+        calls = resolve(calls)
+    return calls if isinstance(calls, int) else len(calls)
+
+
+def stale_sources(names=None):
+    """Sources whose cached copy is older than their min_age (or missing)"""
+    stale = []
+    for name in names or SOURCES:
+        source = SOURCES[name]
+        age = source_age(name, *source['args'])
+        if age is None or age >= source['min_age']:
+            stale.append(name)
+    return stale
+
+
+def invalidate_source(name):
+    """Drop the cached entry for one source and call signature only"""
+    source = SOURCES[name]
+    if 'run_model' in source:
+        # Re-check which run is published; the payload refetches only if it changed
+        get_model_run.clear(source['run_model'])
+    else:
+        resolve(source['func']).clear(*source['args'])
+
+
+def request_refresh(session_state, names=None, now=None):
+    """Revalidate the stale sources among `names`, subject to the rate limits.
+
+    Returns a report dict with 'refreshed', 'checked' (run-driven sources whose
+    published run was re-checked; their payload refetches only for a new run),
+    'fresh' (skipped as still current) and 'retry_in' (seconds until allowed
+    again, 0 when the refresh ran).
+    """
+    global _last_global_refresh
+    now = time.time() if now is None else now
+    names = list(names or SOURCES)
+    report = {'refreshed': [], 'checked': [], 'fresh': [], 'retry_in': 0}
+
+    session_wait = SESSION_REFRESH_COOLDOWN - (now - session_state.get('last_refresh_at', 0))
+    if session_wait > 0:
+        report['retry_in'] = int(session_wait) + 1
+        return report
+
+    with _global_lock:
+        global_wait = GLOBAL_REFRESH_INTERVAL - (now - _last_global_refresh)
+        if global_wait > 0:
+            report['retry_in'] = int(global_wait) + 1
+            return report
+
+        stale = stale_sources(names)
+        for name in stale:
+            invalidate_source(name)
+        if stale:
+            _last_global_refresh = now
+
+    session_state['last_refresh_at'] = now
+    report['refreshed'] = [name for name in stale if 'run_model' not in SOURCES[name]]
+    report['checked'] = [name for name in stale if 'run_model' in SOURCES[name]]
+    report['fresh'] = [name for name in names if name not in stale]
+    return report
+
+
+def describe_refresh(report):
+    """One-line sidebar summary of a refresh report"""
+    if report['retry_in']:
+        return f"⏳ Refresh available in {report['retry_in']}s"
+    parts = []
+    if report['refreshed']:
+        parts.append("Refreshed: " + ", ".join(SOURCES[n]['label'] for n in report['refreshed']))
+    if report['checked']:
+        parts.append("Checked for new run: " + ", ".join(SOURCES[n]['label'] for n in report['checked']))
+    if report['fresh']:
+        parts.append("Already current: " + ", ".join(
+            f"{SOURCES[n]['label']} ({int(source_age(n, *SOURCES[n]['args']) or 0) // 60} min old)"
+            for n in report['fresh']
+        ))
+    return " | ".join(parts) or "Nothing to refresh"
+
+
+# --- ADAPTIVE TTLS ---
+def weather_regime(current, alerts):
+    """'storm' while snowing/icing or under a winter alert, 'calm' in clear dry weather"""
+    current = current or {}
+    winter_alert = any(
+        any(word in alert.get('properties', {}).get('event', '') for word in WINTER_ALERT_WORDS)
+        for alert in alerts or []
+    )
+    temperature = current.get('temperature_2m')
+    freezing_precip = (current.get('precipitation') or 0) > 0 and temperature is not None and temperature <= 34
+    if winter_alert or (current.get('snowfall') or 0) > 0 or freezing_precip:
+        return 'storm'
+    if current.get('weather_code') in CLEAR_WEATHER_CODES and not current.get('precipitation'):
+        return 'calm'
+    return 'normal'
+
+
+def run_model_calls(upstream, left):
+    """Calls the run-driven sources of an upstream will make in the next `left` seconds.
+
+    These are not stretched by a TTL: every published run is fetched once, and each
+    model's metadata is polled every MODEL_RUN_POLL seconds to notice new runs.
+    """
+    names = [name for name, source in SOURCES.items() if 'run_model' in source and source['upstream'] == upstream]
+    models = {SOURCES[name]['run_model'] for name in names}
+    runs = {model: math.ceil(left * len(MODEL_RUNS[model]['cycles']) / 86400) for model in models}
+    polls = sum(math.ceil(left / MODEL_RUN_POLL) for _ in models)
+    return sum(runs[SOURCES[name]['run_model']] * source_calls(name) for name in names) + polls
+
+
+def active_ttls(regime):
+    """Refresh interval per TTL-driven source for the regime, stretched to fit each upstream's remaining quota.
+
+    The run-driven sources' calls are planned first; the TTL sources share what is left.
+    """
+    ttls = {name: source['ttls'][regime] for name, source in SOURCES.items() if 'ttls' in source}
+    left = seconds_left_today()
+
+    for upstream in {SOURCES[name]['upstream'] for name in ttls}:
+        names = [name for name in ttls if SOURCES[name]['upstream'] == upstream]
+        planned = sum(left / ttls[name] * source_calls(name) for name in names)
+        allowed = (budget.remaining(upstream) - budget.quotas[upstream] * (1 - PLANNING_SHARE)
+                   - run_model_calls(upstream, left))
+        if allowed < 1:
+            for name in names:
+                ttls[name] = float('inf')  # hold cached data until the quota resets
+        elif planned > allowed:
+            scale = planned / allowed
+            for name in names:
+                ttls[name] = ttls[name] * scale
+    return ttls
+
+
+def apply_adaptive_ttls():
+    """Clear every source whose age has passed its active TTL; returns (regime, ttls, cleared)"""
+    regime = weather_regime(get_current_conditions(), get_nws_alerts())
+    ttls = active_ttls(regime)
+    cleared = []
+    for name, ttl in ttls.items():
+        source = SOURCES[name]
+        age = source_age(name, *source['args'])
+        if age is not None and age >= ttl:
+            invalidate_source(name)
+            cleared.append(name)
+    return regime, ttls, cleared
@@ -0,0 +1,281 @@
+"""Process-pool offload for CPU-heavy analytics.
+
+Streamlit runs every session's script in a thread of one server process, so a
+long numpy pass holds the GIL against every other session's rerun. compute()
+sends such jobs to a small pool of worker processes instead. Input arrays go
+through multiprocessing shared memory (the worker maps them, nothing large is
+pickled) and result arrays come back the same way. Each result is cached by the
+caller's input version (e.g. the model run the arrays came from), so reruns on
+the same data skip the work entirely. Jobs smaller than MIN_OFFLOAD_ELEMENTS run
+inline, where the hand-off would cost more than the work; with no pool
+(SNOW_COMPUTE_WORKERS=0, or the pool broke) everything runs inline. A worker
+names its result segments after the job, so the segments of a job the parent
+gave up on (timeout, dead worker) are found and unlinked once it ends.
+"""
+import io
+import os
+import logging
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import spawn, util, popen_spawn_posix
+from multiprocessing.context import reduction, set_spawning_popen
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from memory_cache import bounded_cache
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+COMPUTE_WORKERS = int(os.environ.get("SNOW_COMPUTE_WORKERS", str(min(2, os.cpu_count() or 1))))
+MIN_OFFLOAD_ELEMENTS = 50_000   # input elements below which a job runs inline (~400 KB of float64)
+JOB_TIMEOUT = 60                # seconds before giving up on a worker and computing inline
+WARM_MODULES = ('precip_type', 'power_risk', 'snow_grid')  # job modules imported by each worker at start
+SHM_DIR = '/dev/shm'            # where POSIX shared memory segments are listed
+
+# A numeric array living in a shared memory segment
+_Shared = namedtuple('_Shared', 'name shape dtype')
+
+_SPAWN = multiprocessing.get_context('spawn')
+WORKER_NAME = 'snow-compute-'
+_job_ids = itertools.count()
+
+
+class _WorkerPopen(popen_spawn_posix.Popen):
+    """spawn's launcher, leaving the parent's __main__ out of the child's start-up data.
+
+    Streamlit executes the script as sys.modules['__main__'] and a spawned child
+    re-imports __main__ from its file, so a worker would run the whole page. The
+    workers keep the __main__ of spawn's own bootstrap instead; their job modules
+    are imported by name when the jobs are unpickled. This is
+    popen_spawn_posix.Popen._launch with only the preparation data changed, so
+    nothing outside this pool is affected.
+    """
+
+    def _launch(self, process_obj):
+        from multiprocessing import resource_tracker
+        tracker_fd = resource_tracker.getfd()
+        self._fds.append(tracker_fd)
+        prep_data = spawn.get_preparation_data(process_obj._name)
+        prep_data.pop('init_main_from_name', None)
+        prep_data.pop('init_main_from_path', None)
+        fp = io.BytesIO()
+        set_spawning_popen(self)
+        try:
+            reduction.dump(prep_data, fp)
+            reduction.dump(process_obj, fp)
+        finally:
+            set_spawning_popen(None)
+
+        parent_r = child_w = child_r = parent_w = None
+        try:
+            parent_r, child_w = os.pipe()
+            child_r, parent_w = os.pipe()
+            cmd = spawn.get_command_line(tracker_fd=tracker_fd, pipe_handle=child_r)
+            self._fds.extend([child_r, child_w])
+            self.pid = util.spawnv_passfds(spawn.get_executable(), cmd, self._fds)
+            self.sentinel = parent_r
+            with open(parent_w, 'wb', closefd=False) as f:
+                f.write(fp.getbuffer())
+        finally:
+            self.finalizer = util.Finalize(self, util.close_fds, [fd for fd in (parent_r, parent_w) if fd is not None])
+            for fd in (child_r, child_w):
+                if fd is not None:
+                    os.close(fd)
+
+
+class _ScriptSafeProcess(_SPAWN.Process):
+    """Spawned worker that does not re-run the Streamlit script (see _WorkerPopen)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = WORKER_NAME + self.name.rsplit('-', 1)[-1]
+
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class _ScriptSafeContext(type(_SPAWN)):
+    Process = _ScriptSafeProcess
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_failed = False
+_inputs = {}
+
+
+def _export(array, name=None):
+    """Copy an array into a new shared memory segment; returns (segment, descriptor)"""
+    array = np.ascontiguousarray(array)
+    segment = shared_memory.SharedMemory(name=name, create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    return segment, _Shared(segment.name, array.shape, array.dtype.str)
+
+
+def _attach(shared):
+    """(segment, array view) for a descriptor created in another process"""
+    # Spawned workers share the parent's resource tracker, which keeps a set of names:
+    # attaching re-registers a name harmlessly and the creator's unlink() unregisters it
+    segment = shared_memory.SharedMemory(name=shared.name)
+    return segment, np.ndarray(shared.shape, dtype=shared.dtype, buffer=segment.buf)
+
+
+def _pack(value, names):
+    """Worker side: move the result's arrays into shared memory (segments named from `names`), left for the parent"""
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        segment, shared = _export(value, next(names))
+        segment.close()
+        return shared
+    if isinstance(value, tuple):
+        return tuple(_pack(v, names) for v in value)
+    if isinstance(value, dict):
+        return {k: _pack(v, names) for k, v in value.items()}
+    return value
+
+
+def _unpack(value):
+    """Parent side: copy result arrays out of shared memory and free the segments"""
+    if isinstance(value, _Shared):
+        segment = shared_memory.SharedMemory(name=value.name)
+        try:
+            return np.ndarray(value.shape, dtype=value.dtype, buffer=segment.buf).copy()
+        finally:
+            segment.close()
+            segment.unlink()
+    if isinstance(value, tuple):
+        return tuple(_unpack(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _unpack(v) for k, v in value.items()}
+    return value
+
+
+def _discard_job(job):
+    """Unlink any result segments of a job the parent gave up on"""
+    try:
+        names = [name for name in os.listdir(SHM_DIR) if name.startswith(job + '_')]
+    except OSError:
+        return
+    for name in names:
+        try:
+            segment = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        segment.close()
+        segment.unlink()
+
+
+def _run_job(func, shared, params, job):
+    """Worker entry point: map the inputs, run the job, hand the result back through shared memory"""
+    segments = []
+    arrays = {}
+    try:
+        for key, descriptor in shared.items():
+            segment, arrays[key] = _attach(descriptor)
+            segments.append(segment)
+        result = _pack(func(**arrays, **params), (f"{job}_{i}" for i in itertools.count()))
+    finally:
+        arrays.clear()
+        for segment in segments:
+            segment.close()
+    return result
+
+
+def _warm(modules):
+    for module in modules:
+        __import__(module)
+    return os.getpid()
+
+
+def _get_pool():
+    global _pool, _pool_failed
+    with _lock:
+        # Workers (and anything else started by multiprocessing) compute inline, never nesting pools
+        if _pool is None and not _pool_failed and COMPUTE_WORKERS > 0 and multiprocessing.parent_process() is None:
+            try:
+                # spawn, not fork: the server process has threads (sessions, fetch pools) mid-flight
+                pool = ProcessPoolExecutor(max_workers=COMPUTE_WORKERS, mp_context=_ScriptSafeContext())
+                for _ in range(COMPUTE_WORKERS):
+                    pool.submit(_warm, WARM_MODULES)
+                _pool = pool
+            except Exception as e:
+                logger.warning("Compute pool could not start (%s); computing inline", e)
+                _pool_failed = True
+        return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def start_compute_pool():
+    """Start the worker processes (importing the job modules) now, not on the first heavy rerun"""
+    return _get_pool()
+
+
+def _execute(func, arrays, params):
+    """Run one job in the pool (inline when small or when there is no working pool)"""
+    pool = _get_pool()
+    if pool is None or sum(a.size for a in arrays.values()) < MIN_OFFLOAD_ELEMENTS:
+        return func(**arrays, **params)
+
+    exported = []
+    try:
+        shared = {}
+        for key, array in arrays.items():
+            segment, shared[key] = _export(array)
+            exported.append(segment)
+        job = f"snow{os.getpid():x}j{next(_job_ids):x}"
+        future = pool.submit(_run_job, func, shared, params, job)
+        try:
+            packed = future.result(timeout=JOB_TIMEOUT)
+        except (TimeoutError, BrokenProcessPool) as e:
+            # The pool, not the job, failed (a job's own exception propagates as is)
+            logger.warning("Compute pool unavailable (%r); running %s inline", e, func.__name__)
+            # Whatever result the worker still writes (or wrote before dying) is never unpacked
+            future.add_done_callback(lambda _: _discard_job(job))
+            _reset_pool(pool)
+            return func(**arrays, **params)
+        return _unpack(packed)
+    finally:
+        for segment in exported:
+            segment.close()
+            segment.unlink()
+
+
+@bounded_cache(ttl=6 * 3600, max_entries=64, max_bytes=16 * 1024 * 1024)
+def compute_result(func, version, params):
+    return _execute(func, _inputs[(func, version, params)], dict(params))
+
+
+def compute(func, version=None, **kwargs):
+    """func(**kwargs), with numeric array arguments shared with a worker process instead of pickled.
+
+    func must be a module-level function returning arrays (or tuples/dicts of them).
+    version identifies the inputs (e.g. ('corridors', model_run)); results are cached
+    per (func, version, non-array arguments), so the same version must always mean the
+    same arrays. With version=None nothing is cached.
+    """
+    arrays = {k: v for k, v in kwargs.items() if isinstance(v, np.ndarray) and not v.dtype.hasobject}
+    params = {k: v for k, v in kwargs.items() if k not in arrays}
+    if version is None:
+        return _execute(func, arrays, params)
+
+    key = (func, version, tuple(sorted(params.items())))
+    # Inputs reach the cached call out of band: arrays are neither hashable nor part of the key
+    _inputs[key] = arrays
+    try:
+        return compute_result(*key)
+    finally:
+        if _inputs.get(key) is arrays:
+            del _inputs[key]
@@ -0,0 +1,66 @@
+"""Shape-preserving downsampling for long hourly series.
+
+Largest-Triangle-Three-Buckets (LTTB) keeps the points that carry the visual
+shape of a line (peaks, troughs, onsets) while cutting a season of hourly data
+down to what a chart can draw interactively. The dashboard downsamples only the
+visible time window, so narrowing the window brings back full hourly detail.
+"""
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+MAX_CHART_POINTS = 2000  # per trace; WebGL handles more, but the browser payload grows
+
+
+def lttb(x, y, threshold):
+    """Indices of the `threshold` points LTTB keeps from (x, y); x must be increasing"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket edges for the n-2 interior points; first and last points are always kept
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype(int)
+    edges[-1] = n - 1
+    y_filled = np.nan_to_num(y)
+    counts = np.diff(edges)
+    bucket_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    bucket_y = np.add.reduceat(y_filled[:-1], edges[:-1]) / counts
+    # The bucket after the last interior one is just the final point
+    next_x = np.append(bucket_x[1:], x[-1])
+    next_y = np.append(bucket_y[1:], y_filled[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y_filled[start:end] - y_filled[a])
+                      - (x[a] - x[start:end]) * (next_y[i] - y_filled[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def visible_window(df, time_column, window):
+    """Rows of df whose time falls inside window=(start, end); None means all rows"""
+    if window is None:
+        return df
+    start, end = window
+    times = df[time_column]
+    return df[(times >= start) & (times <= end)]
+
+
+def downsample_series(df, time_column, columns, window=None, max_points=MAX_CHART_POINTS):
+    """{column: (times, values)} for each column, LTTB-downsampled inside the visible window"""
+    df = visible_window(df, time_column, window)
+    times = df[time_column]
+    x = (times - pd.Timestamp(0, tz=times.dt.tz)) / pd.Timedelta(seconds=1) if len(df) else times
+    series = {}
+    for column in columns:
+        values = df[column].to_numpy(dtype=float)
+        keep = lttb(x, values, max_points)
+        series[column] = (times.iloc[keep], values[keep])
+    return series
@@ -0,0 +1,93 @@
+"""Declarative registry of the model fields each view consumes.
+
+Every view (dashboard tab, derived product, JSON API, kiosk snapshot) lists
+the ECMWF/GFS hourly and daily variables it reads. A process activates the
+views it actually serves, and the fetch layer requests only the union of the
+active views' fields. When a view is activated after a model run was already
+fetched, weather_data fetches just the missing variables and merges them into
+the cached record instead of refetching the run.
+"""
+import threading
+
+from precip_type import PROFILE_FIELDS
+
+# view -> {model: {'hourly': fields, 'daily': fields}}; 'corridors' is the road corridor point set
+# and 'grid' the county snow grid
+VIEW_FIELDS = {
+    # calculate_ice_accumulation (precip type from the pressure-level profile); also feeds
+    # the travel status and the ice tab
+    'ice': {'ecmwf': {'hourly': ('temperature_2m', 'precipitation', 'snowfall') + PROFILE_FIELDS}},
+    'travel': {'ecmwf': {'daily': ('snowfall_sum', 'temperature_2m_min')}},
+    'forecast': {'ecmwf': {
+        'hourly': ('temperature_2m', 'apparent_temperature', 'weather_code', 'precipitation', 'rain', 'snowfall')
+        + PROFILE_FIELDS,
+        'daily': ('temperature_2m_max', 'temperature_2m_min')
+    }},
+    'weather': {'ecmwf': {
+        'hourly': ('temperature_2m', 'apparent_temperature', 'weather_code', 'rain', 'precipitation_probability',
+                   'wind_speed_10m', 'wind_direction_10m', 'relative_humidity_2m', 'cloud_cover'),
+        'daily': ('temperature_2m_max', 'temperature_2m_min', 'rain_sum', 'wind_speed_10m_max', 'sunrise', 'sunset')
+    }},
+    'comparison': {'ecmwf': {'daily': ('snowfall_sum',)}, 'gfs': {'daily': ('snowfall_sum',)}},
+    'extended': {'gfs': {'hourly': ('temperature_2m', 'precipitation', 'snowfall')}},
+    # storm_analogs: the forecast storm's hourly evolution, matched against past storms
+    'similar_storms': {'ecmwf': {'hourly': ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m')}},
+    # road_corridors: per-point hourly forecast along the main routes
+    'roads': {'corridors': {
+        'hourly': ('temperature_2m', 'precipitation', 'snowfall', 'wind_gusts_10m', 'visibility') + PROFILE_FIELDS
+    }},
+    # power_risk: ice accretion with concurrent wind at Webster and along the corridors
+    'power': {
+        'ecmwf': {'hourly': ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m') + PROFILE_FIELDS},
+        'corridors': {'hourly': ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m') + PROFILE_FIELDS}
+    },
+    # watch_rules: threshold watches at Webster (incl. today's travel status) and the corridor waypoints;
+    # activated by the first evaluation with rules registered
+    'watch': {
+        'ecmwf': {'hourly': ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m') + PROFILE_FIELDS,
+                  'daily': ('snowfall_sum', 'temperature_2m_min')},
+        'corridors': {'hourly': ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m') + PROFILE_FIELDS}
+    },
+    # snow_grid: county-wide snowfall and ice map
+    'snow_grid': {'grid': {'hourly': ('temperature_2m', 'precipitation', 'snowfall')}},
+    'snapshot': {'ecmwf': {'daily': ('snowfall_sum', 'temperature_2m_max', 'temperature_2m_min')}},
+    # forecast/hourly and forecast/daily are published as-is; keep their documented fields
+    'api_forecast': {'ecmwf': {
+        'hourly': ('temperature_2m', 'precipitation', 'rain', 'snowfall', 'weather_code', 'apparent_temperature',
+                   'wind_speed_10m', 'wind_direction_10m', 'relative_humidity_2m', 'cloud_cover', 'visibility',
+                   'precipitation_probability'),
+        'daily': ('snowfall_sum', 'rain_sum', 'temperature_2m_max', 'temperature_2m_min', 'precipitation_sum',
+                  'sunrise', 'sunset', 'wind_speed_10m_max')
+    }},
+}
+
+DASHBOARD_VIEWS = ('ice', 'travel', 'forecast', 'weather', 'comparison', 'extended', 'similar_storms', 'roads', 'power',
+                   'snow_grid')
+PRODUCT_VIEWS = ('ice', 'travel')  # what get_products() derives, whoever calls it
+
+_lock = threading.Lock()
+_active = set()
+
+
+def activate(*views):
+    """Mark views as consumers in this process; returns True if any was newly activated"""
+    unknown = set(views) - set(VIEW_FIELDS)
+    if unknown:
+        raise KeyError(f"unknown views {sorted(unknown)}")
+    with _lock:
+        added = set(views) - _active
+        _active.update(added)
+    return bool(added)
+
+
+def requested_fields(model, section):
+    """Sorted union of the active views' fields for a model section ('hourly' or 'daily')"""
+    with _lock:
+        views = list(_active)
+    return sorted({field for view in views for field in VIEW_FIELDS[view].get(model, {}).get(section, ())})
+
+
+def missing_fields(model, section, payload):
+    """Requested fields that a cached payload (dict of field -> values) does not have yet"""
+    have = set(payload or {})
+    return [field for field in requested_fields(model, section) if field not in have]
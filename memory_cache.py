@@ -0,0 +1,207 @@
+"""Bounded, memory-accounted function caches.
+
+Drop-in replacement for the @st.cache_data decorators on the fetchers. Like
+st.cache_data, values are stored pickled and each hit returns a fresh copy, but
+every entry's pickled size is counted. Each function has an entry and byte budget,
+and the process has a global byte budget. The least recently used entries are
+evicted first, and expired entries are dropped on access and on insert. cache_stats() reports
+bytes, entries, hits, misses and evictions, so memory stays flat however many
+locations or arguments a long-running process sees.
+"""
+import os
+import time
+import logging
+import pickle
+import threading
+import functools
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+GLOBAL_MAX_BYTES = int(os.environ.get("SNOW_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+_registry = []
+_global_lock = threading.RLock()
+_access_clock = 0
+
+
+def _tick():
+    global _access_clock
+    _access_clock += 1
+    return _access_clock
+
+
+class _Entry:
+    __slots__ = ('blob', 'size', 'expires_at', 'last_access')
+
+    def __init__(self, blob, expires_at):
+        self.blob = blob
+        self.size = len(blob)
+        self.expires_at = expires_at
+        self.last_access = _tick()
+
+
+class BoundedCache:
+    """LRU + TTL cache for one function, with per-function and global byte budgets"""
+
+    def __init__(self, func, ttl=None, max_entries=32, max_bytes=8 * 1024 * 1024):
+        self.func = func
+        self.name = func.__name__
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.oversize = 0
+        functools.update_wrapper(self, func)
+        with _global_lock:
+            _registry.append(self)
+
+    @staticmethod
+    def _key(args, kwargs):
+        return args + tuple(sorted(kwargs.items()))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def _lookup(self, key):
+        with _global_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                return None
+            entry.last_access = _tick()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.blob
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args, kwargs)
+        blob = self._lookup(key)
+        if blob is not None:
+            return pickle.loads(blob)
+
+        # One caller computes a missing key; concurrent callers wait for its result
+        with _global_lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                blob = self._lookup(key)
+                if blob is None:
+                    with _global_lock:
+                        self.misses += 1
+                    value = self.func(*args, **kwargs)
+                    self._store(key, value)
+        finally:
+            # Also when func raised; and never a newer caller's lock for the same key
+            with _global_lock:
+                if self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+        return value if blob is None else pickle.loads(blob)
+
+    def put(self, value, *args, **kwargs):
+        """Replace the cached value for the given arguments (e.g. after merging in more data)"""
+        self._store(self._key(args, kwargs), value)
+
+    def _store(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with _global_lock:
+            if len(blob) > self.max_bytes:
+                # Never cache something bigger than the whole budget; it is refetched on every call
+                if not self.oversize:
+                    logger.warning("%s result of %d bytes exceeds its %d byte cache budget; not cached",
+                                   self.name, len(blob), self.max_bytes)
+                self.oversize += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+            self._entries[key] = _Entry(blob, expires_at)
+            self.bytes += len(blob)
+            self._purge_expired()
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._evict_lru()
+            _enforce_global_budget()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at <= now]:
+            self._drop(key)
+            self.expirations += 1
+
+    def _evict_lru(self):
+        key = next(iter(self._entries))
+        self._drop(key)
+        self.evictions += 1
+
+    def clear(self, *args, **kwargs):
+        """Clear every entry, or only the entry for the given arguments"""
+        with _global_lock:
+            if args or kwargs:
+                key = self._key(args, kwargs)
+                if key in self._entries:
+                    self._drop(key)
+            else:
+                self._entries.clear()
+                self.bytes = 0
+
+    def stats(self):
+        with _global_lock:
+            return {
+                'function': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'oversize': self.oversize
+            }
+
+
+def _enforce_global_budget():
+    """Evict the globally least recently used entries until under GLOBAL_MAX_BYTES"""
+    while sum(cache.bytes for cache in _registry) > GLOBAL_MAX_BYTES:
+        candidates = [cache for cache in _registry if cache._entries]
+        if not candidates:
+            return
+        oldest = min(candidates, key=lambda cache: next(iter(cache._entries.values())).last_access)
+        oldest._evict_lru()
+
+
+def bounded_cache(ttl=None, max_entries=32, max_bytes=8 * 1024 * 1024):
+    """Decorator: @bounded_cache(ttl=300, max_entries=4, max_bytes=2 * 1024 * 1024)"""
+    def decorate(func):
+        return BoundedCache(func, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    return decorate
+
+
+def cache_stats():
+    """Per-function stats plus a 'total' row"""
+    with _global_lock:
+        rows = [cache.stats() for cache in _registry]
+    total = {
+        'function': 'total',
+        'entries': sum(r['entries'] for r in rows),
+        'max_entries': sum(r['max_entries'] for r in rows),
+        'bytes': sum(r['bytes'] for r in rows),
+        'max_bytes': GLOBAL_MAX_BYTES,
+        'hits': sum(r['hits'] for r in rows),
+        'misses': sum(r['misses'] for r in rows),
+        'evictions': sum(r['evictions'] for r in rows),
+        'expirations': sum(r['expirations'] for r in rows),
+        'oversize': sum(r['oversize'] for r in rows)
+    }
+    return rows + [total]
@@ -0,0 +1,200 @@
+"""Compact columnar binary encoding for fetched payloads.
+
+Open-Meteo payloads are mostly long numeric lists (one per hourly or daily
+variable) plus an ISO time axis. Stored as JSON, every reload re-parses each
+number from text. Here every such list becomes a raw little-endian column:
+int16 fixed point at the values' own decimal precision when it fits (most
+weather variables), else float32 when the values survive that round trip
+(float64 otherwise), int16/int32 for integer codes, and time axes as an
+epoch-hour start and step (or int32 hour offsets when irregular). The rest of
+the payload (scalars, short lists, text such as alert features) is a small
+zlib-compressed JSON skeleton with references to the columns.
+
+Layout: MAGIC, header length (uint32), header, then the 8-byte aligned column
+buffers. Decoding only reads the header; columns are np.frombuffer views of the
+buffer, so encoded bytes in a memory-mapped file (the snapshot archive's
+segment file) are read in place. decode_payload returns the same structure
+the JSON had (dicts, lists, None for nulls); arrays=True leaves columns as
+numpy arrays (NaN for nulls, datetime64 for time axes) for batch consumers.
+"""
+import json
+import zlib
+import struct
+
+import numpy as np
+
+# --- CONFIGURATION ---
+MAGIC = b'SNPC'
+MIN_COLUMN = 8            # shorter lists stay in the JSON skeleton
+MAX_DECIMALS = 6
+ALIGN = 8
+COLUMN_KEY = '$column'
+# ISO time strings by length: Open-Meteo hourly and daily axes
+TIME_UNITS = {16: 'm', 10: 'D'}
+_HEADER = struct.Struct('<4sI')
+_HOUR_SUFFIXES = [f"T{hour:02d}:00" for hour in range(24)]
+
+
+def _time_column(values):
+    """(spec, offsets) for a list of ISO hour/day strings on whole hours, or None"""
+    unit = TIME_UNITS.get(len(values[0]))
+    if unit is None or not all(isinstance(v, str) and len(v) == len(values[0]) for v in values):
+        return None
+    try:
+        times = np.array(values, dtype=f'datetime64[{unit}]')
+    except ValueError:
+        return None
+    if np.isnat(times).any() or np.datetime_as_string(times, unit=unit).tolist() != values:
+        return None
+    minutes = times.astype('datetime64[m]').astype(np.int64)
+    if (minutes % 60).any():
+        return None
+    hours = minutes // 60
+    steps = np.diff(hours)
+    spec = {'time': unit, 'count': len(values), 'start': int(hours[0])}
+    if len(steps) and (steps == steps[0]).all() and steps[0] > 0:
+        spec['step'] = int(steps[0])
+        return spec, None
+    return spec, (hours - hours[0]).astype('<i4')
+
+
+def _decimals(values):
+    """Fewest decimals (up to MAX_DECIMALS) that represent every value exactly, or None"""
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values, equal_nan=True):
+            return decimals
+    return None
+
+
+def _numeric_column(values):
+    """(spec, buffer) for a list of numbers and nulls, or None"""
+    if not all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+        return None
+    nulls = [i for i, v in enumerate(values) if v is None]
+    if len(nulls) == len(values):
+        return None
+    spec = {'count': len(values)}
+    if nulls:
+        spec['nulls'] = nulls
+    if all(isinstance(v, int) for v in values if v is not None):
+        ints = np.array([0 if v is None else v for v in values], dtype=np.int64)
+        for dtype in ('<i2', '<i4', '<i8'):
+            info = np.iinfo(dtype)
+            if info.min <= ints.min() and ints.max() <= info.max:
+                return {**spec, 'dtype': dtype}, ints.astype(dtype)
+
+    floats = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    decimals = _decimals(floats)
+    if decimals is not None:
+        # Fixed point in int16 where the scaled values fit (most weather variables), else float32
+        scaled = np.round(np.nan_to_num(floats) * 10.0 ** decimals)
+        if np.abs(scaled).max() <= np.iinfo(np.int16).max:
+            return {**spec, 'dtype': '<i2', 'decimals': decimals, 'scaled': True}, scaled.astype('<i2')
+        narrow = floats.astype('<f4')
+        if np.array_equal(np.round(narrow.astype(np.float64), decimals), floats, equal_nan=True):
+            return {**spec, 'dtype': '<f4', 'decimals': decimals}, narrow
+    return {**spec, 'dtype': '<f8'}, floats.astype('<f8')
+
+
+def _split(value, specs, buffers):
+    """JSON skeleton of a payload, moving each column-shaped list into specs/buffers"""
+    if isinstance(value, dict):
+        return {key: _split(item, specs, buffers) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        column = None
+        if len(value) >= MIN_COLUMN:
+            column = _time_column(value) if isinstance(value[0], str) else _numeric_column(value)
+        if column is None:
+            return [_split(item, specs, buffers) for item in value]
+        spec, buffer = column
+        specs.append(spec)
+        buffers.append(buffer)
+        return {COLUMN_KEY: len(specs) - 1}
+    return value
+
+
+def encode_payload(payload):
+    """Encoded bytes of a JSON-shaped payload (tuples come back as lists, like JSON)"""
+    specs, buffers = [], []
+    skeleton = _split(payload, specs, buffers)
+
+    offset = 0
+    for spec, buffer in zip(specs, buffers):
+        if buffer is not None:
+            offset = -(-offset // ALIGN) * ALIGN
+            spec['offset'] = offset
+            offset += buffer.nbytes
+    header = zlib.compress(json.dumps({'skeleton': skeleton, 'columns': specs}, separators=(',', ':'),
+                                      default=str).encode('utf-8'), 6)
+    start = -(-(_HEADER.size + len(header)) // ALIGN) * ALIGN
+    out = bytearray(start + offset)
+    _HEADER.pack_into(out, 0, MAGIC, len(header))
+    out[_HEADER.size:_HEADER.size + len(header)] = header
+    for spec, buffer in zip(specs, buffers):
+        if buffer is not None:
+            position = start + spec['offset']
+            out[position:position + buffer.nbytes] = buffer.tobytes()
+    return bytes(out)
+
+
+def is_encoded(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def _iso_strings(hours, unit):
+    """ISO strings for epoch hours: each day and each hour-of-day suffix is formatted only once"""
+    first, last = int(hours.min()) // 24, int(hours.max()) // 24
+    labels = np.datetime_as_string(np.arange(first, last + 1).astype('datetime64[D]')).tolist()
+    if unit == 'D':
+        return [labels[day] for day in (hours // 24 - first).tolist()]
+    strings = [label + suffix for label in labels for suffix in _HOUR_SUFFIXES]
+    return [strings[hour] for hour in (hours - first * 24).tolist()]
+
+
+def _read_column(view, start, spec, arrays):
+    if 'time' in spec:
+        if 'step' in spec:
+            hours = spec['start'] + spec['step'] * np.arange(spec['count'], dtype=np.int64)
+        else:
+            hours = spec['start'] + np.frombuffer(view, '<i4', spec['count'], start + spec['offset']).astype(np.int64)
+        if arrays:
+            return hours.astype('datetime64[h]').astype('datetime64[m]')
+        return _iso_strings(hours, spec['time'])
+
+    values = np.frombuffer(view, spec['dtype'], spec['count'], start + spec['offset'])
+    if 'scaled' in spec:
+        values = np.round(values / 10.0 ** spec['decimals'], spec['decimals'])
+    elif 'decimals' in spec:
+        values = np.round(values.astype(np.float64), spec['decimals'])
+    nulls = spec.get('nulls')
+    if arrays:
+        if nulls:
+            values = values.astype(np.float64)
+            values[nulls] = np.nan
+        return values
+    values = values.tolist()
+    for i in nulls or ():
+        values[i] = None
+    return values
+
+
+def _join(skeleton, columns):
+    if isinstance(skeleton, dict):
+        if len(skeleton) == 1 and COLUMN_KEY in skeleton:
+            return columns[skeleton[COLUMN_KEY]]
+        return {key: _join(item, columns) for key, item in skeleton.items()}
+    if isinstance(skeleton, list):
+        return [_join(item, columns) for item in skeleton]
+    return skeleton
+
+
+def decode_payload(data, arrays=False):
+    """Payload from encode_payload bytes (or any buffer over them, e.g. an mmap)"""
+    view = memoryview(data)
+    magic, header_size = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("not an encoded payload")
+    header = json.loads(zlib.decompress(view[_HEADER.size:_HEADER.size + header_size]))
+    start = -(-(_HEADER.size + header_size) // ALIGN) * ALIGN
+    columns = [_read_column(view, start, spec, arrays) for spec in header['columns']]
+    return _join(header['skeleton'], columns)
@@ -0,0 +1,180 @@
+"""Hourly power outage risk from ice accretion and wind, Sperry-Piltz style.
+
+Radial ice on lines is accumulated hour by hour with the Jones (1996) simple
+flux model used by the Sperry-Piltz Ice Accumulation (SPIA) index: freezing
+rain rate and concurrent wind both add ice, and the running total resets once
+temperatures rise enough to shed it. Each hour's accumulated ice and wind then
+give a 0-5 index from the SPIA damage table.
+
+Arrays are (rows x hours), where a row is a location (Webster plus every road
+corridor point) or an ensemble member, so one pass scores the whole area.
+Results are cached per pair of runs of the Webster and corridor forecasts, and
+only when both are available, so a partial area is never pinned for a run.
+"""
+import numpy as np
+import pandas as pd
+
+from weather_data import (
+    get_euro_snow_ice, freezing_rain_rate, record_fetch, serve_fetched, TERRAIN_MULTIPLIER
+)
+from road_corridors import get_corridor_forecast, POINTS as CORRIDOR_POINTS
+from memory_cache import bounded_cache
+from precip_type import hourly_precip_type, UNKNOWN
+from compute_pool import compute
+
+# --- CONFIGURATION ---
+ICE_DENSITY = 0.9          # g/cm^3, glaze
+MELT_TEMP = 34             # °F; at or above this the accumulated ice is shed
+# SPIA table: rows are radial ice bands (inches), columns wind bands (mph)
+ICE_BANDS = [0.10, 0.25, 0.50, 0.75, 1.00, 1.50]
+WIND_BANDS = [15, 25, 35]
+SPIA_TABLE = np.array([
+    [0, 0, 0, 0],   # < 0.10"
+    [0, 1, 2, 3],   # 0.10 - 0.25"
+    [1, 2, 3, 4],   # 0.25 - 0.50"
+    [2, 3, 4, 5],   # 0.50 - 0.75"
+    [3, 4, 5, 5],   # 0.75 - 1.00"
+    [4, 5, 5, 5],   # 1.00 - 1.50"
+    [5, 5, 5, 5],   # > 1.50"
+])
+SPIA_LABELS = [
+    "⚪ 0 - No outages",
+    "🔵 1 - Isolated outages",
+    "🟡 2 - Scattered outages",
+    "🟠 3 - Numerous outages",
+    "🔴 4 - Prolonged, widespread",
+    "🟣 5 - Catastrophic"
+]
+
+
+def radial_ice(temp, precip, snow, wind, terrain_multiplier=1, ptype=None):
+    """Accumulated radial ice (inches) per hour, (rows x hours) in and out.
+
+    Jones simple model per hour: R = sqrt((P * rho_w)^2 + (3.6 * V * W)^2) / (rho_i * pi),
+    P freezing rain in mm/h, V wind in m/s, W = 0.067 * P^0.846 g/m^3 liquid water content.
+    ptype is the profile-based precip type per hour (precip_type), if available.
+    """
+    rate_mm = freezing_rain_rate(temp, precip, snow, terrain_multiplier, ptype) * 25.4
+    wind_ms = np.nan_to_num(np.asarray(wind, dtype=float)) * 0.44704
+    water = 0.067 * rate_mm ** 0.846
+    hourly_mm = np.sqrt(rate_mm ** 2 + (3.6 * wind_ms * water) ** 2) / (ICE_DENSITY * np.pi)
+
+    # Running total that restarts after each melting hour:
+    # subtract the total as of the latest melt from the cumulative sum
+    total = np.cumsum(hourly_mm, axis=-1)
+    melted = np.asarray(temp, dtype=float) >= MELT_TEMP
+    base = np.maximum.accumulate(np.where(melted, total, 0.0), axis=-1)
+    return (total - base) / 25.4
+
+
+def spia_index(ice, wind):
+    """SPIA index (0-5) for accumulated radial ice (inches) and wind (mph), elementwise"""
+    ice_band = np.searchsorted(ICE_BANDS, np.asarray(ice), side='right')
+    wind_band = np.searchsorted(WIND_BANDS, np.nan_to_num(np.asarray(wind, dtype=float)), side='right')
+    return SPIA_TABLE[ice_band, wind_band]
+
+
+def score_rows(temp, precip, snow, wind, multiplier, ptype):
+    """(radial ice, SPIA index) for (rows x hours) inputs (a compute_pool job)"""
+    ice = radial_ice(temp, precip, snow, wind, multiplier, ptype)
+    return ice, spia_index(ice, wind)
+
+
+def risk_window(index, times):
+    """(start, end, peak) of the hours around the area's first peak, or None when the peak is 0.
+
+    The window is the contiguous run around the first peak hour where the index stays
+    within one level of the peak.
+    """
+    area = index.max(axis=0) if index.ndim > 1 else index
+    peak = int(area.max()) if len(area) else 0
+    if peak == 0:
+        return None
+    at_peak = int(np.argmax(area))
+    elevated = area >= max(peak - 1, 1)
+    # Walk out from the peak hour to the edges of its elevated run
+    breaks = np.flatnonzero(~elevated)
+    start = breaks[breaks < at_peak].max() + 1 if (breaks < at_peak).any() else 0
+    end = breaks[breaks > at_peak].min() - 1 if (breaks > at_peak).any() else len(area) - 1
+    return times[start], times[end], peak
+
+
+@bounded_cache(ttl=6 * 3600, max_entries=2, max_bytes=2 * 1024 * 1024)
+def outage_risk(euro_run, corridor_run):
+    """Outage risk for the Webster and corridor forecasts of these runs: Webster's hourly series plus every corridor location.
+
+    Returns None (and is not cached, see get_outage_risk) unless both forecasts are available for the runs.
+    """
+    _, euro_hourly = get_euro_snow_ice()
+    corridors = get_corridor_forecast()
+    if not euro_hourly or 'wind_speed_10m' not in euro_hourly or euro_hourly.get('model_run') != euro_run:
+        return None
+    if corridors is None or 'wind_speed_10m' not in corridors or corridors.get('model_run') != corridor_run:
+        return None
+    webster = pd.DataFrame({k: v for k, v in euro_hourly.items() if isinstance(v, list)})
+    # Local wall-clock times from the API, localized so they line up with the corridor grid
+    times = pd.to_datetime(webster['time']).dt.tz_localize('US/Eastern', ambiguous='NaT', nonexistent='NaT')
+
+    # Row 0 is Webster (terrain-corrected ECMWF); the rest are corridor points on their own grid
+    rows = {
+        field: [webster[field].to_numpy(dtype=float)]
+        for field in ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m')
+    }
+    webster_ptype = hourly_precip_type(euro_hourly, 'ecmwf')
+    ptypes = [np.full(len(times), UNKNOWN) if webster_ptype is None else webster_ptype]
+    # Align corridor hours onto Webster's hours
+    position = pd.Index(corridors['time']).get_indexer(times)
+    for field in rows:
+        aligned = np.where(position >= 0, corridors[field][:, position], np.nan)
+        rows[field].extend(aligned)
+    corridor_ptype = hourly_precip_type(corridors, 'corridors')
+    if corridor_ptype is None:
+        ptypes.extend(np.full((len(CORRIDOR_POINTS), len(times)), UNKNOWN))
+    else:
+        ptypes.extend(np.where(position >= 0, corridor_ptype[:, position], UNKNOWN))
+    multipliers = [TERRAIN_MULTIPLIER] + [1] * len(CORRIDOR_POINTS)
+    names = ["Webster"] + list(CORRIDOR_POINTS['near'])
+
+    temp, precip, snow, wind = (np.vstack(rows[field]) for field in
+                                ('temperature_2m', 'precipitation', 'snowfall', 'wind_speed_10m'))
+    multiplier = np.array(multipliers, dtype=float)[:, None]
+    # outage_risk itself is cached per run, so the job needs no version of its own
+    ice, index = compute(score_rows, None, temp=temp, precip=np.nan_to_num(precip), snow=np.nan_to_num(snow),
+                         wind=wind, multiplier=multiplier, ptype=np.vstack(ptypes))
+
+    by_location = pd.DataFrame({
+        'Location': names,
+        'Peak Index': index.max(axis=1),
+        'Radial Ice': ice.max(axis=1),
+        'Max Wind': np.nanmax(wind, axis=1)
+    })
+    # Several corridor samples share a waypoint name; keep each place's worst row
+    by_location = (by_location.sort_values('Peak Index', ascending=False, kind='stable')
+                   .drop_duplicates('Location').reset_index(drop=True))
+    risk = {
+        'model_run': euro_run,
+        'hourly': pd.DataFrame({
+            'time': times,
+            'radial_ice': ice[0],
+            'wind': wind[0],
+            'index': index[0],
+            'area_index': index.max(axis=0)
+        }),
+        'by_location': by_location,
+        'window': risk_window(index, times.reset_index(drop=True))
+    }
+    record_fetch('power', payload=risk, archived=False)
+    return risk
+
+
+def get_outage_risk():
+    """Outage risk for the forecasts on show, or the last good one while either input is unavailable"""
+    _, euro_hourly = get_euro_snow_ice()
+    corridors = get_corridor_forecast()
+    risk = None
+    if euro_hourly and corridors is not None:
+        runs = (euro_hourly.get('model_run'), corridors.get('model_run'))
+        risk = outage_risk(*runs)
+        if risk is None:
+            outage_risk.clear(*runs)  # inputs were incomplete; try again on the next render
+    return serve_fetched('power', risk, None)
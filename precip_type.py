@@ -0,0 +1,121 @@
+"""Precipitation type from vertical temperature profiles (Bourgouin energy-area method).
+
+2 m temperature alone cannot tell freezing rain from sleet or snow: what matters
+is whether snow melts in a warm layer aloft (the "warm nose") and whether the
+drops refreeze in a cold layer below it. Each hour's profile is the surface
+(2 m temperature at surface pressure) plus the pressure levels above ground.
+Every layer's energy area is Cp * mean temperature (degC) * ln(p_bottom / p_top)
+in J/kg, positive when warm, and the type follows from the melting area aloft,
+the refreezing area beneath it and the surface temperature (Bourgouin 2000).
+
+Arrays are (..., hours, levels); leading axes can be anything (locations,
+ensemble members), so a whole corridor or ensemble is classified in one pass.
+"""
+import numpy as np
+
+from compute_pool import compute
+
+# --- CONFIGURATION ---
+PRESSURE_LEVELS = (1000, 975, 950, 925, 900, 850, 800, 700, 600)   # hPa, bottom to top
+PROFILE_FIELDS = tuple(f"temperature_{level}hPa" for level in PRESSURE_LEVELS) + ('surface_pressure',)
+CP = 1004.0                  # J/(kg K), specific heat of dry air
+MELT_START = 2.0             # J/kg of warm area aloft before snow starts to melt
+MELT_COMPLETE = 13.2         # J/kg to melt snow completely
+SURFACE_RAIN = 9.4           # J/kg surface warm area turning snow to rain (middle of the 5.6-13.2 mixed band)
+REFREEZE_BASE = 56.0         # J/kg; drops refreeze to sleet when the cold area exceeds base + slope * warm area
+REFREEZE_SLOPE = 0.66
+
+SNOW, SLEET, FREEZING_RAIN, RAIN = range(4)
+UNKNOWN = -1                 # no usable profile (missing surface values); callers fall back to 2 m rules
+PTYPE_LABELS = ["❄️ Snow", "🌨️ Sleet", "🧊 Freezing Rain", "🌧️ Rain"]
+
+
+def _forward_fill(values, valid):
+    """Replace invalid entries along the last axis with the nearest valid one below them"""
+    index = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(index, axis=-1, out=index)
+    return np.take_along_axis(values, index, axis=-1)
+
+
+def layer_areas(level_temp_f, surface_temp_f, surface_pressure, levels=PRESSURE_LEVELS):
+    """Energy area (J/kg) of each layer from the surface up, shape (..., hours, levels).
+
+    Levels at or below the surface (and missing values) become zero-thickness layers.
+    """
+    temp = (np.asarray(level_temp_f, dtype=float) - 32) * 5 / 9
+    surface_temp = (np.asarray(surface_temp_f, dtype=float) - 32) * 5 / 9
+    surface_pressure = np.asarray(surface_pressure, dtype=float)
+    pressure = np.broadcast_to(np.asarray(levels, dtype=float), temp.shape)
+
+    # Profile points bottom to top: the surface, then each level
+    points_t = np.concatenate([surface_temp[..., None], temp], axis=-1)
+    points_p = np.concatenate([surface_pressure[..., None], pressure], axis=-1)
+    valid = np.isfinite(points_t) & np.concatenate(
+        [np.ones(surface_pressure.shape + (1,), dtype=bool), pressure < surface_pressure[..., None]], axis=-1)
+    points_t = _forward_fill(points_t, valid)
+    points_p = _forward_fill(points_p, valid)
+
+    mean_t = (points_t[..., :-1] + points_t[..., 1:]) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        thickness = np.nan_to_num(np.log(points_p[..., :-1] / points_p[..., 1:]))
+    return CP * mean_t * thickness
+
+
+def classify(level_temp_f, surface_temp_f, surface_pressure, levels=PRESSURE_LEVELS):
+    """Precip type code (SNOW, SLEET, FREEZING_RAIN, RAIN or UNKNOWN) per profile, shape (..., hours)"""
+    area = layer_areas(level_temp_f, surface_temp_f, surface_pressure, levels)
+    warm = area > 0
+    surface_temp = np.asarray(surface_temp_f, dtype=float)
+    frozen_ground = (surface_temp <= 32)[..., None]
+
+    # Warm layer touching an above-freezing ground, and warm layers above the first
+    # cold layer or the frozen ground (the warm nose)
+    surface_layer = np.cumprod(warm, axis=-1).astype(bool) & ~frozen_ground
+    above_cold = (np.cumsum(~warm, axis=-1) > 0) | frozen_ground
+    nose = warm & above_cold
+    below_nose = np.cumsum(nose, axis=-1) == 0
+    surface_warm = np.where(surface_layer, area, 0).sum(axis=-1)
+    melt = np.where(nose, area, 0).sum(axis=-1)
+    refreeze = -np.where(~warm & below_nose, area, 0).sum(axis=-1)
+
+    surface_rule = np.where(surface_warm < SURFACE_RAIN, SNOW, RAIN)
+    refreezes = refreeze > REFREEZE_BASE + REFREEZE_SLOPE * melt
+    liquid = np.where(surface_temp <= 32, FREEZING_RAIN, RAIN)
+    ptype = np.select(
+        [melt < MELT_START,
+         refreezes & (surface_warm < MELT_COMPLETE),
+         melt < MELT_COMPLETE],
+        [surface_rule,
+         SLEET,
+         surface_rule],     # partly melted flakes that don't refreeze land as wet snow or rain
+        default=liquid
+    )
+    known = np.isfinite(surface_temp) & np.isfinite(np.asarray(surface_pressure, dtype=float))
+    return np.where(known, ptype, UNKNOWN)
+
+
+def profile_arrays(hourly):
+    """(level temps, surface pressure) as arrays from an hourly payload, or None without the profile.
+
+    Works for a single location (lists) and for (points x hours) arrays alike.
+    """
+    if not hourly or any(field not in hourly for field in PROFILE_FIELDS):
+        return None
+    temps = np.stack([np.asarray(hourly[f"temperature_{level}hPa"], dtype=float) for level in PRESSURE_LEVELS],
+                     axis=-1)
+    return temps, np.asarray(hourly['surface_pressure'], dtype=float)
+
+
+def hourly_precip_type(hourly, source=None):
+    """Precip type code for every hour of an hourly payload, or None without pressure-level data.
+
+    With the payload's source ('ecmwf', 'corridors') and a model_run stamp, the result is
+    computed off the server thread and cached per run (compute_pool).
+    """
+    profile = profile_arrays(hourly)
+    if profile is None:
+        return None
+    temps, surface_pressure = profile
+    version = (source, hourly['model_run']) if source and hourly.get('model_run') else None
+    return compute(classify, version, level_temp_f=temps,
+                   surface_temp_f=np.asarray(hourly['temperature_2m'], dtype=float), surface_pressure=surface_pressure)
@@ -0,0 +1,221 @@
+"""Route-level road hazard engine for the main corridors around Webster.
+
+Each corridor is a polyline of waypoints (towns and the high passes where
+conditions turn first). Points are sampled every SAMPLE_SPACING_KM along each
+polyline, deduplicated across routes, and their hourly forecasts fetched with
+Open-Meteo's multi-location requests, BATCH_SIZE points per call. The forecast
+is stored as (point x hour) arrays, so scoring every point and hour is a few
+vectorized rules and the route-by-hour matrix rebuilds from cache in
+milliseconds.
+"""
+import math
+import logging
+
+import pandas as pd
+import numpy as np
+
+from weather_data import fetch_json, record_fetch, serve_fetched, get_model_run, hourly_ice_potential
+from memory_cache import bounded_cache
+from field_registry import requested_fields
+from alert_index import alert_index, register_location
+from precip_type import hourly_precip_type, SLEET
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+SAMPLE_SPACING_KM = 8
+BATCH_SIZE = 50            # coordinates per Open-Meteo request
+FORECAST_HOURS = 72        # the matrix shows the next MATRIX_HOURS of this
+MATRIX_HOURS = 48
+REFREEZE_HOURS = 6         # below freezing within this long after precip = black ice risk
+
+# (lat, lon, name); passes carry their elevation in the name for the segment table
+ROUTES = {
+    'US-23/74': [
+        (35.3734, -83.2257, "Sylva"), (35.4367, -83.0830, "Balsam Gap (3,370')"),
+        (35.4887, -82.9887, "Waynesville"), (35.5334, -82.9107, "Clyde"),
+        (35.5329, -82.8374, "Canton"), (35.5951, -82.5515, "Asheville")
+    ],
+    'US-441': [
+        (35.3687, -83.2499, "Dillsboro"), (35.4337, -83.3543, "Whittier"), (35.4743, -83.3149, "Cherokee"),
+        (35.5553, -83.3120, "Smokemont"), (35.6110, -83.4250, "Newfound Gap (5,046')")
+    ],
+    'NC-107': [
+        (35.3734, -83.2257, "Sylva"), (35.3137, -83.1766, "Cullowhee"), (35.2737, -83.1190, "Tuckasegee"),
+        (35.1770, -83.1296, "Glenville"), (35.1104, -83.0993, "Cashiers (3,486')")
+    ],
+    'US-19/23': [
+        (35.3734, -83.2257, "Sylva"), (35.3687, -83.2499, "Dillsboro"), (35.4743, -83.3149, "Cherokee"),
+        (35.4933, -83.1665, "Soco Gap (4,340')"), (35.5187, -83.0977, "Maggie Valley")
+    ],
+    'Blue Ridge Parkway': [
+        (35.4367, -83.0830, "Balsam Gap (3,370')"), (35.3640, -82.9900, "Richland Balsam (6,053')"),
+        (35.3205, -82.8470, "Graveyard Fields (5,120')"), (35.4040, -82.7490, "Mount Pisgah (4,995')"),
+        (35.5280, -82.5960, "Asheville (French Broad)")
+    ]
+}
+
+HAZARD_LEVELS = ["🟢 Clear", "🟡 Caution", "🔴 Hazardous", "🟣 Dangerous"]
+
+# Every waypoint is a watched alert location, matched locally against the area feed
+for _waypoints in ROUTES.values():
+    for _lat, _lon, _name in _waypoints:
+        register_location(_name, _lat, _lon)
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+def sample_routes(routes=ROUTES, spacing_km=SAMPLE_SPACING_KM):
+    """(samples, points): one row per sample along each route, and the unique points to fetch.
+
+    samples has route, km along the route, nearest waypoint name and 'point' (row in points).
+    Every waypoint is sampled, so passes are always scored.
+    """
+    rows = []
+    for route, waypoints in routes.items():
+        km = 0.0
+        for (lat1, lon1, name1), (lat2, lon2, name2) in zip(waypoints, waypoints[1:]):
+            length = _distance_km(lat1, lon1, lat2, lon2)
+            steps = max(int(math.ceil(length / spacing_km)), 1)
+            for step in range(steps):
+                f = step / steps
+                rows.append((route, round(km + f * length, 1), lat1 + f * (lat2 - lat1), lon1 + f * (lon2 - lon1),
+                             name1 if f < 0.5 else name2))
+            km += length
+        lat, lon, name = waypoints[-1]
+        rows.append((route, round(km, 1), lat, lon, name))
+
+    samples = pd.DataFrame(rows, columns=['route', 'km', 'lat', 'lon', 'near'])
+    # Routes share towns (Sylva, Balsam Gap, ...); fetch each location once
+    samples['key'] = list(zip(samples['lat'].round(3), samples['lon'].round(3)))
+    points = samples.drop_duplicates('key')[['key', 'lat', 'lon', 'near']].reset_index(drop=True)
+    samples['point'] = samples['key'].map({key: i for i, key in enumerate(points['key'])})
+    return samples.drop(columns='key'), points.drop(columns='key')
+
+
+SAMPLES, POINTS = sample_routes()
+
+
+@bounded_cache(ttl=6 * 3600, max_entries=2, max_bytes=4 * 1024 * 1024)
+def fetch_corridor_forecast(model_run):
+    """Hourly forecast for every corridor point as {'time', 'elevation', field: (points x hours) array}"""
+    fields = requested_fields('corridors', 'hourly')
+    try:
+        blocks = []
+        for start in range(0, len(POINTS), BATCH_SIZE):
+            batch = POINTS.iloc[start:start + BATCH_SIZE]
+            params = {
+                "latitude": ','.join(f"{lat:.4f}" for lat in batch['lat']),
+                "longitude": ','.join(f"{lon:.4f}" for lon in batch['lon']),
+                "hourly": fields,
+                "temperature_unit": "fahrenheit",
+                "precipitation_unit": "inch",
+                "wind_speed_unit": "mph",
+                "timezone": "GMT",
+                "forecast_hours": FORECAST_HOURS
+            }
+            response = fetch_json('open-meteo', "https://api.open-meteo.com/v1/forecast", calls=len(batch), params=params)
+            blocks.extend(response if isinstance(response, list) else [response])
+
+        forecast = {
+            'time': pd.to_datetime(blocks[0]['hourly']['time']).tz_localize('UTC').tz_convert('US/Eastern'),
+            'elevation': np.array([b.get('elevation', np.nan) for b in blocks], dtype=float),
+            'model_run': model_run
+        }
+        for field in fields:
+            forecast[field] = np.array([b['hourly'][field] for b in blocks], dtype=float)
+        # Open-Meteo reports visibility in feet when imperial units are requested
+        if 'visibility' in forecast and blocks[0].get('hourly_units', {}).get('visibility') == 'ft':
+            forecast['visibility'] = forecast['visibility'] * 0.3048
+        record_fetch('corridors', payload=forecast, archived=False)
+        return forecast
+    except Exception as e:
+        logger.warning("Corridor forecast unavailable: %s", e)
+        return None
+
+
+def get_corridor_forecast():
+    """Corridor forecast for the latest ECMWF run (refetched when a new run lands), or the last good one"""
+    model_run = get_model_run('ecmwf')['run']
+    forecast = fetch_corridor_forecast(model_run)
+    if forecast is None:
+        fetch_corridor_forecast.clear(model_run)
+    return serve_fetched('corridors', forecast, None)
+
+
+def score_hazards(forecast):
+    """Hazard level (index into HAZARD_LEVELS) for every point and hour, as an int array"""
+    shape = forecast['temperature_2m'].shape
+    missing = np.zeros(shape)
+    temp = forecast['temperature_2m']
+    precip = np.nan_to_num(forecast.get('precipitation', missing))
+    snow = np.nan_to_num(forecast.get('snowfall', missing))
+    gust = np.nan_to_num(forecast.get('wind_gusts_10m', missing))
+    visibility = np.nan_to_num(forecast.get('visibility', missing + np.inf), nan=np.inf)
+    # Warm-nose freezing rain and sleet from each point's pressure-level profile
+    ptype = hourly_precip_type(forecast, 'corridors')
+    ice = hourly_ice_potential(temp, precip, snow, 1, ptype)
+    sleet = (ptype == SLEET) & (precip > 0) if ptype is not None else missing > 0
+
+    # Any precip in the last REFREEZE_HOURS (rolling window via cumulative sums along hours)
+    wet = np.cumsum(precip > 0, axis=1)
+    lagged = np.concatenate([np.zeros((shape[0], REFREEZE_HOURS)), wet[:, :-REFREEZE_HOURS]], axis=1)[:, :shape[1]]
+    recently_wet = (wet - lagged) > 0
+
+    rules = [
+        (ice >= 0.02, 3), (snow >= 0.5, 3),
+        (ice > 0, 2), (sleet, 2), (snow >= 0.1, 2), (gust >= 50, 2), (visibility < 400, 2),
+        (snow > 0, 1), ((temp <= 32) & recently_wet, 1), (gust >= 35, 1), (visibility < 1600, 1)
+    ]
+    level = np.zeros(shape, dtype=int)
+    for mask, value in rules:
+        level = np.maximum(level, np.where(mask, value, 0))
+    return level
+
+
+def route_alerts(routes=ROUTES):
+    """{route: sorted active alert events at any of its waypoints}, from the last alert index rebuild"""
+    return {
+        route: sorted({alert['properties']['event'] for _, _, name in waypoints for alert in alert_index.alerts_for(name)})
+        for route, waypoints in routes.items()
+    }
+
+
+def route_matrix(forecast, now, hours=MATRIX_HOURS):
+    """(matrix, times, worst): route x hour worst level for the next `hours`, plus a per-route summary"""
+    level = score_hazards(forecast)
+    times = forecast['time']
+    window = np.flatnonzero(times >= now.floor('h'))[:hours]
+    level = level[:, window]
+    times = times[window]
+
+    # Sample-level view: each route sample reads its point's row
+    sample_level = level[SAMPLES['point'].to_numpy()]
+    routes = list(ROUTES)
+    route_codes = pd.Categorical(SAMPLES['route'], categories=routes).codes
+    matrix = np.zeros((len(routes), len(window)), dtype=int)
+    np.maximum.at(matrix, route_codes, sample_level)
+
+    snow_total = forecast['snowfall'][:, window].sum(axis=1) if 'snowfall' in forecast else np.zeros(len(POINTS))
+    min_temp = forecast['temperature_2m'][:, window].min(axis=1) if len(window) else np.full(len(POINTS), np.nan)
+    worst_rows = []
+    for code, route in enumerate(routes):
+        rows = np.flatnonzero(route_codes == code)
+        peak = sample_level[rows].max(axis=1) if len(window) else np.zeros(len(rows), dtype=int)
+        worst = rows[np.argmax(peak)]
+        point = SAMPLES['point'].iloc[worst]
+        worst_hour = int(np.argmax(sample_level[worst])) if len(window) else None
+        worst_rows.append({
+            'Route': route,
+            'Worst': HAZARD_LEVELS[int(peak.max())] if len(peak) else HAZARD_LEVELS[0],
+            'When': times[worst_hour] if worst_hour is not None and peak.max() > 0 else pd.NaT,
+            'Where': SAMPLES['near'].iloc[worst],
+            'Elevation': forecast['elevation'][point] * 3.28084,
+            'Snow': snow_total[SAMPLES['point'].iloc[rows]].max(),
+            'Min Temp': min_temp[SAMPLES['point'].iloc[rows]].min()
+        })
+    return matrix, times, pd.DataFrame(worst_rows)
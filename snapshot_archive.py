@@ -0,0 +1,342 @@
+"""Time-indexed archive of every fetched payload, for storm replay.
+
+Each successful upstream fetch (alerts, current, ECMWF, GFS, history) is
+indexed in a SQLite table on (source, fetched_at), so "what did the dashboard
+have at time T" is one index seek per source rather than a scan. The payloads
+themselves are appended, in the columnar binary encoding of payload_codec, to a
+segment file next to the database that readers memory-map: decoding a payload
+reads its header and takes the numeric columns straight from the mapped pages.
+Identical consecutive payloads are stored once. Rows from before the segment
+file keep their payload in the table (binary, or zlib-compressed JSON) and
+still load.
+
+Payloads older than ARCHIVE_RETENTION_DAYS are dropped, except the newest one
+of each model run (the reference forecast storm_analogs scores) and each
+source's newest payload. Compaction copies the kept payloads into a new
+segment file, which takes over in the same transaction that rewrites their
+offsets, so an interrupted compaction leaves the old file in use. Processes
+sharing the archive follow the switch through the meta table; the superseded
+file is deleted by the next compaction, once no reader can still be using it.
+"""
+import os
+import time
+import logging
+import json
+import zlib
+import mmap
+import sqlite3
+import hashlib
+import threading
+
+from payload_codec import encode_payload, decode_payload, is_encoded
+from memory_cache import bounded_cache
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+ARCHIVE_ENABLED = os.environ.get("SNOW_ARCHIVE_ENABLED", "1") == "1"
+ARCHIVE_PATH = os.environ.get("SNOW_ARCHIVE_PATH", os.path.join("archive", "snapshots.db"))
+ALIGN = 8   # segment offset alignment, so mapped columns are aligned for numpy
+ARCHIVE_RETENTION_DAYS = float(os.environ.get("SNOW_ARCHIVE_RETENTION_DAYS", "14"))  # 0 keeps everything
+COMPACT_INTERVAL = 6 * 3600  # seconds between retention passes per process
+COPY_CHUNK = 1 << 20         # bytes per read when copying into a new segment file
+LABEL_BATCH = 200            # old payloads decoded per transaction to read their model run
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payloads (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    digest TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    segment_offset INTEGER,
+    segment_length INTEGER,
+    model_run TEXT
+);
+CREATE INDEX IF NOT EXISTS payloads_source_time ON payloads (source, fetched_at);
+CREATE INDEX IF NOT EXISTS payloads_time ON payloads (fetched_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+def _decode(blob, arrays=False):
+    """Stored payload: binary columns, or zlib-compressed JSON in rows from before them"""
+    if is_encoded(blob):
+        return decode_payload(blob, arrays)
+    return json.loads(zlib.decompress(blob))
+
+
+def _model_run(payload):
+    """The model run stamped on a payload (tag_model_run), or '' when it has none"""
+    for part in payload if isinstance(payload, (list, tuple)) else [payload]:
+        if isinstance(part, dict) and part.get('model_run'):
+            return str(part['model_run'])
+    return ''
+
+
+class SnapshotArchive:
+    """Append-only payload store with index seeks by source and time"""
+
+    def __init__(self, path=ARCHIVE_PATH, segment_path=None):
+        self.path = path
+        self._segment_base = segment_path or os.path.splitext(path)[0] + ".segment"
+        self.segment_path = self._segment_base
+        self._lock = threading.Lock()
+        self._conn = None
+        self._map = None
+        self._last_digest = {}
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            # Archives from before the segment file (or the model_run column) lack their columns;
+            # model_run stays NULL on old rows until a compaction reads it from the payload
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(payloads)")}
+            for column, kind in (('segment_offset', 'INTEGER'), ('segment_length', 'INTEGER'), ('model_run', 'TEXT')):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE payloads ADD COLUMN {column} {kind}")
+            self._conn.commit()
+        return self._conn
+
+    def _sync_segment(self, conn):
+        """Follow a compaction, possibly by another process, to its segment file; returns the generation.
+
+        The caller holds the lock, inside a transaction that covers its use of the file.
+        """
+        row = conn.execute("SELECT value FROM meta WHERE key = 'segment_generation'").fetchone()
+        generation = row[0] if row else 0
+        path = self._segment_file(generation)
+        if path != self.segment_path:
+            self.segment_path, self._map = path, None
+        return generation
+
+    def _segment_file(self, generation):
+        """Segment file of a compaction generation; generation 0 is the original file name"""
+        if not generation:
+            return self._segment_base
+        root, ext = os.path.splitext(self._segment_base)
+        return f"{root}.{generation}{ext}"
+
+    def _append(self, blob):
+        """Append an encoded payload to the segment file (caller holds the lock); returns its offset"""
+        with open(self.segment_path, 'ab') as segment:
+            offset = segment.tell()
+            padding = -offset % ALIGN
+            segment.write(b'\0' * padding + blob)
+        return offset + padding
+
+    def _view(self, offset, length):
+        """Read-only view of stored bytes in the mapped segment file, remapped once it has grown.
+
+        The caller holds the lock from reading the row's offset until it has the view, so a
+        compaction cannot swap the file in between. A superseded map stays alive for as long
+        as decoded arrays still view it.
+        """
+        mapped = self._map
+        if mapped is None or offset + length > len(mapped):
+            with open(self.segment_path, 'rb') as segment:
+                mapped = self._map = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped)[offset:offset + length]
+
+    def write(self, source, payload, fetched_at):
+        """Store one payload; skipped when identical to the source's previous one"""
+        blob = encode_payload(payload)
+        digest = hashlib.sha1(blob).hexdigest()
+        with self._lock:
+            conn = self._connect()
+            if source not in self._last_digest:
+                row = conn.execute(
+                    "SELECT digest FROM payloads WHERE source = ? ORDER BY fetched_at DESC LIMIT 1", (source,)
+                ).fetchone()
+                self._last_digest[source] = row[0] if row else None
+            if self._last_digest[source] == digest:
+                return False
+            # Bytes first, then the row: a crash in between leaves unreferenced bytes, not a dangling row.
+            # The write transaction keeps a compaction from switching files in between.
+            conn.execute("BEGIN IMMEDIATE")
+            self._sync_segment(conn)
+            offset = self._append(blob)
+            conn.execute(
+                "INSERT INTO payloads (source, fetched_at, digest, payload, segment_offset, segment_length, model_run) "
+                "VALUES (?, ?, ?, x'', ?, ?, ?)",
+                (source, fetched_at, digest, offset, len(blob), _model_run(payload))
+            )
+            conn.commit()
+            self._last_digest[source] = digest
+        return True
+
+    def _stored(self, sql, params=()):
+        """Rows of a query whose last three columns are (payload, segment_offset, segment_length),
+        with those replaced by the stored bytes: the table's blob or a view of the segment file"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                self._sync_segment(conn)
+                rows = conn.execute(sql, params).fetchall()
+                return [row[:-3] + (row[-3] if row[-2] is None else self._view(row[-2], row[-1]),) for row in rows]
+            finally:
+                conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def sources(self):
+        return [row[0] for row in self._query("SELECT DISTINCT source FROM payloads")]
+
+    def time_range(self):
+        """(first, last) archived fetch time in epoch seconds, or (None, None)"""
+        return self._query("SELECT MIN(fetched_at), MAX(fetched_at) FROM payloads")[0]
+
+    def step(self, at, direction):
+        """Next (+1) or previous (-1) archived fetch time relative to `at`"""
+        if direction > 0:
+            row = self._query("SELECT MIN(fetched_at) FROM payloads WHERE fetched_at > ?", (at,))
+        else:
+            row = self._query("SELECT MAX(fetched_at) FROM payloads WHERE fetched_at < ?", (at,))
+        return row[0][0]
+
+    def seek(self, source, at):
+        """(fetched_at, payload) of the newest payload for `source` at or before `at`"""
+        rows = self._query(
+            "SELECT id, fetched_at FROM payloads WHERE source = ? AND fetched_at <= ? "
+            "ORDER BY fetched_at DESC LIMIT 1", (source, at)
+        )
+        if not rows:
+            return None, None
+        row_id, fetched_at = rows[0]
+        return fetched_at, self._load(row_id)
+
+    def payloads(self, source, after=0, limit=500, arrays=False):
+        """[(fetched_at, payload)] of `source` fetched after `after`, oldest first, at most `limit`.
+
+        For batch consumers walking the whole archive. arrays=True returns numeric and time
+        columns as numpy arrays (payload_codec), read-only where they view the mapped file.
+        """
+        rows = self._stored(
+            "SELECT fetched_at, payload, segment_offset, segment_length FROM payloads "
+            "WHERE source = ? AND fetched_at > ? ORDER BY fetched_at LIMIT ?", (source, after, limit)
+        )
+        return [(fetched_at, _decode(data, arrays)) for fetched_at, data in rows]
+
+    def _load(self, row_id):
+        """A freshly decoded payload; callers own (and may modify) what they get"""
+        rows = self._stored("SELECT payload, segment_offset, segment_length FROM payloads WHERE id = ?", (row_id,))
+        return _decode(rows[0][0])
+
+    def state_at(self, at, sources=None):
+        """{source: payload} as the dashboard had it at `at` (epoch seconds)"""
+        state = {}
+        for source in sources or self.sources():
+            _, payload = self.seek(source, at)
+            state[source] = payload
+        return state
+
+    def _label_runs(self, cutoff):
+        """Fill in model_run for rows before `cutoff` archived before the column existed"""
+        while True:
+            rows = self._stored("SELECT id, payload, segment_offset, segment_length FROM payloads "
+                                "WHERE model_run IS NULL AND fetched_at < ? LIMIT ?", (cutoff, LABEL_BATCH))
+            if not rows:
+                return
+            labels = [(_model_run(_decode(data)), row_id) for row_id, data in rows]
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("UPDATE payloads SET model_run = ? WHERE id = ?", labels)
+                conn.commit()
+
+    def compact(self, retention_days=ARCHIVE_RETENTION_DAYS, now=None):
+        """Drop payloads older than the retention window and rewrite the segment file; returns rows dropped.
+
+        Kept regardless of age: the newest payload of each (source, model run) and of each source,
+        so every run keeps one reference forecast and replay still has each source's latest state.
+        """
+        if retention_days <= 0:
+            return 0
+        cutoff = (time.time() if now is None else now) - retention_days * 86400
+        self._label_runs(cutoff)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                generation = self._sync_segment(conn)
+                dropped = self._drop_expired(conn, cutoff, generation + 1)
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            self._sync_segment(conn)
+        if dropped:
+            if generation:
+                # Superseded by the previous compaction; readers that started before it have finished
+                previous = self._segment_file(generation - 1)
+                if os.path.exists(previous):
+                    os.remove(previous)
+            logger.info("Snapshot archive compacted: %d payloads dropped", dropped)
+        return dropped
+
+    def _drop_expired(self, conn, cutoff, generation):
+        """Delete the rows before `cutoff` not kept as references and copy the rest of the segment
+        file into `generation`'s (inside the caller's write transaction); returns rows deleted"""
+        dropped = conn.execute(
+            "DELETE FROM payloads WHERE fetched_at < ? AND id NOT IN ("
+            "SELECT id FROM (SELECT id, MAX(fetched_at) FROM payloads WHERE model_run != '' "
+            "GROUP BY source, model_run) UNION "
+            "SELECT id FROM (SELECT id, MAX(fetched_at) FROM payloads GROUP BY source))", (cutoff,)
+        ).rowcount
+        if not dropped or not os.path.exists(self.segment_path):
+            return dropped
+        moved = []
+        with open(self.segment_path, 'rb') as old, open(self._segment_file(generation), 'wb') as new:
+            for row_id, offset, length in conn.execute(
+                    "SELECT id, segment_offset, segment_length FROM payloads "
+                    "WHERE segment_offset IS NOT NULL ORDER BY segment_offset").fetchall():
+                new.write(b'\0' * (-new.tell() % ALIGN))
+                moved.append((new.tell(), row_id))
+                old.seek(offset)
+                while length:
+                    chunk = old.read(min(length, COPY_CHUNK))
+                    new.write(chunk)
+                    length -= len(chunk)
+            new.flush()
+            os.fsync(new.fileno())
+        conn.executemany("UPDATE payloads SET segment_offset = ? WHERE id = ?", moved)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('segment_generation', ?)", (generation,))
+        return dropped
+
+archive = SnapshotArchive()
+
+
+def archive_payload(source, payload, fetched_at):
+    """Hook for the fetchers; never lets an archive failure break a fetch"""
+    if not ARCHIVE_ENABLED or payload is None:
+        return
+    try:
+        archive.write(source, payload, fetched_at)
+    except Exception as e:
+        logger.warning("Snapshot archive write failed for %s: %s", source, e)
+    else:
+        compact_archive()
+
+
+def _compact_archive():
+    try:
+        archive.compact()
+    except Exception as e:
+        logger.exception("Snapshot archive compaction failed: %s", e)
+
+
+@bounded_cache(ttl=COMPACT_INTERVAL, max_entries=1, max_bytes=1024)
+def compact_archive():
+    """Apply the retention window in the background, at most once per COMPACT_INTERVAL per process"""
+    thread = threading.Thread(target=_compact_archive, name="snapshot-archive-compact", daemon=True)
+    thread.start()
+    return True
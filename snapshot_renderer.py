@@ -0,0 +1,278 @@
+"""Static snapshot renderer for kiosk and low-bandwidth displays.
+
+Renders the key panels (current conditions, 7-day snow, ice risk, travel status,
+active alerts) to a self-contained HTML page plus SVG charts, and PNG copies when
+kaleido is installed. Wall screens point a browser at the output directory instead
+of holding a live Streamlit session open.
+
+Run on a schedule with `python snapshot_renderer.py --interval 300`, or set
+SNOW_SNAPSHOT_ENABLED=1 to let the dashboard process re-render on each refresh.
+"""
+import os
+import logging
+import html
+import json
+import hashlib
+import argparse
+import threading
+import time
+
+import streamlit as st
+import pandas as pd
+
+from weather_data import (
+    LOCATION_NAME, ELEVATION_FT, TERRAIN_MULTIPLIER,
+    get_products, get_weather_description, ICE_RISK_LABELS
+)
+from cache_refresh import apply_adaptive_ttls
+from field_registry import activate
+
+try:
+    import kaleido  # noqa: F401  (optional, only needed for PNG export)
+except ImportError:
+    kaleido = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+SNAPSHOT_ENABLED = os.environ.get("SNOW_SNAPSHOT_ENABLED", "0") == "1"
+SNAPSHOT_DIR = os.environ.get("SNOW_SNAPSHOT_DIR", "snapshot")
+SNAPSHOT_INTERVAL = int(os.environ.get("SNOW_SNAPSHOT_INTERVAL", "300"))  # seconds
+
+CHART_WIDTH = 640
+CHART_HEIGHT = 260
+
+PAGE_CSS = """
+body { margin: 0; padding: 24px; font-family: -apple-system, "Segoe UI", Roboto, sans-serif;
+       background: #0d1620; color: #e0f7fa; }
+h1 { margin: 0 0 4px 0; } h2 { margin: 24px 0 8px 0; }
+.caption { color: #9fb3c8; font-size: 0.9em; }
+.grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 12px; }
+.card { background: rgba(255,255,255,0.05); border: 1px solid rgba(255,255,255,0.1);
+        border-radius: 8px; padding: 12px; }
+.card .label { color: #9fb3c8; font-size: 0.85em; } .card .value { font-size: 1.8em; font-weight: bold; }
+.alert-box { padding: 15px; border-radius: 8px; margin-bottom: 16px; font-weight: bold;
+             border: 1px solid rgba(255,255,255,0.2); }
+.alert-purple { background-color: #5E35B1; border-left: 10px solid #B39DDB; }
+.alert-red { background-color: #C62828; border-left: 10px solid #FFCDD2; }
+.alert-orange { background-color: #EF6C00; border-left: 10px solid #FFE0B2; }
+.alert-ice { background-color: #1565C0; border-left: 10px solid #90CAF9; }
+.alert-green { background-color: #2E7D32; border-left: 10px solid #A5D6A7; }
+table { border-collapse: collapse; width: 100%; }
+th, td { padding: 6px 10px; border-bottom: 1px solid #2a3a4a; text-align: left; }
+.charts { display: flex; flex-wrap: wrap; gap: 16px; }
+"""
+
+
+def svg_bar_chart(labels, values, title, color, unit='"', decimals=1):
+    """Minimal dependency-free SVG bar chart (kiosk browsers render it natively)"""
+    pad_left, pad_bottom, pad_top = 40, 30, 36
+    plot_w = CHART_WIDTH - pad_left - 10
+    plot_h = CHART_HEIGHT - pad_bottom - pad_top
+    vmax = max(max(values, default=0), 0.1)
+    slot = plot_w / max(len(values), 1)
+    bar_w = slot * 0.6
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{CHART_WIDTH}" height="{CHART_HEIGHT}" '
+        f'viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}" font-family="sans-serif" font-size="12">',
+        f'<rect width="100%" height="100%" fill="#0d1620"/>',
+        f'<text x="{CHART_WIDTH / 2}" y="20" fill="#e0f7fa" font-size="14" text-anchor="middle">{html.escape(title)}</text>',
+        f'<line x1="{pad_left}" y1="{pad_top + plot_h}" x2="{CHART_WIDTH - 10}" y2="{pad_top + plot_h}" stroke="#555"/>'
+    ]
+    for i, (label, value) in enumerate(zip(labels, values)):
+        h = plot_h * (value / vmax)
+        x = pad_left + i * slot + (slot - bar_w) / 2
+        y = pad_top + plot_h - h
+        parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{bar_w:.1f}" height="{h:.1f}" fill="{color}"/>')
+        parts.append(f'<text x="{x + bar_w / 2:.1f}" y="{y - 4:.1f}" fill="#e0f7fa" text-anchor="middle">'
+                     f'{value:.{decimals}f}{html.escape(unit)}</text>')
+        parts.append(f'<text x="{x + bar_w / 2:.1f}" y="{CHART_HEIGHT - 10}" fill="#9fb3c8" text-anchor="middle">'
+                     f'{html.escape(label)}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def write_png(labels, values, title, color, path):
+    """PNG copy of a bar chart through plotly + kaleido, when available"""
+    if kaleido is None:
+        return False
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(x=labels, y=values, marker_color=color))
+    fig.update_layout(
+        title=title, width=CHART_WIDTH, height=CHART_HEIGHT,
+        plot_bgcolor='#0d1620', paper_bgcolor='#0d1620', font=dict(color='white'),
+        margin=dict(l=40, r=10, t=40, b=30), showlegend=False
+    )
+    try:
+        fig.write_image(path)
+    except Exception:
+        return False
+    return True
+
+
+def _write_atomic(path, content):
+    """Write via a temp file so a kiosk never loads a half-written page"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _reading(value, spec):
+    """A value formatted for the page, or a dash when the API returned null"""
+    return "--" if value is None else format(value, spec)
+
+
+def render_snapshot(products, out_dir=SNAPSHOT_DIR, refresh=SNAPSHOT_INTERVAL):
+    """Write index.html and chart files for one product bundle"""
+    os.makedirs(out_dir, exist_ok=True)
+
+    current = products.get('current') or {}
+    euro_daily = products.get('forecast/daily') or {}
+    ice_data = products.get('ice') or {}
+    travel = products.get('travel')
+    alerts = products.get('alerts') or []
+
+    days = euro_daily.get('time', [])[:7]
+    labels = [pd.to_datetime(d).strftime('%a %m/%d') for d in days]
+    snow = [s or 0 for s in euro_daily.get('snowfall_sum', [])[:7]]
+    ice = [ice_data.get(d, {}).get('ice_accum') or 0 for d in days]
+
+    charts = [
+        ('snow_7day', labels, snow, "7-Day Snow (Terrain Corrected)", '#4ECDC4', '"', 1),
+        ('ice_7day', labels, ice, "7-Day Ice Accumulation", '#90CAF9', '"', 2)
+    ]
+    chart_files = []
+    for name, x, y, title, color, unit, decimals in charts:
+        _write_atomic(os.path.join(out_dir, f"{name}.svg"), svg_bar_chart(x, y, title, color, unit, decimals))
+        write_png(x, y, title, color, os.path.join(out_dir, f"{name}.png"))
+        chart_files.append(f"{name}.svg")
+
+    # Current conditions cards
+    cards = []
+    if current:
+        cards.append(("Temperature", f"{_reading(current.get('temperature_2m'), '.0f')}°F"))
+        snowfall = current.get('snowfall') or 0
+        if snowfall > 0:
+            cards.append(("SNOWING NOW", f"{snowfall:.2f}\" /hr"))
+        else:
+            cards.append(("Conditions", get_weather_description(current.get('weather_code') or 0)))
+        cards.append(("Wind", f"{_reading(current.get('wind_speed_10m'), '.0f')} mph"))
+        cards.append(("Precip Rate", f"{current.get('precipitation') or 0:.2f}\" /hr"))
+    cards_html = ''.join(
+        f'<div class="card"><div class="label">{html.escape(k)}</div><div class="value">{html.escape(v)}</div></div>'
+        for k, v in cards
+    ) or '<p>Current conditions unavailable</p>'
+
+    alerts_html = ''
+    for alert in alerts[:3]:
+        event = alert.get('event') or ''
+        css_class = "alert-orange"
+        if "Warning" in event: css_class = "alert-red"
+        if "Winter" in event or "Ice" in event or "Snow" in event: css_class = "alert-purple"
+        alerts_html += (f'<div class="alert-box {css_class}"><h3>⚠️ {html.escape(event)}</h3>'
+                        f'<p>{html.escape(alert.get("headline") or "")}</p></div>')
+
+    travel_html = ''
+    if travel:
+        travel_html = (f'<div class="alert-box {travel["css"]}"><h3>{html.escape(travel["status"])}</h3>'
+                       f'<p>{html.escape(travel["description"])}</p>'
+                       f'<p>Today: {travel["snow"]:.1f}" snow, {travel["ice_accum"]:.2f}" ice, '
+                       f'Low: {travel["low_temp"]:.0f}°F</p></div>')
+
+    rows = []
+    highs = euro_daily.get('temperature_2m_max') or [None] * len(days)
+    lows = euro_daily.get('temperature_2m_min') or [None] * len(days)
+    for i, day in enumerate(days):
+        risk = ice_data.get(day, {}).get('ice_risk', 'None')
+        rows.append(f'<tr><td>{labels[i]}</td><td>{snow[i]:.1f}"</td><td>{ice[i]:.2f}"</td>'
+                    f'<td>{ICE_RISK_LABELS.get(risk, ICE_RISK_LABELS["None"])}</td>'
+                    f'<td>{_reading(highs[i], ".0f")}°F</td><td>{_reading(lows[i], ".0f")}°F</td></tr>')
+
+    updated = pd.Timestamp.now(tz='US/Eastern').strftime('%A, %b %d %I:%M %p')
+    page = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="{refresh}">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Snow & Ice Forecast - {html.escape(LOCATION_NAME)}</title>
+<style>{PAGE_CSS}</style>
+</head>
+<body>
+<h1>❄️🧊 Stephanie's Snow & Ice Forecaster</h1>
+<div class="caption">{html.escape(LOCATION_NAME)} ({ELEVATION_FT}' elevation) | Updated {updated} |
+Terrain corrected +{int((TERRAIN_MULTIPLIER - 1) * 100)}%</div>
+{alerts_html}
+<h2>🌡️ Right Now</h2>
+<div class="grid">{cards_html}</div>
+<h2>🚗 Travel Status</h2>
+{travel_html or '<p>Travel status unavailable</p>'}
+<h2>📅 7-Day Snow & Ice</h2>
+<table>
+<tr><th>Date</th><th>Snow</th><th>Ice</th><th>Ice Risk</th><th>High</th><th>Low</th></tr>
+{''.join(rows)}
+</table>
+<div class="charts">{''.join(f'<img src="{f}" alt="{f}">' for f in chart_files)}</div>
+</body>
+</html>
+"""
+    _write_atomic(os.path.join(out_dir, "index.html"), page)
+    _write_atomic(os.path.join(out_dir, "products.json"), json.dumps(products, default=str))
+    return os.path.join(out_dir, "index.html")
+
+
+class SnapshotScheduler:
+    """Re-renders the snapshot whenever the cached products change"""
+
+    def __init__(self, out_dir=SNAPSHOT_DIR, interval=SNAPSHOT_INTERVAL):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.last_digest = None
+        self.last_rendered = None
+
+    def render_if_changed(self):
+        activate('snapshot')
+        apply_adaptive_ttls()
+        products = get_products()
+        digest = hashlib.sha1(json.dumps(products, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        if digest == self.last_digest:
+            return False
+        render_snapshot(products, self.out_dir, self.interval)
+        self.last_digest = digest
+        self.last_rendered = pd.Timestamp.now(tz='US/Eastern')
+        return True
+
+    def run_forever(self):
+        while True:
+            try:
+                self.render_if_changed()
+            except Exception as e:
+                logger.exception("Snapshot render failed: %s", e)
+            time.sleep(self.interval)
+
+
+@st.cache_resource
+def start_snapshot_scheduler():
+    """Start the background renderer once per Streamlit process"""
+    if not SNAPSHOT_ENABLED:
+        return None
+    scheduler = SnapshotScheduler()
+    threading.Thread(target=scheduler.run_forever, name="snapshot-renderer", daemon=True).start()
+    return scheduler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render static kiosk snapshots of the snow dashboard")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="output directory")
+    parser.add_argument("--interval", type=int, default=SNAPSHOT_INTERVAL, help="seconds between refresh checks")
+    parser.add_argument("--once", action="store_true", help="render once and exit")
+    args = parser.parse_args()
+
+    scheduler = SnapshotScheduler(args.out, args.interval)
+    if args.once:
+        scheduler.render_if_changed()
+        print(f"Snapshot written to {os.path.join(args.out, 'index.html')}")
+    else:
+        scheduler.run_forever()
@@ -1,21 +1,31 @@
+import startup_profile  # first, so the profile's clock covers the other imports
+startup_profile.begin_run()
+
 import streamlit as st
-import requests
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
+import plotly.graph_objects as go  # already loaded by streamlit's plotly_chart element
 import time
-from datetime import datetime, timedelta
-import json
 
-# --- CONFIGURATION ---
-LAT = 35.351630
-LON = -83.210029
-LOCATION_NAME = "Webster, NC"
-ELEVATION_FT = 2360  # Webster elevation for terrain correction
-NCDOT_DIVISION = 14
+from weather_data import (
+    LAT, LON, LOCATION_NAME, ELEVATION_FT, TERRAIN_MULTIPLIER,
+    get_nws_alerts, get_historical_snow, get_current_conditions, get_euro_snow_ice,
+    get_gfs_forecast, calculate_ice_accumulation, get_weather_description, get_travel_status,
+    get_model_run, model_run_label, STALE_SOURCES,
+    weather_descriptions, snow_category, wind_direction_text, hourly_frame, ICE_RISK_LABELS
+)
+from precip_type import hourly_precip_type, PTYPE_LABELS, UNKNOWN, SNOW
+from cache_refresh import SOURCES, request_refresh, describe_refresh, apply_adaptive_ttls
+from api_budget import budget
+from upstream_guard import set_deadline, breaker, PAGE_DEADLINE
+from snapshot_archive import archive
+from memory_cache import cache_stats
+from downsample import downsample_series, MAX_CHART_POINTS
+from field_registry import activate, DASHBOARD_VIEWS
+# Feature modules (storm events, analogs, stations, corridors, power, grid, watches) and the
+# background services are imported where they are used, after the header has painted
 
-# Terrain snow enhancement factor (mountains get ~20-30% more snow than valleys)
-TERRAIN_MULTIPLIER = 1.25
+startup_profile.mark('imports')
 
 st.set_page_config(page_title="Stephanie's Snow & Ice Forecaster", page_icon="❄️", layout="wide")
 
@@ -71,11 +81,34 @@ st.markdown("""
 # --- TIMEZONE ---
 nc_time = pd.Timestamp.now(tz='US/Eastern')
 
+# --- REPLAY CONTROLS ---
+# Replay time is picked to the minute and includes everything fetched during that minute
+def set_replay_time(epoch_seconds):
+    """Point the replay date/time widgets at an archived fetch time"""
+    at = pd.Timestamp(epoch_seconds, unit='s', tz='UTC').tz_convert('US/Eastern').floor('min')
+    st.session_state['replay_date'] = at.date()
+    st.session_state['replay_time'] = at.time()
+
+def step_replay(replay_at, direction):
+    """Jump to the previous/next archived fetch (an index seek, not a scan)"""
+    minute_start = replay_at.timestamp()
+    at = archive.step(minute_start + 59.999 if direction > 0 else minute_start, direction)
+    if at is not None:
+        set_replay_time(at)
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.markdown("### ❄️ Controls")
     if st.button("✨ Let it Snow!"): st.snow()
-    if st.button("🔄 Refresh Data"): st.cache_data.clear(); st.rerun()
+    refresh_choice = st.multiselect(
+        "Sources to refresh", list(SOURCES), default=list(SOURCES),
+        format_func=lambda name: SOURCES[name]['label']
+    )
+    if st.button("🔄 Refresh Data"):
+        st.session_state['refresh_report'] = request_refresh(st.session_state, refresh_choice)
+        st.rerun()
+    if 'refresh_report' in st.session_state:
+        st.caption(describe_refresh(st.session_state.pop('refresh_report')))
     st.markdown("---")
     st.caption(f"Last Updated:\n{nc_time.strftime('%I:%M:%S %p')}")
     st.markdown("---")
@@ -84,219 +117,126 @@ with st.sidebar:
     st.caption("• GFS (American Model)")
     st.caption("• NWS Observations")
     st.caption("• Terrain Corrected")
+    st.markdown("---")
+    st.markdown("### ⏪ Storm Replay")
+    replay_at = None
+    first_archived, last_archived = archive.time_range()
+    if first_archived is None:
+        st.caption("No archived data yet")
+    elif st.toggle("Replay archived data", key='replay_on'):
+        if 'replay_date' not in st.session_state:
+            set_replay_time(last_archived)
+        st.date_input("Date", key='replay_date',
+                      min_value=pd.Timestamp(first_archived, unit='s', tz='UTC').tz_convert('US/Eastern').date(),
+                      max_value=pd.Timestamp(last_archived, unit='s', tz='UTC').tz_convert('US/Eastern').date())
+        st.time_input("Time", key='replay_time', step=60)
+        replay_at = pd.Timestamp.combine(st.session_state['replay_date'], st.session_state['replay_time']).tz_localize('US/Eastern')
+        col1, col2 = st.columns(2)
+        col1.button("◀ Prev", on_click=step_replay, args=(replay_at, -1), use_container_width=True)
+        col2.button("Next ▶", on_click=step_replay, args=(replay_at, 1), use_container_width=True)
+        nc_time = replay_at
 
 # --- HEADER ---
 st.title("❄️🧊 Stephanie's Snow & Ice Forecaster")
 st.markdown("#### *Enhanced Edition - Forecast • Real-time • Historical*")
 st.caption(f"Webster, NC ({ELEVATION_FT}' elevation) | {nc_time.strftime('%A, %b %d %I:%M %p')}")
+if replay_at is not None:
+    st.warning(f"⏪ **REPLAY MODE** - showing archived data as of {replay_at.strftime('%a %b %d %I:%M %p')}")
+startup_profile.mark('first_paint')
 
 ts = int(time.time())
 
-# --- DATA FUNCTIONS ---
-@st.cache_data(ttl=300)
-def get_nws_alerts():
-    try:
-        url = f"https://api.weather.gov/alerts/active?point={LAT},{LON}"
-        r = requests.get(url, headers={'User-Agent': '(webster_app)'}, timeout=10).json()
-        return r.get('features', [])
-    except: return []
+# --- TABLE FORMATS ---
+# Tables stay numeric; units and rounding are applied by the browser
+TEMP_COLUMN = st.column_config.NumberColumn(format="%.0f°F")
+PERCENT_COLUMN = st.column_config.NumberColumn(format="%.0f%%")
+DAY_COLUMN = st.column_config.DateColumn(format="ddd MM/DD")
+HOUR_COLUMN = st.column_config.DatetimeColumn(format="hh A")
 
-@st.cache_data(ttl=1800)
-def get_historical_snow(days_back=7):
-    """Get observed snowfall from past days using Open-Meteo archive"""
-    try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
-        
-        url = "https://archive-api.open-meteo.com/v1/archive"
-        params = {
-            "latitude": LAT,
-            "longitude": LON,
-            "start_date": start_date.strftime('%Y-%m-%d'),
-            "end_date": end_date.strftime('%Y-%m-%d'),
-            "daily": ["snowfall_sum", "temperature_2m_max", "temperature_2m_min", "precipitation_sum"],
-            "temperature_unit": "fahrenheit",
-            "precipitation_unit": "inch",
-            "timezone": "America/New_York"
-        }
-        
-        response = requests.get(url, params=params, timeout=10).json()
-        return response.get('daily', None)
-    except Exception as e:
-        st.warning(f"Historical data unavailable: {e}")
-        return None
+def inches_column(decimals):
+    return st.column_config.NumberColumn(format=f'%.{decimals}f"')
 
-@st.cache_data(ttl=300)
-def get_current_conditions():
-    """Get current real-time conditions"""
-    try:
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": LAT,
-            "longitude": LON,
-            "current": ["temperature_2m", "precipitation", "snowfall", "weather_code", "wind_speed_10m"],
-            "temperature_unit": "fahrenheit",
-            "precipitation_unit": "inch",
-            "wind_speed_unit": "mph",
-            "timezone": "America/New_York"
-        }
-        
-        response = requests.get(url, params=params, timeout=10).json()
-        return response.get('current', None)
-    except Exception as e:
-        st.warning(f"Current conditions unavailable: {e}")
-        return None
+# Derived products that fall back to their last good result but are not refreshable sources
+STALE_LABELS = {'power': "Power Outage Risk"}
 
-@st.cache_data(ttl=3600)
-def get_euro_snow_ice():
-    """Get ECMWF model forecast with terrain correction"""
-    try:
-        url = "https://api.open-meteo.com/v1/forecast"
-        
-        # Daily forecast
-        params_daily = {
-            "latitude": LAT, 
-            "longitude": LON, 
-            "daily": ["snowfall_sum", "rain_sum", "temperature_2m_max", "temperature_2m_min", "precipitation_sum", "sunrise", "sunset", "wind_speed_10m_max"], 
-            "timezone": "America/New_York", 
-            "temperature_unit": "fahrenheit",
-            "precipitation_unit": "inch",
-            "wind_speed_unit": "mph",
-            "forecast_days": 7
-        }
-        daily_data = requests.get(url, params=params_daily, timeout=10).json().get('daily', None)
-        
-        # Hourly forecast - expanded for general weather
-        params_hourly = {
-            "latitude": LAT,
-            "longitude": LON,
-            "hourly": ["temperature_2m", "precipitation", "rain", "snowfall", "weather_code", "apparent_temperature", 
-                       "wind_speed_10m", "wind_direction_10m", "relative_humidity_2m", "cloud_cover", "visibility",
-                       "precipitation_probability"],
-            "timezone": "America/New_York",
-            "temperature_unit": "fahrenheit",
-            "precipitation_unit": "inch",
-            "wind_speed_unit": "mph",
-            "forecast_hours": 168
-        }
-        hourly_data = requests.get(url, params=params_hourly, timeout=10).json().get('hourly', None)
-        
-        # Apply terrain correction to snow amounts
-        if hourly_data and 'snowfall' in hourly_data:
-            hourly_data['snowfall'] = [s * TERRAIN_MULTIPLIER for s in hourly_data['snowfall']]
-        
-        if daily_data and 'snowfall_sum' in daily_data:
-            daily_data['snowfall_sum'] = [s * TERRAIN_MULTIPLIER for s in daily_data['snowfall_sum']]
-        
-        return daily_data, hourly_data
-    except Exception as e:
-        st.error(f"Error fetching ECMWF forecast: {e}")
-        return None, None
+EVENT_COLUMN_CONFIG = {
+    'Start': st.column_config.DatetimeColumn(format="ddd MM/DD/YYYY hh A"),
+    'Snow': inches_column(1),
+    'Ice': inches_column(2),
+    'Peak Rate': st.column_config.NumberColumn(format='%.2f"/hr'),
+    'Min Temp': TEMP_COLUMN
+}
 
-@st.cache_data(ttl=3600)
-def get_gfs_forecast():
-    """Get GFS model forecast for comparison"""
-    try:
-        url = "https://api.open-meteo.com/v1/gfs"
-        
-        params = {
-            "latitude": LAT,
-            "longitude": LON,
-            "hourly": ["temperature_2m", "snowfall", "precipitation"],
-            "daily": ["snowfall_sum", "temperature_2m_max", "temperature_2m_min"],
-            "temperature_unit": "fahrenheit",
-            "precipitation_unit": "inch",
-            "timezone": "America/New_York",
-            "forecast_days": 7
-        }
-        
-        response = requests.get(url, params=params, timeout=10).json()
-        
-        # Apply terrain correction
-        if 'hourly' in response and 'snowfall' in response['hourly']:
-            response['hourly']['snowfall'] = [s * TERRAIN_MULTIPLIER for s in response['hourly']['snowfall']]
-        
-        if 'daily' in response and 'snowfall_sum' in response['daily']:
-            response['daily']['snowfall_sum'] = [s * TERRAIN_MULTIPLIER for s in response['daily']['snowfall_sum']]
-        
-        return response.get('daily', None), response.get('hourly', None)
-    except Exception as e:
-        st.warning(f"GFS forecast unavailable: {e}")
-        return None, None
+# --- FETCH DEADLINE ---
+# Every fetch below shares one deadline; past it, sources fall back to their last good payload
+set_deadline(PAGE_DEADLINE)
 
-def calculate_ice_accumulation(hourly_data):
-    """Calculate ice accumulation from hourly data"""
-    if not hourly_data:
-        return {}
-    
-    ice_by_day = {}
-    
-    for i in range(len(hourly_data['time'])):
-        dt = pd.to_datetime(hourly_data['time'][i])
-        day_key = dt.strftime('%Y-%m-%d')
-        
-        temp = hourly_data['temperature_2m'][i]
-        precip = hourly_data['precipitation'][i]
-        snow = hourly_data['snowfall'][i]
-        rain = hourly_data['rain'][i]
-        
-        # Ice occurs when liquid precip falls below freezing
-        ice_potential = 0
-        
-        if temp < 32 and precip > 0:
-            non_snow_precip = precip - (snow / TERRAIN_MULTIPLIER)  # Remove terrain correction for ice calc
-            
-            if non_snow_precip > 0:
-                if temp <= 20:
-                    ice_potential = non_snow_precip * 0.9
-                elif temp <= 28:
-                    ice_potential = non_snow_precip * 0.85
-                else:
-                    ice_potential = non_snow_precip * 0.8
-        
-        if day_key not in ice_by_day:
-            ice_by_day[day_key] = {
-                'ice_accum': 0,
-                'freezing_rain_hours': 0,
-                'min_temp': temp,
-                'max_temp': temp,
-                'ice_risk': 'None'
-            }
-        
-        ice_by_day[day_key]['ice_accum'] += ice_potential
-        if ice_potential > 0:
-            ice_by_day[day_key]['freezing_rain_hours'] += 1
-        ice_by_day[day_key]['min_temp'] = min(ice_by_day[day_key]['min_temp'], temp)
-        ice_by_day[day_key]['max_temp'] = max(ice_by_day[day_key]['max_temp'], temp)
-    
-    # Determine ice risk level
-    for day in ice_by_day:
-        ice_accum = ice_by_day[day]['ice_accum']
-        if ice_accum >= 0.25:
-            ice_by_day[day]['ice_risk'] = 'High'
-        elif ice_accum >= 0.10:
-            ice_by_day[day]['ice_risk'] = 'Moderate'
-        elif ice_accum > 0:
-            ice_by_day[day]['ice_risk'] = 'Low'
-    
-    return ice_by_day
+# --- ADAPTIVE REFRESH ---
+# Clears sources whose age passed the weather- and quota-dependent TTL before anything reads them
+regime, active_ttl, _ = apply_adaptive_ttls()
 
-def get_weather_description(code):
-    """Convert weather code to description"""
-    weather_codes = {
-        0: "Clear", 1: "Mainly Clear", 2: "Partly Cloudy", 3: "Overcast",
-        45: "Foggy", 48: "Rime Fog",
-        51: "Light Drizzle", 53: "Drizzle", 55: "Heavy Drizzle",
-        61: "Light Rain", 63: "Rain", 65: "Heavy Rain",
-        71: "Light Snow", 73: "Snow", 75: "Heavy Snow",
-        77: "Snow Grains", 80: "Light Showers", 81: "Showers", 82: "Heavy Showers",
-        85: "Light Snow Showers", 86: "Snow Showers",
-        95: "Thunderstorm", 96: "Thunderstorm w/ Hail", 99: "Heavy Thunderstorm w/ Hail"
-    }
-    return weather_codes.get(code, "Unknown")
+with st.sidebar:
+    with st.expander("📡 API Budget"):
+        st.caption(f"Weather regime: **{regime}**")
+        for upstream, usage in budget.report().items():
+            st.progress(min(usage['used'] / usage['quota'], 1.0),
+                        text=f"{upstream}: {usage['used']:,} / {usage['quota']:,} calls today")
+        for upstream, retry_in in breaker.report().items():
+            st.caption(f"🔌 {upstream} failing - paused, retrying in {retry_in:.0f}s")
+        for name, source in SOURCES.items():
+            ttl = active_ttl.get(name)
+            if ttl is None:
+                every = "on each new model run"
+            else:
+                every = "paused (quota)" if ttl == float('inf') else f"every {ttl / 60:.0f} min"
+            st.caption(f"{source['label']}: {every}")
+
+# --- REPLAYED DATA ---
+if replay_at is not None:
+    replayed = archive.state_at(replay_at.timestamp() + 59.999, ['alerts', 'history:7', 'current', 'ecmwf', 'gfs'])
+
+with st.sidebar:
+    with st.expander("🧠 Cache Memory"):
+        stats = pd.DataFrame(cache_stats())
+        total = stats.iloc[-1]
+        st.progress(min(total['bytes'] / total['max_bytes'], 1.0),
+                    text=f"{total['bytes'] / 1024 / 1024:.1f} / {total['max_bytes'] / 1024 / 1024:.0f} MB, "
+                         f"{total['entries']} entries, {total['evictions']} evictions")
+        st.dataframe(stats[['function', 'entries', 'bytes', 'hits', 'misses', 'evictions']],
+                     use_container_width=True, hide_index=True,
+                     column_config={'bytes': st.column_config.NumberColumn(format="%d B")})
+
+from watch_rules import (
+    watch_book, evaluate_watches, PRODUCTS as WATCH_PRODUCTS, OPS as WATCH_OPS,
+    LOCATIONS as WATCH_LOCATIONS, DEFAULT_HOURS, MAX_HOURS
+)
+
+with st.sidebar:
+    with st.expander("🔔 Watch Rules"):
+        subscriber = st.text_input("Your name", key='watch_subscriber').strip()
+        if subscriber:
+            product = st.selectbox("Product", list(WATCH_PRODUCTS), format_func=lambda p: WATCH_PRODUCTS[p]['label'])
+            spec = WATCH_PRODUCTS[product]
+            location = st.selectbox("Location", [LOCATION_NAME] if product == 'travel' else list(WATCH_LOCATIONS))
+            op = st.selectbox("When", WATCH_OPS, index=WATCH_OPS.index('>='))
+            if 'levels' in spec:
+                threshold = st.selectbox("Level", spec['levels'], index=len(spec['levels']) // 2)
+            else:
+                threshold = st.number_input(f"Threshold ({spec['unit']})", min_value=0.0, value=1.0, step=0.1)
+            hours = st.number_input("Over the next (hours)", 1, MAX_HOURS, DEFAULT_HOURS) if spec['windowed'] else 0
+            if st.button("➕ Add watch"):
+                watch_book.add_rule(subscriber, product, location, op, threshold, hours)
+            for rule in watch_book.rules(subscriber):
+                col1, col2 = st.columns([5, 1])
+                col1.caption(("🔔 " if rule['active'] else "") + rule['description'])
+                col2.button("✖", key=f"unwatch_{rule['id']}", on_click=watch_book.remove_rule,
+                            args=(rule['id'], subscriber))
+            for sent_at, message in watch_book.notifications(subscriber, limit=5):
+                sent = pd.Timestamp(sent_at, unit='s', tz='UTC').tz_convert('US/Eastern')
+                st.caption(f"{sent.strftime('%a %I:%M %p')} - {message}")
 
 # --- ALERT BANNER ---
-alerts = get_nws_alerts()
+alerts = (replayed['alerts'] or []) if replay_at is not None else get_nws_alerts()
 if alerts:
     for alert in alerts[:3]:
         props = alert['properties']
@@ -314,19 +254,55 @@ if alerts:
         """, unsafe_allow_html=True)
 
 # --- FETCH ALL DATA ---
-with st.spinner("Loading comprehensive weather data..."):
-    # Historical
-    historical = get_historical_snow(days_back=7)
-    
-    # Current
-    current = get_current_conditions()
-    
-    # Forecast - ECMWF
-    euro_daily, euro_hourly = get_euro_snow_ice()
-    ice_data = calculate_ice_accumulation(euro_hourly) if euro_hourly else {}
-    
-    # Forecast - GFS
-    gfs_daily, gfs_hourly = get_gfs_forecast()
+# Model requests cover only the fields the dashboard's views read (field_registry)
+activate(*DASHBOARD_VIEWS)
+from station_observations import poll_station_observations, latest_observation, daily_observed
+
+if replay_at is not None:
+    historical = replayed['history:7']
+    current = replayed['current']
+    euro_daily, euro_hourly = replayed['ecmwf'] or (None, None)
+    ice_data = calculate_ice_accumulation(euro_hourly, 'ecmwf') if euro_hourly else {}
+    gfs_daily, gfs_hourly = replayed['gfs'] or (None, None)
+else:
+    with st.spinner("Loading comprehensive weather data..."):
+        # Historical
+        historical = get_historical_snow(days_back=7)
+        
+        # Current
+        current = get_current_conditions()
+        
+        # Forecast - ECMWF
+        euro_daily, euro_hourly = get_euro_snow_ice()
+        ice_data = calculate_ice_accumulation(euro_hourly, 'ecmwf') if euro_hourly else {}
+        
+        # Forecast - GFS
+        gfs_daily, gfs_hourly = get_gfs_forecast()
+        
+        # Station observations (incremental poll)
+        poll_station_observations()
+
+euro_hourly_df = hourly_frame(euro_hourly) if euro_hourly else None
+euro_ptype = hourly_precip_type(euro_hourly, 'ecmwf')  # None without pressure-level data (e.g. older archived runs)
+startup_profile.mark('data')
+
+# Watches whose inputs just refreshed; this viewer's own show up as toasts
+if replay_at is None:
+    for note in evaluate_watches():
+        if note['subscriber'] == st.session_state.get('watch_subscriber', '').strip():
+            st.toast(note['message'], icon="🔔")
+
+# Staleness badge for sources served from their last good payload; filled in at the end of the
+# run, since the corridor, grid and power tabs fetch their sources further down
+stale_badge = st.empty()
+
+# Model run labels: live metadata, or the run stamped on the replayed payload
+if replay_at is not None:
+    euro_run = (euro_daily or {}).get('model_run')
+    gfs_run = (gfs_daily or {}).get('model_run')
+else:
+    euro_run = get_model_run('ecmwf')
+    gfs_run = get_model_run('gfs')
 
 # --- CURRENT CONDITIONS BANNER ---
 if current:
@@ -352,14 +328,29 @@ if current:
         precip = current.get('precipitation', 0)
         st.metric("Precip Rate", f"{precip:.2f}\" /hr")
 
+# Latest real station reading (live only; replay shows the archived model data)
+if replay_at is None:
+    station, reading = latest_observation()
+    if reading:
+        minutes_ago = int((nc_time - reading['time']).total_seconds() // 60)
+        parts = [f"{reading['temperature']:.0f}°F" if pd.notna(reading['temperature']) else None,
+                 reading['weather'],
+                 f"wind {wind_direction_text(reading['wind_direction'])} {reading['wind_speed']:.0f} mph"
+                 if pd.notna(reading['wind_speed']) and pd.notna(reading['wind_direction']) else None,
+                 f"vis {reading['visibility_mi']:.1f} mi" if pd.notna(reading['visibility_mi']) else None]
+        st.caption(f"📍 Observed at **{station['id']}** ({station['name']}, {station['distance_km']:.0f} km) "
+                   f"{minutes_ago} min ago: " + ", ".join(p for p in parts if p))
+
 st.markdown("---")
 
 # --- TABS ---
-tab_historical, tab_forecast, tab_weather, tab_comparison, tab_ice, tab_roads, tab_power, tab_radar = st.tabs([
+tab_historical, tab_forecast, tab_weather, tab_comparison, tab_extended, tab_map, tab_ice, tab_roads, tab_power, tab_radar = st.tabs([
     "📊 Historical (Observed)",
     "❄️ Forecast", 
     "🌤️ General Weather",
     "📈 Model Comparison",
+    "📆 Extended Range",
+    "🗺️ County Map",
     "🧊 Ice Analysis", 
     "🚗 Road Conditions",
     "⚡ Power Status",
@@ -372,10 +363,18 @@ with tab_historical:
     st.caption("*Observed snowfall from weather station data*")
     
     if historical:
+        df_hist = pd.DataFrame({
+            'Date': pd.to_datetime(historical['time']),
+            'Snow (Observed)': historical['snowfall_sum'],
+            'High': historical['temperature_2m_max'],
+            'Low': historical['temperature_2m_min']
+        })
+        df_hist['Category'] = snow_category(df_hist['Snow (Observed)'])
+        
         # Calculate totals
-        total_snow_observed = sum(historical['snowfall_sum'])
-        max_daily = max(historical['snowfall_sum'])
-        snow_days = sum([1 for s in historical['snowfall_sum'] if s > 0.1])
+        total_snow_observed = df_hist['Snow (Observed)'].sum()
+        max_daily = df_hist['Snow (Observed)'].max()
+        snow_days = int((df_hist['Snow (Observed)'] > 0.1).sum())
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -388,33 +387,12 @@ with tab_historical:
         st.markdown("---")
         
         # Historical table
-        hist_data = []
-        for i in range(len(historical['time'])):
-            date = pd.to_datetime(historical['time'][i])
-            snow = historical['snowfall_sum'][i]
-            temp_high = historical['temperature_2m_max'][i]
-            temp_low = historical['temperature_2m_min'][i]
-            
-            # Snow indicator
-            if snow >= 3.0:
-                indicator = "🔴 Heavy"
-            elif snow >= 1.0:
-                indicator = "🟡 Moderate"
-            elif snow > 0.1:
-                indicator = "🔵 Light"
-            else:
-                indicator = "⚪ None"
-            
-            hist_data.append({
-                'Date': date.strftime('%a %m/%d'),
-                'Snow (Observed)': f"{snow:.1f}\"",
-                'High': f"{temp_high:.0f}°F",
-                'Low': f"{temp_low:.0f}°F",
-                'Category': indicator
-            })
-        
-        df_hist = pd.DataFrame(hist_data)
-        st.dataframe(df_hist, use_container_width=True, hide_index=True)
+        st.dataframe(df_hist, use_container_width=True, hide_index=True, column_config={
+            'Date': DAY_COLUMN,
+            'Snow (Observed)': inches_column(1),
+            'High': TEMP_COLUMN,
+            'Low': TEMP_COLUMN
+        })
         
         st.markdown("---")
         
@@ -423,14 +401,11 @@ with tab_historical:
         
         fig_hist = go.Figure()
         
-        dates = [pd.to_datetime(d).strftime('%a %m/%d') for d in historical['time']]
-        snow_amounts = historical['snowfall_sum']
-        
         fig_hist.add_trace(go.Bar(
-            x=dates,
-            y=snow_amounts,
+            x=df_hist['Date'].dt.strftime('%a %m/%d'),
+            y=df_hist['Snow (Observed)'],
             marker_color='#7B68EE',
-            text=[f"{s:.1f}\"" for s in snow_amounts],
+            texttemplate='%{y:.1f}"',
             textposition='outside',
             name='Observed Snow'
         ))
@@ -451,25 +426,66 @@ with tab_historical:
         
     else:
         st.error("❌ Historical data unavailable")
+    
+    st.markdown("---")
+    
+    # NWS station observations
+    st.markdown("#### 🛰️ Station Observations (NWS)")
+    st.caption("*Measured at the nearest reporting ASOS/AWOS station - stations report precipitation, not snow depth*")
+    
+    station_daily = daily_observed(7)
+    if not station_daily.empty:
+        st.caption(f"Station: {station_daily['station'].iloc[0]}")
+        st.dataframe(station_daily[['date', 'high', 'low', 'precip', 'snow_hours']], use_container_width=True,
+                     hide_index=True, column_config={
+            'date': st.column_config.DateColumn("Date", format="ddd MM/DD"),
+            'high': st.column_config.NumberColumn("High", format="%.0f°F"),
+            'low': st.column_config.NumberColumn("Low", format="%.0f°F"),
+            'precip': st.column_config.NumberColumn("Precip (liquid)", format='%.2f"'),
+            'snow_hours': st.column_config.NumberColumn("Hours with Snow")
+        })
+    else:
+        st.caption("No station observations stored yet")
+    
+    st.markdown("---")
+    
+    # Storm event index
+    st.markdown("#### 🌨️ Past Storm Events")
+    st.caption("*Snow and ice events detected from hourly observations since the archive start*")
+    
+    from storm_events import event_index, refresh_event_index, event_index_updating, format_events
+    refresh_event_index()
+    if event_index_updating():
+        st.caption("⏳ Updating the event index in the background; new events appear on the next refresh")
+    col1, col2 = st.columns(2)
+    with col1:
+        min_event_snow = st.number_input("Minimum snow (inches)", min_value=0.0, value=4.0, step=0.5)
+    with col2:
+        min_event_ice = st.number_input("Minimum ice (inches)", min_value=0.0, value=0.0, step=0.05)
+    
+    past_events = event_index.events_over(min_event_snow, min_event_ice)
+    if not past_events.empty:
+        st.dataframe(format_events(past_events), use_container_width=True, hide_index=True, column_config=EVENT_COLUMN_CONFIG)
+    else:
+        st.caption("No matching events in the index yet")
 
 # --- TAB 2: FORECAST ---
 with tab_forecast:
     st.markdown("### ❄️ ECMWF Snow Forecast (Terrain Corrected)")
     st.caption(f"*Enhanced with {int((TERRAIN_MULTIPLIER-1)*100)}% terrain multiplier for {ELEVATION_FT}' elevation*")
+    st.caption(f"ECMWF run: {model_run_label(euro_run)}")
     
     if euro_daily and euro_hourly:
         # Calculate today's remaining snow
-        now = pd.Timestamp.now(tz='US/Eastern')
+        now = nc_time
         today_key = now.strftime('%Y-%m-%d')
         
-        today_remaining_snow = 0
-        for i in range(len(euro_hourly['time'])):
-            hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-            if hour_dt >= now and hour_dt.strftime('%Y-%m-%d') == today_key:
-                today_remaining_snow += euro_hourly['snowfall'][i]
+        hour_day = euro_hourly_df['time'].dt.strftime('%Y-%m-%d')
+        upcoming = euro_hourly_df['time'] >= now
+        today_remaining_snow = euro_hourly_df.loc[upcoming & (hour_day == today_key), 'snowfall'].sum()
         
         # 7-day total
-        total_snow = sum([euro_hourly['snowfall'][i] for i in range(min(168, len(euro_hourly['snowfall'])))])
+        total_snow = euro_hourly_df['snowfall'].iloc[:168].sum()
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -480,12 +496,8 @@ with tab_forecast:
                      help="Terrain-corrected total")
         with col3:
             # Time until next snow
-            next_snow_time = None
-            for i in range(len(euro_hourly['time'])):
-                hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-                if hour_dt >= now and euro_hourly['snowfall'][i] > 0.01:
-                    next_snow_time = hour_dt
-                    break
+            snowy_hours = euro_hourly_df.loc[upcoming & (euro_hourly_df['snowfall'] > 0.01), 'time']
+            next_snow_time = snowy_hours.iloc[0] if len(snowy_hours) else None
             
             if next_snow_time:
                 hours_until = int((next_snow_time - now).total_seconds() / 3600)
@@ -501,59 +513,40 @@ with tab_forecast:
         # HOURLY FORECAST - Next 12 Hours
         st.markdown("#### ⏰ Next 12 Hours - Detailed Forecast")
         
-        hourly_forecast = []
-        
-        for i in range(min(12, len(euro_hourly['time']))):
-            hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-            
-            if hour_dt < now:
-                continue
-                
-            temp = euro_hourly['temperature_2m'][i]
-            feels_like = euro_hourly['apparent_temperature'][i]
-            snow = euro_hourly['snowfall'][i]
-            rain = euro_hourly['rain'][i]
-            precip = euro_hourly['precipitation'][i]
-            weather_code = euro_hourly.get('weather_code', [0] * len(euro_hourly['time']))[i]
-            
-            # Determine precipitation type
-            if temp < 32 and precip > 0:
-                if snow > 0:
-                    precip_type = "❄️ Snow"
-                    amount = f"{snow:.2f}\""
-                elif rain > 0:
-                    precip_type = "🧊 Freezing Rain"
-                    amount = f"{rain:.2f}\""
-                else:
-                    precip_type = "🌨️ Mix"
-                    amount = f"{precip:.2f}\""
-            elif rain > 0:
-                precip_type = "🌧️ Rain"
-                amount = f"{rain:.2f}\""
-            elif snow > 0:
-                precip_type = "❄️ Snow"
-                amount = f"{snow:.2f}\""
-            else:
-                precip_type = "—"
-                amount = "—"
-            
-            conditions = get_weather_description(weather_code)
-            
-            hourly_forecast.append({
-                'Time': hour_dt.strftime('%I %p'),
-                'Temp': f"{temp:.0f}°F",
-                'Feels Like': f"{feels_like:.0f}°F",
-                'Conditions': conditions,
-                'Precip Type': precip_type,
-                'Amount': amount
+        window = euro_hourly_df.iloc[:12]
+        window = window[window['time'] >= now]
+        
+        # Determine precipitation type
+        snow = window['snowfall']
+        rain = window['rain']
+        precip = window['precipitation']
+        freezing = (window['temperature_2m'] < 32) & (precip > 0)
+        precip_rules = [freezing & (snow > 0), freezing & (rain > 0), freezing, rain > 0, snow > 0]
+        precip_type = np.select(precip_rules, ["❄️ Snow", "🧊 Freezing Rain", "🌨️ Mix", "🌧️ Rain", "❄️ Snow"], default="—")
+        amount = np.select(precip_rules, [snow, rain, precip, rain, snow], default=np.nan)
+        if euro_ptype is not None:
+            # Profile-based type (warm nose, refreezing layer) wherever the hour has a profile
+            ptype = euro_ptype[window.index]
+            profiled = (ptype != UNKNOWN) & (precip > 0).to_numpy()
+            precip_type = np.where(profiled, np.array(PTYPE_LABELS)[ptype.clip(0)], precip_type)
+            amount = np.where(profiled, np.where(ptype == SNOW, snow, precip), amount)
+        
+        df_hourly = pd.DataFrame({
+            'Time': window['time'],
+            'Temp': window['temperature_2m'],
+            'Feels Like': window['apparent_temperature'],
+            'Conditions': weather_descriptions(window.get('weather_code', 0)),
+            'Precip Type': precip_type,
+            'Amount': amount
+        })
+        
+        if not df_hourly.empty:
+            st.dataframe(df_hourly, use_container_width=True, hide_index=True, column_config={
+                'Time': HOUR_COLUMN,
+                'Temp': TEMP_COLUMN,
+                'Feels Like': TEMP_COLUMN,
+                'Amount': inches_column(2)
             })
-            
-            if len(hourly_forecast) >= 12:
-                break
-        
-        if hourly_forecast:
-            df_hourly = pd.DataFrame(hourly_forecast)
-            st.dataframe(df_hourly, use_container_width=True, hide_index=True)
         
         st.markdown("---")
         
@@ -561,49 +554,27 @@ with tab_forecast:
         st.markdown("#### 📅 7-Day Daily Breakdown")
         
         # Calculate daily totals from hourly
-        daily_totals = {}
-        for i in range(len(euro_hourly['time'])):
-            hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-            day_key = hour_dt.strftime('%Y-%m-%d')
-            
-            if day_key not in daily_totals:
-                daily_totals[day_key] = {'snow': 0, 'rain': 0}
-            
-            daily_totals[day_key]['snow'] += euro_hourly['snowfall'][i]
-            daily_totals[day_key]['rain'] += euro_hourly['rain'][i]
-        
-        daily_data = []
-        for i in range(min(7, len(euro_daily['time']))):
-            day_date = pd.to_datetime(euro_daily['time'][i])
-            day_key = day_date.strftime('%Y-%m-%d')
-            
-            snow = daily_totals.get(day_key, {}).get('snow', 0)
-            temp_high = euro_daily['temperature_2m_max'][i]
-            temp_low = euro_daily['temperature_2m_min'][i]
-            
-            if snow >= 3.0:
-                indicator = "🔴 Heavy"
-            elif snow >= 1.0:
-                indicator = "🟡 Moderate"
-            elif snow > 0.05:
-                indicator = "🔵 Light"
-            else:
-                indicator = "⚪ None"
-            
-            ice_indicator = ""
-            if day_key in ice_data and ice_data[day_key]['ice_accum'] > 0:
-                ice_indicator = " 🧊"
-            
-            daily_data.append({
-                'Date': day_date.strftime('%a %m/%d'),
-                'Snowfall': f"{snow:.1f}\"",
-                'High': f"{temp_high:.0f}°F",
-                'Low': f"{temp_low:.0f}°F",
-                'Type': indicator + ice_indicator
-            })
-        
-        df_daily = pd.DataFrame(daily_data)
-        st.dataframe(df_daily, use_container_width=True, hide_index=True)
+        daily_totals = euro_hourly_df.groupby(hour_day)[['snowfall', 'rain']].sum()
+        
+        days = pd.to_datetime(euro_daily['time'][:7])
+        day_keys = days.strftime('%Y-%m-%d')
+        ice_days = [day for day in ice_data if ice_data[day]['ice_accum'] > 0]
+        
+        df_daily = pd.DataFrame({
+            'Date': days,
+            'Snowfall': daily_totals['snowfall'].reindex(day_keys, fill_value=0).to_numpy(),
+            'High': euro_daily['temperature_2m_max'][:7],
+            'Low': euro_daily['temperature_2m_min'][:7]
+        })
+        df_daily['Type'] = snow_category(df_daily['Snowfall'], 0.05)
+        df_daily['Type'] += np.where(day_keys.isin(ice_days), " 🧊", "")
+        
+        st.dataframe(df_daily, use_container_width=True, hide_index=True, column_config={
+            'Date': DAY_COLUMN,
+            'Snowfall': inches_column(1),
+            'High': TEMP_COLUMN,
+            'Low': TEMP_COLUMN
+        })
         
         st.markdown("---")
         
@@ -612,21 +583,11 @@ with tab_forecast:
         
         fig = go.Figure()
         
-        chart_dates = []
-        chart_snow = []
-        for i in range(min(7, len(euro_daily['time']))):
-            day_date = pd.to_datetime(euro_daily['time'][i])
-            day_key = day_date.strftime('%Y-%m-%d')
-            snow_amount = daily_totals.get(day_key, {}).get('snow', 0)
-            
-            chart_dates.append(day_date.strftime('%a %m/%d'))
-            chart_snow.append(snow_amount)
-        
         fig.add_trace(go.Bar(
-            x=chart_dates,
-            y=chart_snow,
+            x=days.strftime('%a %m/%d'),
+            y=df_daily['Snowfall'],
             marker_color='#4ECDC4',
-            text=[f"{s:.1f}\"" for s in chart_snow],
+            texttemplate='%{y:.1f}"',
             textposition='outside',
             name='Forecast Snow'
         ))
@@ -643,6 +604,27 @@ with tab_forecast:
         
         st.plotly_chart(fig, use_container_width=True)
         
+        # Past storms (observed, and earlier forecasts with what then fell) shaped like this one
+        st.markdown("---")
+        st.markdown("#### 🔎 Analog Storms")
+        from storm_analogs import refresh_analog_index, find_analogs, format_analogs
+        refresh_analog_index()
+        storm, analogs = find_analogs(euro_hourly)
+        if storm is None:
+            st.caption("No storm in this forecast to match")
+        elif analogs.empty:
+            st.caption("No past storms indexed yet")
+        else:
+            storm_start = pd.Timestamp(storm['start'], unit='s', tz='UTC').tz_convert('US/Eastern')
+            st.caption(f"Closest past storms to the one starting {storm_start.strftime('%a %m/%d %I %p')} "
+                       f"({storm['total_snow']:.1f}\" raw model snow, {storm['total_ice']:.2f}\" ice) by their "
+                       f"hour-by-hour temperature, snow, precipitation and wind. Snow and Ice are what was observed.")
+            st.dataframe(format_analogs(analogs), use_container_width=True, hide_index=True, column_config={
+                **EVENT_COLUMN_CONFIG,
+                'Distance': st.column_config.NumberColumn(format='%.2f'),
+                'Forecast Snow': inches_column(1)
+            })
+        
     else:
         st.error("❌ Forecast data unavailable")
 
@@ -683,54 +665,36 @@ with tab_weather:
         # 24-Hour Detailed Forecast
         st.markdown("#### ⏰ Next 24 Hours - Hour by Hour")
         
-        now = pd.Timestamp.now(tz='US/Eastern')
-        weather_24hr = []
-        
-        for i in range(min(24, len(euro_hourly['time']))):
-            hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-            
-            if hour_dt < now:
-                continue
-            
-            temp = euro_hourly['temperature_2m'][i]
-            feels_like = euro_hourly['apparent_temperature'][i]
-            rain = euro_hourly.get('rain', [0] * len(euro_hourly['time']))[i]
-            precip_prob = euro_hourly.get('precipitation_probability', [0] * len(euro_hourly['time']))[i]
-            wind_speed = euro_hourly.get('wind_speed_10m', [0] * len(euro_hourly['time']))[i]
-            wind_dir = euro_hourly.get('wind_direction_10m', [0] * len(euro_hourly['time']))[i]
-            humidity = euro_hourly.get('relative_humidity_2m', [0] * len(euro_hourly['time']))[i]
-            clouds = euro_hourly.get('cloud_cover', [0] * len(euro_hourly['time']))[i]
-            weather_code = euro_hourly.get('weather_code', [0] * len(euro_hourly['time']))[i]
-            
-            # Wind direction
-            def wind_direction_text(degrees):
-                dirs = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 
-                       'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
-                ix = round(degrees / (360. / len(dirs)))
-                return dirs[ix % len(dirs)]
-            
-            wind_text = f"{wind_direction_text(wind_dir)} {wind_speed:.0f}"
-            
-            conditions = get_weather_description(weather_code)
-            
-            weather_24hr.append({
-                'Time': hour_dt.strftime('%I %p'),
-                'Temp': f"{temp:.0f}°F",
-                'Feels': f"{feels_like:.0f}°F",
-                'Conditions': conditions,
-                'Rain': f"{rain:.2f}\"" if rain > 0 else "—",
-                'Rain %': f"{precip_prob:.0f}%" if precip_prob > 0 else "—",
-                'Wind': wind_text + " mph",
-                'Humidity': f"{humidity:.0f}%",
-                'Clouds': f"{clouds:.0f}%"
+        now = nc_time
+        window = euro_hourly_df.iloc[:24]
+        window = window[window['time'] >= now]
+        
+        df_weather = pd.DataFrame({
+            'Time': window['time'],
+            'Temp': window['temperature_2m'],
+            'Feels': window['apparent_temperature'],
+            'Conditions': weather_descriptions(window.get('weather_code', 0)),
+            'Rain': window.get('rain', 0),
+            'Rain %': window.get('precipitation_probability', 0),
+            'Wind Dir': wind_direction_text(window.get('wind_direction_10m', 0)),
+            'Wind': window.get('wind_speed_10m', 0),
+            'Humidity': window.get('relative_humidity_2m', 0),
+            'Clouds': window.get('cloud_cover', 0)
+        })
+        # Blank out dry hours like the original "—" cells
+        df_weather[['Rain', 'Rain %']] = df_weather[['Rain', 'Rain %']].where(df_weather[['Rain', 'Rain %']] > 0)
+        
+        if not df_weather.empty:
+            st.dataframe(df_weather, use_container_width=True, hide_index=True, column_config={
+                'Time': HOUR_COLUMN,
+                'Temp': TEMP_COLUMN,
+                'Feels': TEMP_COLUMN,
+                'Rain': inches_column(2),
+                'Rain %': PERCENT_COLUMN,
+                'Wind': st.column_config.NumberColumn(format="%.0f mph"),
+                'Humidity': PERCENT_COLUMN,
+                'Clouds': PERCENT_COLUMN
             })
-            
-            if len(weather_24hr) >= 24:
-                break
-        
-        if weather_24hr:
-            df_weather = pd.DataFrame(weather_24hr)
-            st.dataframe(df_weather, use_container_width=True, hide_index=True)
         
         st.markdown("---")
         
@@ -739,25 +703,11 @@ with tab_weather:
         
         fig_temp = go.Figure()
         
-        temp_times = []
-        temps = []
-        feels_temps = []
-        
-        for i in range(min(24, len(euro_hourly['time']))):
-            hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-            if hour_dt < now:
-                continue
-                
-            temp_times.append(hour_dt.strftime('%I %p'))
-            temps.append(euro_hourly['temperature_2m'][i])
-            feels_temps.append(euro_hourly['apparent_temperature'][i])
-            
-            if len(temp_times) >= 24:
-                break
+        temp_times = window['time'].dt.strftime('%I %p')
         
         fig_temp.add_trace(go.Scatter(
             x=temp_times,
-            y=temps,
+            y=window['temperature_2m'],
             mode='lines+markers',
             name='Actual Temp',
             line=dict(color='#FF6B6B', width=3),
@@ -766,7 +716,7 @@ with tab_weather:
         
         fig_temp.add_trace(go.Scatter(
             x=temp_times,
-            y=feels_temps,
+            y=window['apparent_temperature'],
             mode='lines+markers',
             name='Feels Like',
             line=dict(color='#4ECDC4', width=2, dash='dot'),
@@ -792,27 +742,18 @@ with tab_weather:
         # Precipitation & Wind Chart
         st.markdown("#### 🌧️ Precipitation & Wind - Next 24 Hours")
         
+        # Only this view needs subplots; importing here keeps it off the cold-start path
+        from plotly.subplots import make_subplots
+        
         fig_precip = make_subplots(
             rows=2, cols=1,
             subplot_titles=('Precipitation', 'Wind Speed'),
             vertical_spacing=0.12
         )
         
-        precip_times = []
-        precip_amounts = []
-        wind_speeds = []
-        
-        for i in range(min(24, len(euro_hourly['time']))):
-            hour_dt = pd.to_datetime(euro_hourly['time'][i], utc=True).tz_convert('US/Eastern')
-            if hour_dt < now:
-                continue
-                
-            precip_times.append(hour_dt.strftime('%I %p'))
-            precip_amounts.append(euro_hourly.get('rain', [0] * len(euro_hourly['time']))[i])
-            wind_speeds.append(euro_hourly.get('wind_speed_10m', [0] * len(euro_hourly['time']))[i])
-            
-            if len(precip_times) >= 24:
-                break
+        precip_times = temp_times
+        precip_amounts = df_weather['Rain'].fillna(0)
+        wind_speeds = df_weather['Wind']
         
         # Precipitation bars
         fig_precip.add_trace(
@@ -859,11 +800,12 @@ with tab_weather:
 with tab_comparison:
     st.markdown("### 📈 ECMWF vs GFS Model Comparison")
     st.caption("*Comparing European and American forecast models (both terrain-corrected)*")
+    st.caption(f"ECMWF run: {model_run_label(euro_run)} | GFS run: {model_run_label(gfs_run)}")
     
     if euro_daily and gfs_daily:
         # Calculate totals
-        euro_total = sum(euro_daily['snowfall_sum'])
-        gfs_total = sum(gfs_daily['snowfall_sum'])
+        euro_total = sum(euro_daily['snowfall_sum'][:7])
+        gfs_total = sum(gfs_daily['snowfall_sum'][:7])
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -880,7 +822,7 @@ with tab_comparison:
         # Comparison chart
         st.markdown("#### 📊 Side-by-Side Forecast")
         
-        fig_compare = make_subplots(specs=[[{"secondary_y": False}]])
+        fig_compare = go.Figure()
         
         euro_dates = [pd.to_datetime(d).strftime('%a %m/%d') for d in euro_daily['time'][:7]]
         euro_snow = euro_daily['snowfall_sum'][:7]
@@ -891,7 +833,7 @@ with tab_comparison:
             y=euro_snow,
             name='ECMWF',
             marker_color='#4ECDC4',
-            text=[f"{s:.1f}\"" for s in euro_snow],
+            texttemplate='%{y:.1f}"',
             textposition='outside'
         ))
         
@@ -900,7 +842,7 @@ with tab_comparison:
             y=gfs_snow,
             name='GFS',
             marker_color='#FF6B6B',
-            text=[f"{s:.1f}\"" for s in gfs_snow],
+            texttemplate='%{y:.1f}"',
             textposition='outside'
         ))
         
@@ -922,7 +864,159 @@ with tab_comparison:
     else:
         st.warning("Model comparison data unavailable")
 
-# --- TAB 5: ICE ANALYSIS ---
+# --- TAB 5: EXTENDED RANGE ---
+def window_slider(label, times, key):
+    """Visible time window for a long chart; the chart is downsampled to this window only"""
+    first = times.iloc[0].tz_localize(None).to_pydatetime()
+    last = times.iloc[-1].tz_localize(None).to_pydatetime()
+    start, end = st.slider(label, min_value=first, max_value=last, value=(first, last),
+                           step=pd.Timedelta(hours=1).to_pytimedelta(), format="MM/DD hA", key=key)
+    tz = times.dt.tz
+    return pd.Timestamp(start).tz_localize(tz), pd.Timestamp(end).tz_localize(tz)
+
+def long_range_figure(series, title, temp_column, precip_columns):
+    """Two-panel WebGL chart: temperature on top, precipitation amounts below"""
+    # Only the long-range views need subplots; importing here keeps it off the cold-start path
+    from plotly.subplots import make_subplots
+    
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        row_heights=[0.55, 0.45], subplot_titles=('Temperature', 'Precipitation'))
+    times, values = series[temp_column]
+    fig.add_trace(go.Scattergl(x=times, y=values, mode='lines', name='Temperature',
+                               line=dict(color='#FF6B6B', width=1.5)), row=1, col=1)
+    for column, (name, color) in precip_columns.items():
+        times, values = series[column]
+        fig.add_trace(go.Scattergl(x=times, y=values, mode='lines', name=name,
+                                   line=dict(color=color, width=1.5), fill='tozeroy'), row=2, col=1)
+    fig.add_hline(y=32, line=dict(color='#4ECDC4', dash='dot', width=1), row=1, col=1)
+    fig.update_yaxes(title_text="°F", row=1, col=1)
+    fig.update_yaxes(title_text="inches/hr", row=2, col=1)
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'),
+        height=550,
+        title=title,
+        hovermode='x unified',
+        legend=dict(x=0.02, y=0.98)
+    )
+    return fig
+
+with tab_extended:
+    st.markdown("### 📆 Extended Range - GFS 16 Days")
+    st.caption(f"*Hourly GFS out to 384 hours (terrain corrected). GFS run: {model_run_label(gfs_run)}*")
+    
+    if gfs_hourly:
+        gfs_hourly_df = hourly_frame(gfs_hourly)
+        late_snow = gfs_hourly_df.loc[gfs_hourly_df.index >= 168, 'snowfall'].sum()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("16-Day Snow", f"{gfs_hourly_df['snowfall'].sum():.1f}\"")
+        with col2:
+            st.metric("Days 8-16", f"{late_snow:.1f}\"", help="Low skill at this range - watch for trends, not amounts")
+        with col3:
+            st.metric("Coldest Hour", f"{gfs_hourly_df['temperature_2m'].min():.0f}°F")
+        
+        window = window_slider("Visible range", gfs_hourly_df['time'], key='extended_window')
+        series = downsample_series(gfs_hourly_df, 'time', ['temperature_2m', 'snowfall', 'precipitation'], window)
+        st.plotly_chart(long_range_figure(
+            series, "GFS Hourly Outlook", 'temperature_2m',
+            {'precipitation': ('Precip', '#95E1D3'), 'snowfall': ('Snow', '#7B68EE')}
+        ), use_container_width=True)
+    else:
+        st.warning("Extended GFS forecast unavailable")
+    
+    st.markdown("---")
+    
+    from storm_events import get_season_observations, season_start
+    st.markdown(f"### 🗓️ Season So Far - Since {season_start().strftime('%b %d, %Y')}")
+    st.caption(f"*Hourly observed history; charts keep the shape of up to {MAX_CHART_POINTS:,} points per line "
+               "and show every hour once the window is narrow enough*")
+    
+    season = get_season_observations()
+    if not season.empty:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Season Snow", f"{season['snowfall'].sum():.1f}\"", "Observed")
+        with col2:
+            st.metric("Snowy Hours", int((season['snowfall'] > 0).sum()))
+        with col3:
+            st.metric("Coldest Hour", f"{season['temperature_2m'].min():.0f}°F")
+        
+        window = window_slider("Visible range", season['time'], key='season_window')
+        series = downsample_series(season, 'time', ['temperature_2m', 'snowfall', 'precipitation'], window)
+        st.plotly_chart(long_range_figure(
+            series, "Observed Hourly - Season", 'temperature_2m',
+            {'precipitation': ('Precip', '#95E1D3'), 'snowfall': ('Snow', '#7B68EE')}
+        ), use_container_width=True)
+    else:
+        st.caption("No observations for this season yet")
+
+# --- TAB 6: COUNTY MAP ---
+with tab_map:
+    from snow_grid import get_snow_grid, grid_totals, LATS, LONS, POINTS as GRID_POINTS, GRID_TOWNS, GRID_HOURS
+    st.markdown("### 🗺️ County Snow & Ice Map")
+    st.caption(f"*{len(GRID_POINTS)} forecast points every ~5 km across Jackson, Swain, Haywood, Macon and "
+               "Transylvania counties; snow is terrain corrected by each point's elevation*")
+    
+    grid = get_snow_grid() if replay_at is None else None
+    if grid is not None and grid['current']:
+        col1, col2 = st.columns(2)
+        with col1:
+            map_field = st.radio("Show:", ["Snowfall", "Ice"], horizontal=True, key='map_field')
+        with col2:
+            map_hours = st.radio("Next:", [24, 48, GRID_HOURS], index=2, horizontal=True,
+                                 format_func=lambda h: f"{h} hours", key='map_hours')
+        snow_totals, ice_totals = grid_totals(grid, map_hours)
+        totals = snow_totals if map_field == "Snowfall" else ice_totals
+        
+        webster_cell = (np.abs(LATS - LAT).argmin(), np.abs(LONS - LON).argmin())
+        peak_cell = np.unravel_index(np.nanargmax(totals), totals.shape) if np.isfinite(totals).any() else webster_cell
+        elevation = grid['elevation'].reshape(totals.shape)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric(f"Webster {map_field}", f"{np.nan_to_num(totals[webster_cell]):.2f}\"")
+        with col2:
+            st.metric(f"Area Max {map_field}", f"{np.nan_to_num(totals[peak_cell]):.2f}\"",
+                      f"{np.nan_to_num(elevation[peak_cell]):,.0f} ft", delta_color="off")
+        with col3:
+            st.metric("Grid Coverage", f"{grid['current']} / {len(GRID_POINTS)}",
+                      help="Points holding the latest model run; the rest show the previous run until refreshed")
+        
+        fig_map = go.Figure(go.Heatmap(
+            z=totals,
+            x=LONS,
+            y=LATS,
+            customdata=elevation,
+            colorscale='Blues' if map_field == "Snowfall" else 'Purples',
+            zmin=0,
+            colorbar=dict(title='inches'),
+            hovertemplate='%{y:.2f}, %{x:.2f}<br>%{z:.2f}"<br>%{customdata:,.0f} ft<extra></extra>'
+        ))
+        fig_map.add_trace(go.Scatter(
+            x=[town[1] for town in GRID_TOWNS],
+            y=[town[0] for town in GRID_TOWNS],
+            text=[town[2] for town in GRID_TOWNS],
+            mode='markers+text',
+            textposition='top center',
+            marker=dict(color='#FF6B6B', size=7),
+            hoverinfo='text',
+            showlegend=False
+        ))
+        fig_map.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            height=600,
+            # Equal ground distance per pixel in both directions at this latitude
+            yaxis=dict(scaleanchor='x', scaleratio=1 / np.cos(np.radians(LAT)), title='Latitude'),
+            xaxis=dict(title='Longitude')
+        )
+        st.plotly_chart(fig_map, use_container_width=True)
+    else:
+        st.caption("County grid unavailable" if replay_at is None else "The county map is live only")
+
+# --- TAB 7: ICE ANALYSIS ---
 with tab_ice:
     st.markdown("### 🧊 Ice & Freezing Rain Forecast")
     
@@ -944,36 +1038,20 @@ with tab_ice:
         st.markdown("---")
         
         # Ice Table
-        ice_table_data = []
-        for i in range(min(7, len(euro_daily['time']))):
-            day_date = pd.to_datetime(euro_daily['time'][i])
-            day_key = day_date.strftime('%Y-%m-%d')
-            
-            if day_key in ice_data:
-                ice_accum = ice_data[day_key]['ice_accum']
-                ice_risk = ice_data[day_key]['ice_risk']
-                freezing_hours = ice_data[day_key]['freezing_rain_hours']
-            else:
-                ice_accum = 0
-                ice_risk = 'None'
-                freezing_hours = 0
-            
-            risk_emoji = {
-                'High': "🔴 HIGH",
-                'Moderate': "🟡 MODERATE",
-                'Low': "🔵 LOW",
-                'None': "⚪ NONE"
-            }.get(ice_risk, "⚪ NONE")
-            
-            ice_table_data.append({
-                'Date': day_date.strftime('%a %m/%d'),
-                'Ice Accum': f"{ice_accum:.3f}\"",
-                'Risk Level': risk_emoji,
-                'Freezing Hours': freezing_hours
-            })
-        
-        df_ice = pd.DataFrame(ice_table_data)
-        st.dataframe(df_ice, use_container_width=True, hide_index=True)
+        days = pd.to_datetime(euro_daily['time'][:7])
+        ice_by_day = pd.DataFrame.from_dict(ice_data, orient='index').reindex(days.strftime('%Y-%m-%d'))
+        
+        df_ice = pd.DataFrame({
+            'Date': days,
+            'Ice Accum': ice_by_day['ice_accum'].fillna(0).to_numpy(),
+            'Risk Level': ice_by_day['ice_risk'].fillna('None').map(ICE_RISK_LABELS).fillna(ICE_RISK_LABELS['None']).to_numpy(),
+            'Freezing Hours': ice_by_day['freezing_rain_hours'].fillna(0).astype(int).to_numpy(),
+            'Sleet Hours': ice_by_day['sleet_hours'].fillna(0).astype(int).to_numpy()
+        })
+        st.dataframe(df_ice, use_container_width=True, hide_index=True, column_config={
+            'Date': DAY_COLUMN,
+            'Ice Accum': inches_column(3)
+        })
         
         with st.expander("🧊 Ice Risk Guide"):
             st.markdown("""
@@ -988,40 +1066,21 @@ with tab_ice:
     else:
         st.error("❌ Ice data unavailable")
 
-# --- TAB 6: ROAD CONDITIONS ---
+# --- TAB 8: ROAD CONDITIONS ---
 with tab_roads:
+    from road_corridors import get_corridor_forecast, route_matrix, route_alerts, HAZARD_LEVELS, MATRIX_HOURS
     st.markdown("### 🚗 NCDOT Road Conditions - Western North Carolina")
     
     # Current travel recommendation
     if euro_daily and ice_data:
         today_key = nc_time.strftime('%Y-%m-%d')
-        ice_risk = ice_data.get(today_key, {}).get('ice_risk', 'None')
-        ice_accum = ice_data.get(today_key, {}).get('ice_accum', 0)
-        today_snow = euro_daily['snowfall_sum'][0] if len(euro_daily['snowfall_sum']) > 0 else 0
-        today_low = euro_daily['temperature_2m_min'][0] if len(euro_daily['temperature_2m_min']) > 0 else 40
-        
-        if ice_risk == 'High' or ice_accum >= 0.25 or today_snow >= 3.0:
-            status = "🔴 AVOID TRAVEL"
-            desc = "Hazardous conditions expected."
-            css = "alert-red"
-        elif ice_risk == 'Moderate' or ice_accum >= 0.10 or today_snow >= 1.0 or today_low <= 28:
-            status = "🟡 CAUTION ADVISED"
-            desc = "Difficult conditions possible."
-            css = "alert-orange"
-        elif ice_risk == 'Low' or today_low <= 32:
-            status = "🔵 USE CAUTION"
-            desc = "Watch for icy spots."
-            css = "alert-ice"
-        else:
-            status = "✅ NORMAL CONDITIONS"
-            desc = "No significant hazards."
-            css = "alert-green"
+        travel = get_travel_status(euro_daily, ice_data, today_key)
         
         st.markdown(f"""
-        <div class="alert-box {css}">
-            <h3>{status}</h3>
-            <p>{desc}</p>
-            <p><strong>Today's Forecast:</strong> {today_snow:.1f}\" snow, {ice_accum:.2f}\" ice, Low: {today_low:.0f}°F</p>
+        <div class="alert-box {travel['css']}">
+            <h3>{travel['status']}</h3>
+            <p>{travel['description']}</p>
+            <p><strong>Today's Forecast:</strong> {travel['snow']:.1f}\" snow, {travel['ice_accum']:.2f}\" ice, Low: {travel['low_temp']:.0f}°F</p>
         </div>
         """, unsafe_allow_html=True)
     
@@ -1095,8 +1154,49 @@ with tab_roads:
         ],
         'Priority': ['🔴 High', '🔴 High', '🟡 Medium', '🟡 Medium', '🟢 Low (Seasonal)']
     })
+    if replay_at is None:
+        # Alerts at each route's waypoints, matched locally from the area feed behind the alert banner
+        alerts_by_route = route_alerts()
+        key_routes['Alerts'] = [', '.join(alerts_by_route.get(route, [])) or "None" for route in key_routes['Route']]
     
-    st.dataframe(key_routes, use_container_width=True, hide_index=True)
+    # Route-by-hour hazard matrix from forecasts sampled along each corridor
+    corridor_forecast = get_corridor_forecast() if replay_at is None else None
+    if corridor_forecast is not None:
+        matrix, matrix_times, worst = route_matrix(corridor_forecast, nc_time)
+        
+        st.dataframe(key_routes.merge(worst, on='Route'), use_container_width=True, hide_index=True, column_config={
+            'When': st.column_config.DatetimeColumn(format="ddd hh A"),
+            'Where': st.column_config.TextColumn("Worst Spot"),
+            'Elevation': st.column_config.NumberColumn(format="%.0f ft"),
+            'Snow': st.column_config.NumberColumn(f"Snow ({MATRIX_HOURS}h)", format='%.1f"'),
+            'Min Temp': TEMP_COLUMN
+        })
+        
+        st.markdown(f"##### ⏱️ Hazard by Route - Next {MATRIX_HOURS} Hours")
+        st.caption("*Worst conditions at any sampled point along the route (passes included), from the hourly forecast*")
+        fig_routes = go.Figure(go.Heatmap(
+            z=matrix,
+            x=matrix_times,
+            y=list(worst['Route']),
+            zmin=0, zmax=len(HAZARD_LEVELS) - 1,
+            colorscale=[[0.0, '#2E7D32'], [0.25, '#2E7D32'], [0.25, '#F9A825'], [0.5, '#F9A825'],
+                        [0.5, '#C62828'], [0.75, '#C62828'], [0.75, '#6A1B9A'], [1.0, '#6A1B9A']],
+            customdata=np.array(HAZARD_LEVELS, dtype=object)[matrix],
+            hovertemplate='%{y}<br>%{x|%a %I %p}<br>%{customdata}<extra></extra>',
+            colorbar=dict(tickvals=[0.375, 1.125, 1.875, 2.625], ticktext=HAZARD_LEVELS),
+            xgap=1, ygap=2
+        ))
+        fig_routes.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            height=320,
+            yaxis=dict(autorange='reversed')
+        )
+        st.plotly_chart(fig_routes, use_container_width=True)
+    else:
+        st.dataframe(key_routes, use_container_width=True, hide_index=True)
+        st.caption("Corridor forecast unavailable" if replay_at is None else "Corridor hazards are live only")
     
     st.markdown("---")
     
@@ -1133,8 +1233,9 @@ with tab_roads:
     
     st.info("💡 **Tip:** Check road conditions before traveling. Mountain roads can deteriorate rapidly in winter weather.")
 
-# --- TAB 7: POWER STATUS ---
+# --- TAB 9: POWER STATUS ---
 with tab_power:
+    from power_risk import get_outage_risk, SPIA_LABELS, ICE_BANDS
     st.markdown("### ⚡ Duke Energy - Power Status")
     
     st.markdown("""
@@ -1148,6 +1249,71 @@ with tab_power:
     
     st.markdown("---")
     
+    # Forecast outage risk from ice accretion plus wind (Sperry-Piltz style index)
+    st.markdown("#### 🧊 Outage Risk from Ice & Wind")
+    outage = get_outage_risk() if replay_at is None else None
+    if outage is not None:
+        risk_hourly = outage['hourly']
+        window = outage['window']
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Webster Peak", SPIA_LABELS[int(risk_hourly['index'].max())])
+        col2.metric("Area Peak", SPIA_LABELS[int(risk_hourly['area_index'].max())])
+        if window:
+            start, end, peak = window
+            col3.metric("Risk Window", f"{start:%a %I %p} - {end:%a %I %p}")
+        else:
+            col3.metric("Risk Window", "None")
+        
+        fig_power = go.Figure()
+        fig_power.add_trace(go.Bar(
+            x=risk_hourly['time'], y=risk_hourly['radial_ice'],
+            name='Radial Ice (in)', marker_color='#4FC3F7'
+        ))
+        fig_power.add_trace(go.Scatter(
+            x=risk_hourly['time'], y=risk_hourly['wind'],
+            name='Wind (mph)', line=dict(color='#FFB74D', width=2), yaxis='y2'
+        ))
+        fig_power.add_trace(go.Scatter(
+            x=risk_hourly['time'], y=risk_hourly['area_index'],
+            name='Area Index', line=dict(color='#E53935', width=2, shape='hv'), yaxis='y3'
+        ))
+        fig_power.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            height=380,
+            hovermode='x unified',
+            xaxis=dict(domain=[0, 0.9]),
+            yaxis=dict(title='Radial Ice (in)', rangemode='tozero'),
+            yaxis2=dict(title='Wind (mph)', overlaying='y', side='right', rangemode='tozero', showgrid=False),
+            yaxis3=dict(title='Index', overlaying='y', side='right', position=1.0, range=[0, 5.5],
+                        anchor='free', showgrid=False),
+            legend=dict(orientation='h', yanchor='bottom', y=1.02)
+        )
+        st.plotly_chart(fig_power, use_container_width=True)
+        
+        st.markdown("##### 📍 Peak Risk by Location")
+        by_location = outage['by_location'].copy()
+        by_location['Peak Index'] = [SPIA_LABELS[int(i)] for i in by_location['Peak Index']]
+        st.dataframe(by_location, use_container_width=True, hide_index=True, column_config={
+            'Radial Ice': st.column_config.NumberColumn(format='%.2f"'),
+            'Max Wind': st.column_config.NumberColumn(format="%.0f mph")
+        })
+        
+        with st.expander("ℹ️ About the ice & wind index"):
+            st.markdown(
+                "Radial ice on lines is accumulated hour by hour from freezing rain and concurrent wind "
+                "(Jones simple flux model) and resets when temperatures climb to shed it. Each hour's ice "
+                "and wind give a 0-5 damage level in the style of the Sperry-Piltz Ice Accumulation index. "
+                f"Ice bands: {', '.join(f'{b:.2f}' for b in ICE_BANDS)} in; stronger wind raises the level."
+            )
+            st.markdown("\n".join(f"- {label}" for label in SPIA_LABELS))
+    else:
+        st.caption("Outage risk forecast unavailable" if replay_at is None else "Outage risk is live only")
+    
+    st.markdown("---")
+    
     st.markdown("""
     #### 🗺️ Live Outage Map
     🌐 [Duke Energy Outage Map](https://outagemap.duke-energy.com/#/current-outages/ncsc)
@@ -1155,7 +1321,7 @@ with tab_power:
     Shows current outages, affected areas, and estimated restoration times.
     """)
 
-# --- TAB 8: RADAR ---
+# --- TAB 10: RADAR ---
 with tab_radar:
     st.markdown("### 📡 Live Doppler Radar")
     
@@ -1210,8 +1376,41 @@ with tab_radar:
     - 🛰️ [GOES Satellite](https://www.star.nesdis.noaa.gov/goes/sector.php?sat=G16&sector=se)
     """)
 
+# --- STALENESS BADGE ---
+if replay_at is None and STALE_SOURCES:
+    stale = []
+    for key, fetched_at in list(STALE_SOURCES.items()):
+        minutes = int((time.time() - fetched_at) // 60)
+        age = f"{minutes // 60} h {minutes % 60} min" if minutes >= 60 else f"{minutes} min"
+        name = key.split(':')[0]
+        label = SOURCES[name]['label'] if name in SOURCES else STALE_LABELS.get(name, name)
+        stale.append(f"{label} ({age} old)")
+    stale_badge.warning("⏳ Upstream slow or unavailable - showing last good data for " + ", ".join(stale))
+
+# --- BACKGROUND SERVICES ---
+# Started once the page has rendered; each is a no-op after the first run
+from weather_api import start_api_server
+from snapshot_renderer import start_snapshot_scheduler
+from compute_pool import start_compute_pool
+from watch_rules import start_watch_scheduler
+
+# JSON API for downstream scripts (opt-in with SNOW_API_ENABLED=1; shares this process's data cache)
+start_api_server()
+
+# Static kiosk snapshot (opt-in with SNOW_SNAPSHOT_ENABLED=1)
+start_snapshot_scheduler()
+
+# Worker processes for the heavy array jobs (compute_pool; also started by the first job)
+start_compute_pool()
+
+# Threshold watches keep firing between page loads (once any rule is registered)
+start_watch_scheduler()
+
 # --- FOOTER ---
 st.markdown("---")
 st.caption(f"**Enhanced Edition** | Terrain-corrected for {ELEVATION_FT}' elevation (+{int((TERRAIN_MULTIPLIER-1)*100)}%)")
 st.caption("**Data Sources:** NWS/NOAA • Open-Meteo ECMWF & GFS • Historical Archive • NCDOT • Duke Energy")
 st.caption("**Stephanie's Snow & Ice Forecaster** | Bonnie Lane Edition")
+
+set_deadline(None)
+startup_profile.mark('done')
@@ -0,0 +1,223 @@
+"""Gridded snowfall and ice forecast over Jackson County and its neighbors.
+
+The area is tiled into a regular lat/lon grid of a few hundred points, fetched
+with Open-Meteo's multi-location requests BATCH_SIZE points per call. Each cell
+is stored in SQLite with the model run it came from, so the grid survives
+restarts and is shared by every session: a refresh fetches only the cells still
+holding an older run (or missing after a grid change), and a refresh cut short
+by an upstream error resumes where it stopped. Snow is stored uncorrected and
+the terrain correction is applied per cell from its elevation at load time.
+"""
+import os
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from weather_data import (
+    LAT, LON, ELEVATION_FT, TERRAIN_MULTIPLIER, fetch_json, record_fetch, serve_fetched, get_model_run,
+    hourly_ice_potential
+)
+from memory_cache import bounded_cache
+from compute_pool import compute
+from field_registry import requested_fields
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+GRID_PATH = os.environ.get("SNOW_GRID_PATH", os.path.join("archive", "snow_grid.db"))
+# Jackson County with Swain, Haywood, Transylvania and Macon around it
+GRID_BOUNDS = {'south': 35.00, 'north': 35.75, 'west': -83.55, 'east': -82.75}
+GRID_STEP = 0.05             # degrees, ~5 km
+BATCH_SIZE = 50              # coordinates per Open-Meteo request
+FORECAST_DAYS = 4            # from 00 UTC today, so at least GRID_HOURS ahead remain
+GRID_HOURS = 72
+MAX_TERRAIN_MULTIPLIER = 1.6
+
+# Places labeled on the map (lat, lon, name)
+GRID_TOWNS = [
+    (LAT, LON, "Webster"), (35.3734, -83.2257, "Sylva"), (35.3137, -83.1766, "Cullowhee"),
+    (35.1104, -83.0993, "Cashiers"), (35.4743, -83.3149, "Cherokee"), (35.4887, -82.9887, "Waynesville"),
+    (35.4315, -83.4474, "Bryson City"), (35.1826, -83.3815, "Franklin"), (35.2334, -82.7343, "Brevard")
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    point INTEGER PRIMARY KEY,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    elevation REAL,
+    model_run TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    snowfall BLOB NOT NULL,
+    ice BLOB NOT NULL
+);
+"""
+
+
+def grid_points(bounds=GRID_BOUNDS, step=GRID_STEP):
+    """(lats, lons, points): grid axes and one row per cell in row-major (lat, lon) order"""
+    lats = np.round(np.arange(bounds['south'], bounds['north'] + step / 2, step), 4)
+    lons = np.round(np.arange(bounds['west'], bounds['east'] + step / 2, step), 4)
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing='ij')
+    points = pd.DataFrame({'lat': lat_grid.ravel(), 'lon': lon_grid.ravel()})
+    return lats, lons, points
+
+
+LATS, LONS, POINTS = grid_points()
+
+
+def terrain_multipliers(elevation_ft):
+    """Snowfall correction per cell, scaled from Webster's by elevation and capped on the ridges"""
+    elevation_ft = np.nan_to_num(np.asarray(elevation_ft, dtype=float), nan=ELEVATION_FT)
+    return np.clip(1 + (TERRAIN_MULTIPLIER - 1) * elevation_ft / ELEVATION_FT, 1, MAX_TERRAIN_MULTIPLIER)
+
+
+def corrected_snowfall(snowfall, elevation_ft):
+    """Terrain-corrected (cells x hours) snowfall (a compute_pool job)"""
+    return snowfall * terrain_multipliers(elevation_ft)[:, None]
+
+
+def cell_totals(snowfall, ice, hours):
+    """(snow, ice) per-cell totals over the first `hours` (a compute_pool job)"""
+    # min_count keeps cells with no stored hours blank instead of zero
+    return (pd.DataFrame(snowfall[:, :hours]).sum(axis=1, min_count=1).to_numpy(),
+            pd.DataFrame(ice[:, :hours]).sum(axis=1, min_count=1).to_numpy())
+
+
+class GridStore:
+    """SQLite table of grid cells, each tagged with the model run it was fetched for"""
+
+    def __init__(self, path=GRID_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def stale_points(self, model_run, points=POINTS):
+        """Row numbers of cells missing, moved, or stored for another run"""
+        with self._lock:
+            stored = {
+                point: (lat, lon, run) for point, lat, lon, run in
+                self._connect().execute("SELECT point, lat, lon, model_run FROM cells")
+            }
+        return [
+            i for i, (lat, lon) in enumerate(zip(points['lat'], points['lon']))
+            if stored.get(i) != (lat, lon, model_run)
+        ]
+
+    def refresh(self, model_run, points=POINTS):
+        """Fetch the stale cells batch by batch, committing each batch; returns cells fetched"""
+        stale = self.stale_points(model_run, points)
+        fields = requested_fields('grid', 'hourly')
+        for start in range(0, len(stale), BATCH_SIZE):
+            batch = points.iloc[stale[start:start + BATCH_SIZE]]
+            params = {
+                "latitude": ','.join(f"{lat:.4f}" for lat in batch['lat']),
+                "longitude": ','.join(f"{lon:.4f}" for lon in batch['lon']),
+                "hourly": fields,
+                "temperature_unit": "fahrenheit",
+                "precipitation_unit": "inch",
+                "timezone": "GMT",
+                "forecast_days": FORECAST_DAYS
+            }
+            response = fetch_json('open-meteo', "https://api.open-meteo.com/v1/forecast", calls=len(batch), params=params)
+            blocks = response if isinstance(response, list) else [response]
+
+            rows = []
+            for point, lat, lon, block in zip(batch.index, batch['lat'], batch['lon'], blocks):
+                hourly = block['hourly']
+                snow = np.array(hourly['snowfall'], dtype=float)
+                ice = hourly_ice_potential(hourly['temperature_2m'], hourly['precipitation'], snow, 1)
+                first = int(pd.Timestamp(hourly['time'][0], tz='UTC').timestamp())
+                rows.append((int(point), lat, lon, block.get('elevation'), model_run, first,
+                             snow.astype('<f4').tobytes(), ice.astype('<f4').tobytes()))
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.commit()
+        return len(stale)
+
+    def load(self, now, hours=GRID_HOURS, points=POINTS):
+        """Stored grid for the `hours` from `now` as (cells x hours) arrays, NaN where a cell has no data.
+
+        'version' identifies the loaded data (window and every cell's run) for compute_pool's cache.
+        """
+        with self._lock:
+            stored = self._connect().execute(
+                "SELECT point, lat, lon, elevation, model_run, start, snowfall, ice FROM cells").fetchall()
+        first = int(now.floor('h').timestamp())
+        snow = np.full((len(points), hours), np.nan)
+        ice = np.full((len(points), hours), np.nan)
+        elevation = np.full(len(points), np.nan)
+        runs = np.full(len(points), None, dtype=object)
+        for point, lat, lon, elev, run, start, snow_blob, ice_blob in stored:
+            if point >= len(points) or (points['lat'].iat[point], points['lon'].iat[point]) != (lat, lon):
+                continue
+            # Hours this cell has inside the requested window
+            offset = (first - start) // 3600
+            cell_snow = np.frombuffer(snow_blob, dtype='<f4')[max(offset, 0):max(offset, 0) + hours]
+            cell_ice = np.frombuffer(ice_blob, dtype='<f4')[max(offset, 0):max(offset, 0) + hours]
+            at = max(-offset, 0)
+            snow[point, at:at + len(cell_snow)] = cell_snow[:hours - at]
+            ice[point, at:at + len(cell_ice)] = cell_ice[:hours - at]
+            elevation[point] = elev if elev is not None else np.nan
+            runs[point] = run
+
+        elevation_ft = elevation * 3.28084
+        version = ('grid', first, hours, tuple(runs))
+        return {
+            'time': pd.date_range(pd.Timestamp(first, unit='s', tz='UTC'), periods=hours, freq='h').tz_convert('US/Eastern'),
+            'elevation': elevation_ft,
+            'snowfall': compute(corrected_snowfall, version, snowfall=snow, elevation_ft=elevation_ft),
+            'ice': ice,
+            'model_run': runs,
+            'version': version
+        }
+
+
+grid_store = GridStore()
+
+
+@bounded_cache(ttl=6 * 3600, max_entries=2, max_bytes=2 * 1024 * 1024)
+def fetch_snow_grid(model_run):
+    """Bring the stored grid up to the given run; returns cells fetched, or None on failure"""
+    try:
+        fetched = grid_store.refresh(model_run)
+        record_fetch('grid', payload=model_run, archived=False)
+        return fetched
+    except Exception as e:
+        logger.warning("Snow grid refresh incomplete: %s", e)
+        return None
+
+
+def get_snow_grid(now=None):
+    """Grid for the latest ECMWF run, refreshed incrementally; whatever is stored if the refresh fails.
+
+    A failed refresh marks the grid stale (STALE_SOURCES) back to its last complete run.
+    """
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    model_run = get_model_run('ecmwf')['run']
+    fetched = fetch_snow_grid(model_run)
+    if fetched is None:
+        fetch_snow_grid.clear(model_run)  # retry the remaining cells on the next load
+    serve_fetched('grid', fetched, None)
+    grid = grid_store.load(now)
+    grid['current'] = int(np.sum(grid['model_run'] == model_run))
+    return grid
+
+
+def grid_totals(grid, hours=GRID_HOURS):
+    """(snow, ice) totals over the first `hours`, each shaped (len(LATS), len(LONS))"""
+    shape = (len(LATS), len(LONS))
+    snow, ice = compute(cell_totals, grid.get('version'), snowfall=grid['snowfall'], ice=grid['ice'], hours=hours)
+    return snow.reshape(shape), ice.reshape(shape)
@@ -0,0 +1,189 @@
+"""Import-time and first-paint profiling for the dashboard's cold start.
+
+The dashboard calls mark() at a few points of each script run (imports done,
+header painted, data loaded, script done). With SNOW_PROFILE=1 every run prints
+its marks, so a cold `streamlit run` shows where the critical path goes.
+
+Run as a script it is the startup benchmark: each sample is a fresh Python
+process that imports this module first (so the clock includes importing
+streamlit and pandas), runs the dashboard once through Streamlit's AppTest and
+reports the marks. It also prints a `python -X importtime` breakdown by
+top-level package. The exit status is 1 when the median time to first paint is
+over FIRST_PAINT_BUDGET or more than REGRESSION_TOLERANCE above the saved
+baseline, so CI can fail on a cold-start regression.
+
+    python startup_profile.py                  # profile + check against baseline
+    python startup_profile.py --save-baseline  # record this machine's baseline
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+# --- CONFIGURATION ---
+PROFILE_ENABLED = os.environ.get("SNOW_PROFILE", "0") == "1"
+BASELINE_PATH = os.environ.get("SNOW_STARTUP_BASELINE", "startup_baseline.json")
+FIRST_PAINT_BUDGET = float(os.environ.get("SNOW_FIRST_PAINT_BUDGET", "3.0"))  # seconds from process start
+REGRESSION_TOLERANCE = 0.25  # allowed slowdown vs the baseline median
+REGRESSION_SLACK = 0.1       # seconds; absorbs noise on very fast machines
+BENCHMARK_RUNS = 5
+
+DASHBOARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snow_dashboard.py")
+# Modules the dashboard imports at the top of every run (critical path)
+CRITICAL_IMPORTS = [
+    "streamlit", "pandas", "numpy", "requests", "weather_data", "precip_type", "cache_refresh", "api_budget",
+    "upstream_guard", "snapshot_archive", "memory_cache", "downsample", "field_registry"
+]
+MARK_ORDER = ['imports', 'first_paint', 'data', 'done']
+
+PROCESS_START = time.perf_counter()
+_run = threading.local()
+last_profile = None  # profile of the most recently finished run, any thread
+
+
+def begin_run():
+    """Start a new set of marks for this script run (one thread per run)"""
+    _run.start = time.perf_counter()
+    _run.marks = {}
+
+
+def mark(name):
+    """Record a point in the current run; prints the run's profile at 'done' when enabled"""
+    global last_profile
+    if not hasattr(_run, 'marks'):
+        begin_run()
+    _run.marks[name] = time.perf_counter()
+    if name == 'done':
+        last_profile = run_profile()
+        if PROFILE_ENABLED:
+            print("startup profile: " + ", ".join(
+                f"{key} {value:.3f}s" for key, value in last_profile['since_run'].items()))
+
+
+def run_profile():
+    """{'since_process': {mark: s}, 'since_run': {mark: s}} for the current run"""
+    marks = getattr(_run, 'marks', {})
+    start = getattr(_run, 'start', PROCESS_START)
+    return {
+        'since_process': {name: t - PROCESS_START for name, t in marks.items()},
+        'since_run': {name: t - start for name, t in marks.items()}
+    }
+
+
+# --- BENCHMARK ---
+def _sample():
+    """One cold run in this (fresh) process; prints the profile as JSON"""
+    # The dashboard's `import startup_profile` must see this module, whose clock started first
+    sys.modules['startup_profile'] = sys.modules[__name__]
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(DASHBOARD, default_timeout=120)
+    at.run()
+    profile = dict(last_profile or {'since_process': {}, 'since_run': {}})
+    profile['exception'] = [str(e.value) for e in at.exception]
+    print(json.dumps(profile))
+
+
+def import_profile():
+    """Self import time (s) of the critical-path modules, summed by top-level package"""
+    code = "; ".join(f"import {name}" for name in CRITICAL_IMPORTS)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(DASHBOARD)
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us = int(line.split("|")[0].split(":")[1])
+        except ValueError:
+            continue  # header line
+        package = line.split("|")[2].strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us / 1e6
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def benchmark(runs=BENCHMARK_RUNS):
+    """Median since-process-start marks over `runs` fresh processes"""
+    env = dict(os.environ, SNOW_API_ENABLED="0", SNOW_SNAPSHOT_ENABLED="0", SNOW_ARCHIVE_ENABLED="0")
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--sample"],
+            capture_output=True, text=True, env=env, cwd=os.path.dirname(DASHBOARD)
+        )
+        lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+        if result.returncode != 0 or not lines:
+            raise RuntimeError(f"benchmark sample failed:\n{result.stderr[-2000:]}")
+        samples.append(json.loads(lines[-1]))
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    marks = [name for name in MARK_ORDER if all(name in s.get('since_process', {}) for s in samples)]
+    return {
+        'runs': runs,
+        'since_process': {name: median([s['since_process'][name] for s in samples]) for name in marks},
+        'since_run': {name: median([s['since_run'][name] for s in samples]) for name in marks},
+        'exceptions': sorted({e for s in samples for e in s['exception']})
+    }
+
+
+def check(result, baseline):
+    """List of regression messages (empty when the run is within budget)"""
+    problems = []
+    first_paint = result['since_process'].get('first_paint')
+    if first_paint is None:
+        return ["dashboard never reached first paint"]
+    if first_paint > FIRST_PAINT_BUDGET:
+        problems.append(f"first paint {first_paint:.2f}s is over the {FIRST_PAINT_BUDGET:.2f}s budget")
+    if baseline:
+        allowed = baseline['since_process']['first_paint'] * (1 + REGRESSION_TOLERANCE) + REGRESSION_SLACK
+        if first_paint > allowed:
+            problems.append(f"first paint {first_paint:.2f}s regressed past {allowed:.2f}s "
+                            f"(baseline {baseline['since_process']['first_paint']:.2f}s)")
+    return problems
+
+
+if __name__ == "__main__":
+    if "--sample" in sys.argv:
+        _sample()
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Profile and benchmark the dashboard's cold start")
+    parser.add_argument("--runs", type=int, default=BENCHMARK_RUNS, help="fresh processes to sample")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    args = parser.parse_args()
+
+    print("Import time by package (critical path, self time):")
+    for package, seconds in list(import_profile().items())[:12]:
+        print(f"  {package:<24}{seconds * 1000:8.1f} ms")
+
+    result = benchmark(args.runs)
+    print(f"\nCold start, median of {result['runs']} fresh processes:")
+    print(f"  {'mark':<14}{'since start':>12}{'since run':>12}")
+    for name in result['since_process']:
+        print(f"  {name:<14}{result['since_process'][name]:11.3f}s{result['since_run'][name]:11.3f}s")
+    for message in result['exceptions']:
+        print(f"  ! dashboard raised: {message}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        sys.exit(0)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    problems = check(result, baseline)
+    for message in problems:
+        print(f"\nREGRESSION: {message}")
+    sys.exit(1 if problems else 0)
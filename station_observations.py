@@ -0,0 +1,254 @@
+"""Live NWS station observations (ASOS/AWOS) for the nearest stations.
+
+Stations come from api.weather.gov's /points lookup. Each poll asks a station
+only for observations newer than its stored cursor (`start=` on the
+/stations/{id}/observations endpoint), so a steady-state poll is one small
+request per station. Readings are deduplicated on (station, time) and stored
+compactly in SQLite: epoch-second integers and scaled integer values (tenths of
+a degree, whole pascals and metres) instead of the verbose GeoJSON.
+"""
+import os
+import logging
+import math
+import sqlite3
+import threading
+
+import pandas as pd
+
+from weather_data import LAT, LON, fetch_json, record_fetch
+from memory_cache import bounded_cache
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+OBSERVATIONS_PATH = os.environ.get("SNOW_OBS_PATH", os.path.join("archive", "observations.db"))
+STATION_COUNT = 3        # nearest stations to keep
+BACKFILL_DAYS = 7        # history fetched for a station seen for the first time
+PAGE_LIMIT = 500         # observations per request (API maximum)
+MAX_PAGES = 4            # pagination cap per station per poll
+NWS_HEADERS = {'User-Agent': '(webster_app)', 'Accept': 'application/geo+json'}
+
+# Stored column -> (observation property, multiplier applied before rounding to int)
+FIELDS = {
+    'temp': ('temperature', 10),                  # 0.1 degC
+    'dewpoint': ('dewpoint', 10),                 # 0.1 degC
+    'wind_speed': ('windSpeed', 10),              # 0.1 km/h
+    'wind_gust': ('windGust', 10),                # 0.1 km/h
+    'wind_dir': ('windDirection', 1),             # degrees
+    'pressure': ('barometricPressure', 1),        # Pa
+    'visibility': ('visibility', 1),              # m
+    'precip_1h': ('precipitationLastHour', 10),   # 0.1 mm
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS observations (
+    station TEXT NOT NULL,
+    observed_at INTEGER NOT NULL,
+    {', '.join(f'{column} INTEGER' for column in FIELDS)},
+    weather TEXT,
+    PRIMARY KEY (station, observed_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cursors (station TEXT PRIMARY KEY, observed_at INTEGER NOT NULL);
+"""
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+@bounded_cache(ttl=7 * 24 * 3600, max_entries=2, max_bytes=64 * 1024)
+def nearest_stations():
+    """[{'id', 'name', 'distance_km'}] for the STATION_COUNT closest observation stations"""
+    point = fetch_json('nws', f"https://api.weather.gov/points/{LAT},{LON}", headers=NWS_HEADERS)
+    listing = fetch_json('nws', point['properties']['observationStations'], headers=NWS_HEADERS)
+    stations = []
+    for feature in listing.get('features', []):
+        lon, lat = feature['geometry']['coordinates'][:2]
+        stations.append({
+            'id': feature['properties']['stationIdentifier'],
+            'name': feature['properties'].get('name', ''),
+            'distance_km': round(_distance_km(LAT, LON, lat, lon), 1)
+        })
+    return sorted(stations, key=lambda s: s['distance_km'])[:STATION_COUNT]
+
+
+def _row(station, properties):
+    """Compact storage row for one observation, or None without a timestamp"""
+    if not properties.get('timestamp'):
+        return None
+    row = [station, int(pd.Timestamp(properties['timestamp']).timestamp())]
+    for prop, scale in FIELDS.values():
+        value = (properties.get(prop) or {}).get('value')
+        row.append(None if value is None else int(round(value * scale)))
+    row.append(properties.get('textDescription') or None)
+    return row
+
+
+class ObservationStore:
+    """SQLite table of station observations with a per-station polling cursor"""
+
+    def __init__(self, path=OBSERVATIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def cursor(self, station):
+        """Epoch seconds of the newest stored observation for the station, or None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT observed_at FROM cursors WHERE station = ?", (station,)).fetchone()
+        return row[0] if row else None
+
+    def poll(self, station, now=None):
+        """Fetch and store observations newer than the station's cursor; returns rows added"""
+        now = pd.Timestamp.now(tz='UTC') if now is None else now
+        cursor = self.cursor(station)
+        start = (now - pd.Timedelta(days=BACKFILL_DAYS) if cursor is None
+                 else pd.Timestamp(cursor + 1, unit='s', tz='UTC'))
+
+        rows = []
+        url = f"https://api.weather.gov/stations/{station}/observations"
+        params = {'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'), 'limit': PAGE_LIMIT}
+        for _ in range(MAX_PAGES):
+            page = fetch_json('nws', url, params=params, headers=NWS_HEADERS)
+            features = page.get('features', [])
+            rows.extend(r for r in (_row(station, f.get('properties', {})) for f in features) if r)
+            next_url = (page.get('pagination') or {}).get('next')
+            if not features or not next_url:
+                break
+            url, params = next_url, None
+        if not rows:
+            return 0
+
+        placeholders = ', '.join('?' * len(rows[0]))
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO observations VALUES ({placeholders})", rows)
+            added = conn.total_changes - before
+            conn.execute("INSERT OR REPLACE INTO cursors (station, observed_at) VALUES (?, ?)",
+                         (station, max(max(r[1] for r in rows), cursor or 0)))
+            conn.commit()
+        return added
+
+    def readings(self, stations, since):
+        """Observations for `stations` since epoch `since`, in display units (°F, mph, inches, mi)"""
+        if not stations:
+            return pd.DataFrame()
+        marks = ', '.join('?' * len(stations))
+        with self._lock:
+            df = pd.read_sql_query(
+                f"SELECT * FROM observations WHERE station IN ({marks}) AND observed_at >= ? ORDER BY observed_at",
+                self._connect(), params=[*stations, since])
+        if df.empty:
+            return df
+        df['time'] = pd.to_datetime(df['observed_at'], unit='s', utc=True).dt.tz_convert('US/Eastern')
+        scaled = {column: df[column].astype(float) / scale for column, (_, scale) in FIELDS.items()}
+        return pd.DataFrame({
+            'station': df['station'],
+            'time': df['time'],
+            'temperature': scaled['temp'] * 9 / 5 + 32,
+            'dewpoint': scaled['dewpoint'] * 9 / 5 + 32,
+            'wind_speed': scaled['wind_speed'] * 0.621371,
+            'wind_gust': scaled['wind_gust'] * 0.621371,
+            'wind_direction': scaled['wind_dir'],
+            'pressure_mb': scaled['pressure'] / 100,
+            'visibility_mi': scaled['visibility'] / 1609.344,
+            'precip_1h': scaled['precip_1h'] / 25.4,
+            'weather': df['weather']
+        })
+
+    def latest(self, station):
+        """Newest reading for the station as a dict, or None"""
+        cursor = self.cursor(station)
+        if cursor is None:
+            return None
+        df = self.readings([station], cursor)
+        return None if df.empty else df.iloc[-1].to_dict()
+
+
+observation_store = ObservationStore()
+
+
+@bounded_cache(ttl=1800, max_entries=1, max_bytes=1024)
+def fetch_station_observations():
+    """Incremental poll of every nearby station; returns new readings stored, or None if any station failed.
+
+    Each station is polled on its own, so one failing station does not hold up the others.
+    """
+    try:
+        stations = nearest_stations()
+    except Exception as e:
+        logger.warning("Observation stations unavailable: %s", e)
+        return None
+    added = 0
+    failed = False
+    for station in stations:
+        try:
+            added += observation_store.poll(station['id'])
+        except Exception as e:
+            logger.warning("Station %s observations unavailable: %s", station['id'], e)
+            failed = True
+    if failed:
+        return None
+    record_fetch('observations')
+    return added
+
+
+def poll_station_observations():
+    """Poll the nearby stations at most once per cache TTL; returns new readings stored"""
+    added = fetch_station_observations()
+    if added is None:
+        # Don't pin a failed poll for the whole TTL; stations that did answer
+        # advanced their cursors, so the retry only refetches what is missing
+        fetch_station_observations.clear()
+        return 0
+    return added
+
+
+def _stations():
+    """Nearest stations, or [] while the station lookup is failing (not cached)"""
+    try:
+        return nearest_stations()
+    except Exception:
+        return []
+
+
+def latest_observation():
+    """(station, reading) for the nearest station with a reading in the last 2 hours, else (None, None)"""
+    cutoff = pd.Timestamp.now(tz='UTC').timestamp() - 2 * 3600
+    for station in _stations():
+        reading = observation_store.latest(station['id'])
+        if reading and reading['time'].timestamp() >= cutoff:
+            return station, reading
+    return None, None
+
+
+def daily_observed(days=7):
+    """Per-day observed summary at the nearest reporting station: high, low, precip, snow hours"""
+    since = pd.Timestamp.now(tz='US/Eastern').normalize() - pd.Timedelta(days=days - 1)
+    for station in _stations():
+        df = observation_store.readings([station['id']], since.timestamp())
+        if df.empty:
+            continue
+        df['day'] = df['time'].dt.normalize()
+        df['hour'] = df['time'].dt.floor('h')
+        df['snowing'] = df['weather'].fillna('').str.contains('Snow')
+        # Specials repeat the running hour total; the hour's largest report is its total
+        hourly = df.groupby(['day', 'hour']).agg(precip=('precip_1h', 'max'), snowing=('snowing', 'any'))
+        daily = df.groupby('day').agg(high=('temperature', 'max'), low=('temperature', 'min'))
+        by_day = hourly.groupby(level='day').agg(precip=('precip', 'sum'), snow_hours=('snowing', 'sum'))
+        daily = daily.join(by_day)
+        daily['station'] = station['id']
+        return daily.reset_index().rename(columns={'day': 'date'})
+    return pd.DataFrame()
@@ -0,0 +1,229 @@
+"""Analog storm finder: past storms whose hour-by-hour evolution resembles the forecast.
+
+Every storm becomes a fixed-length vector (storm_events.storm_vectors: temperature,
+snowfall, precipitation and wind in blocks over the first hours of the storm).
+Two kinds of past storm are indexed: the observed events of the event index, and
+the main storm of every archived ECMWF run, paired with what was actually
+observed over its window once the observations cover it. The index is one
+float32 matrix with per-feature squared norms precomputed, so a query is a
+matrix-vector product and an argpartition: an exact nearest-neighbour search in
+well under a millisecond for the few thousand storms a decade of runs produces.
+It is rebuilt only when the event index or the forecast store has changed.
+"""
+import os
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from weather_data import TERRAIN_MULTIPLIER, hourly_frame
+from storm_events import event_index, detect_events, storm_vectors, FEATURES, BLOCKS
+from snapshot_archive import archive
+from memory_cache import bounded_cache
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+ANALOGS_PATH = os.environ.get("SNOW_ANALOGS_PATH", os.path.join("archive", "storm_analogs.db"))
+ANALOG_K = 5
+INGEST_BATCH = 200        # archived payloads decoded per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    run TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    hours INTEGER NOT NULL,
+    total_snow REAL NOT NULL,
+    total_ice REAL NOT NULL,
+    vector BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL);
+"""
+
+
+def forecast_storm(hourly, terrain_multiplier=TERRAIN_MULTIPLIER):
+    """(event, vector, mask) for the snowiest storm in an hourly forecast frame, or None.
+
+    Snow is taken back to the raw model amount, since observations are not terrain
+    corrected. mask marks the vector entries the forecast actually has data for.
+    """
+    if hourly is None or len(hourly) == 0:
+        return None
+    hourly = hourly.assign(snowfall=hourly['snowfall'] / terrain_multiplier)
+    events = detect_events(hourly)
+    if events.empty:
+        return None
+    event = events.loc[events['total_snow'].idxmax()].to_dict()
+    vector = storm_vectors(hourly, [event['start']])[0]
+    mask = np.repeat([field in hourly for field in FEATURES], BLOCKS)
+    return event, vector, mask
+
+
+def _archived_storm(payload):
+    """forecast_storm of an archived ECMWF [daily, hourly] payload, with its model run"""
+    hourly = payload[1] if isinstance(payload, list) and len(payload) == 2 else None
+    if not hourly or not hourly.get('model_run') or \
+            any(field not in hourly for field in ('time', 'temperature_2m', 'precipitation', 'snowfall')):
+        return None, None
+    return hourly['model_run'], forecast_storm(hourly_frame(hourly))
+
+
+class AnalogIndex:
+    """Forecast storms from the snapshot archive plus an in-memory nearest-neighbour index"""
+
+    def __init__(self, path=ANALOGS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._state = None
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _meta(self, key):
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def ingest_archive(self):
+        """Add the main storm of every ECMWF run archived since the last ingest; returns runs stored"""
+        through = self._meta('archive_through') or 0
+        stored = 0
+        while True:
+            batch = archive.payloads('ecmwf', through, INGEST_BATCH, arrays=True)
+            if not batch:
+                return stored
+            rows = []
+            for fetched_at, payload in batch:
+                run, storm = _archived_storm(payload)
+                if storm is not None:
+                    event, vector, _ = storm
+                    rows.append((run, fetched_at, event['start'], event['end'], int(event['hours']),
+                                 event['total_snow'], event['total_ice'], vector.tobytes()))
+            through = batch[-1][0]
+            with self._lock:
+                conn = self._connect()
+                # A run archived again (fields merged in later) replaces its earlier record
+                conn.executemany(
+                    "INSERT OR REPLACE INTO forecasts (run, fetched_at, start, end, hours, total_snow, total_ice, vector) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('archive_through', ?)", (through,))
+                conn.commit()
+            stored += len(rows)
+
+    def _version(self):
+        with self._lock:
+            forecasts = self._connect().execute("SELECT COUNT(*), MAX(fetched_at) FROM forecasts").fetchone()
+        return event_index.watermark(), forecasts
+
+    def _build(self):
+        events, event_matrix = event_index.vectors()
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT run, start, end, hours, total_snow, total_ice, vector FROM forecasts ORDER BY start").fetchall()
+        forecasts = pd.DataFrame([row[:-1] for row in rows],
+                                 columns=['run', 'start', 'end', 'hours', 'forecast_snow', 'forecast_ice'])
+        forecast_matrix = np.array([np.frombuffer(row[-1], dtype=np.float32) for row in rows], dtype=np.float32)
+        forecast_matrix = forecast_matrix.reshape(len(rows), len(FEATURES) * BLOCKS)
+
+        # What fell over each forecast window: the observed events overlapping it, once observed
+        observed_through = event_index.watermark() or 0
+        overlap = ((events['start'].to_numpy()[None, :] <= forecasts['end'].to_numpy()[:, None]) &
+                   (events['end'].to_numpy()[None, :] >= forecasts['start'].to_numpy()[:, None]))
+        forecasts['total_snow'] = overlap @ events['total_snow'].to_numpy(dtype=float)
+        forecasts['total_ice'] = overlap @ events['total_ice'].to_numpy(dtype=float)
+        min_temp = np.where(overlap, events['min_temp'].to_numpy(dtype=float)[None, :], np.inf).min(axis=1, initial=np.inf)
+        forecasts['min_temp'] = np.where(np.isfinite(min_temp), min_temp, np.nan)
+        verified = (forecasts['end'] <= observed_through).to_numpy()
+
+        table = pd.concat([
+            events.assign(run=None, forecast_snow=np.nan)[
+                ['start', 'end', 'hours', 'run', 'forecast_snow', 'total_snow', 'total_ice', 'min_temp']],
+            forecasts.loc[verified, ['start', 'end', 'hours', 'run', 'forecast_snow', 'total_snow', 'total_ice',
+                                     'min_temp']]
+        ], ignore_index=True)
+        matrix = np.concatenate([event_matrix, forecast_matrix[verified]])
+        squares = (matrix.astype(np.float64) ** 2).reshape(len(matrix), len(FEATURES), BLOCKS).sum(axis=2)
+        return {'table': table, 'matrix': matrix, 'squares': squares}
+
+    def index(self):
+        """The current search state, rebuilt when the event index or the forecast store changed"""
+        version = self._version()
+        state = self._state
+        if state is None or state['version'] != version:
+            state = {**self._build(), 'version': version}
+            self._state = state
+        return state
+
+    def search(self, vector, k=ANALOG_K, mask=None, exclude_run=None):
+        """The k indexed storms nearest to `vector` (Euclidean over the masked entries), nearest first"""
+        state = self.index()
+        table, matrix = state['table'], state['matrix']
+        if len(table) == 0:
+            return table.assign(distance=[])
+        mask = np.ones(matrix.shape[1], dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        features = mask.reshape(len(FEATURES), BLOCKS).any(axis=1)
+        query = np.where(mask, vector, 0).astype(np.float32)
+        distance = state['squares'][:, features].sum(axis=1) - 2 * (matrix @ query) + float(query @ query)
+        if exclude_run is not None:
+            distance[(table['run'] == exclude_run).to_numpy()] = np.inf
+        k = min(k, int(np.isfinite(distance).sum()))
+        if k == 0:
+            return table.iloc[:0].assign(distance=[])
+        nearest = np.argpartition(distance, k - 1)[:k]
+        nearest = nearest[np.argsort(distance[nearest])]
+        return table.iloc[nearest].assign(distance=np.sqrt(np.maximum(distance[nearest], 0)))
+
+
+analog_index = AnalogIndex()
+
+
+def _ingest_analogs():
+    try:
+        analog_index.ingest_archive()
+    except Exception as e:
+        logger.exception("Storm analog ingest failed: %s", e)
+
+
+@bounded_cache(ttl=3600, max_entries=1, max_bytes=1024)
+def refresh_analog_index():
+    """Ingest newly archived forecast runs in the background, at most once per hour per process"""
+    thread = threading.Thread(target=_ingest_analogs, name="storm-analog-index", daemon=True)
+    thread.start()
+    return True
+
+
+def find_analogs(hourly_data, k=ANALOG_K):
+    """(storm, analogs) for an ECMWF hourly payload: its snowiest storm and the k most similar past storms.
+
+    storm is None when the forecast has no storm; the forecast's own run is never its own analog.
+    """
+    storm = forecast_storm(hourly_frame(hourly_data)) if hourly_data else None
+    if storm is None:
+        return None, None
+    event, vector, mask = storm
+    return event, analog_index.search(vector, k, mask, exclude_run=hourly_data.get('model_run'))
+
+
+def format_analogs(analogs):
+    """Numeric display frame for the dashboard"""
+    runs = pd.to_datetime(analogs['run'], utc=True)
+    return pd.DataFrame({
+        'Start': pd.to_datetime(analogs['start'], unit='s', utc=True).dt.tz_convert('US/Eastern'),
+        'Storm': np.where(analogs['run'].isna(), "Observed", "ECMWF " + runs.dt.strftime('%HZ %m/%d/%Y')),
+        'Distance': analogs['distance'],
+        'Hours': analogs['hours'],
+        'Forecast Snow': analogs['forecast_snow'],
+        'Snow': analogs['total_snow'],
+        'Ice': analogs['total_ice'],
+        'Min Temp': analogs['min_temp']
+    })
@@ -0,0 +1,321 @@
+"""Storm event detection and index over the hourly observation history.
+
+Hourly Open-Meteo archive observations are split into discrete snow/ice events
+(start, end, total snow, total ice, peak rate, min temp) and stored in an indexed
+SQLite table. The index is updated incrementally from a stored watermark, so only
+new hours are fetched and only the event still open at the watermark is re-detected.
+Each event also gets a storm vector (storm_vectors) for the analog search.
+"""
+import os
+import logging
+import sqlite3
+import threading
+
+import pandas as pd
+import numpy as np
+
+from weather_data import LAT, LON, fetch_json, record_fetch, hourly_ice_potential
+from memory_cache import bounded_cache
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+EVENTS_PATH = os.environ.get("SNOW_EVENTS_PATH", os.path.join("archive", "storm_events.db"))
+HISTORY_START = os.environ.get("SNOW_EVENTS_START", "2015-10-01")
+EVENT_GAP_HOURS = 6       # wet hours further apart than this start a new event
+MIN_EVENT_SNOW = 0.1      # inches; smaller events are ignored unless they carry ice
+MIN_EVENT_ICE = 0.01
+FETCH_CHUNK_DAYS = 366    # one archive request per year of hourly data
+# Storm vectors: each feature over ANALOG_HOURS from the event start, in BLOCK_HOURS blocks,
+# as (value - offset) / scale; hours without data take the fill value
+ANALOG_HOURS = 48
+BLOCK_HOURS = 3
+FEATURES = {
+    'temperature_2m': {'offset': 32.0, 'scale': 10.0, 'fill': 32.0, 'block': 'mean'},   # °F
+    'snowfall': {'offset': 0.0, 'scale': 0.5, 'fill': 0.0, 'block': 'sum'},             # in per block
+    'precipitation': {'offset': 0.0, 'scale': 0.1, 'fill': 0.0, 'block': 'sum'},        # in per block
+    'wind_speed_10m': {'offset': 0.0, 'scale': 10.0, 'fill': 8.0, 'block': 'mean'}      # mph
+}
+BLOCKS = ANALOG_HOURS // BLOCK_HOURS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    kind TEXT NOT NULL,
+    hours INTEGER NOT NULL,
+    total_snow REAL NOT NULL,
+    total_ice REAL NOT NULL,
+    total_precip REAL NOT NULL,
+    peak_rate REAL NOT NULL,
+    min_temp REAL
+);
+CREATE INDEX IF NOT EXISTS events_start ON events (start);
+CREATE INDEX IF NOT EXISTS events_snow ON events (total_snow);
+CREATE INDEX IF NOT EXISTS events_ice ON events (total_ice);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL);
+CREATE TABLE IF NOT EXISTS event_vectors (start REAL PRIMARY KEY, vector BLOB NOT NULL);
+"""
+
+EVENT_COLUMNS = ['start', 'end', 'kind', 'hours', 'total_snow', 'total_ice', 'total_precip', 'peak_rate', 'min_temp']
+
+
+def get_hourly_observations(start_date, end_date):
+    """Hourly observed temperature/precip/snowfall from the Open-Meteo archive as a DataFrame"""
+    url = "https://archive-api.open-meteo.com/v1/archive"
+    params = {
+        "latitude": LAT,
+        "longitude": LON,
+        "start_date": start_date,
+        "end_date": end_date,
+        "hourly": ["temperature_2m", "precipitation", "snowfall", "wind_speed_10m"],
+        "temperature_unit": "fahrenheit",
+        "precipitation_unit": "inch",
+        "wind_speed_unit": "mph",
+        "timezone": "America/New_York"
+    }
+    hourly = fetch_json('open-meteo', url, params=params).get('hourly') or {}
+    df = pd.DataFrame(hourly)
+    if df.empty:
+        return df
+    df['time'] = pd.to_datetime(df['time']).dt.tz_localize('US/Eastern', ambiguous='NaT', nonexistent='NaT')
+    # The archive lags real time by a few days; trailing hours come back null
+    return df.dropna(subset=['time', 'precipitation'])
+
+
+def season_start(now=None):
+    """Oct 1 of the winter season containing `now` (US/Eastern)"""
+    now = pd.Timestamp.now(tz='US/Eastern') if now is None else now
+    year = now.year if now.month >= 7 else now.year - 1
+    return pd.Timestamp(year=year, month=10, day=1, tz='US/Eastern')
+
+
+@bounded_cache(ttl=6 * 3600, max_entries=2, max_bytes=4 * 1024 * 1024)
+def get_season_observations():
+    """Hourly observations since the start of the current winter season"""
+    try:
+        start = season_start()
+        end = pd.Timestamp.now(tz='US/Eastern')
+        if end < start:
+            return pd.DataFrame()
+        hourly = get_hourly_observations(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        record_fetch('season')
+        return hourly
+    except Exception as e:
+        logger.warning("Season observations unavailable: %s", e)
+        return pd.DataFrame()
+
+
+def detect_events(hourly, terrain_multiplier=1):
+    """Split an hourly frame (time, temperature_2m, precipitation, snowfall) into events.
+
+    Ice uses the same per-hour rule as calculate_ice_accumulation; pass the
+    terrain multiplier when the snowfall column is terrain corrected.
+    Returns a DataFrame with EVENT_COLUMNS (start/end as epoch seconds).
+    """
+    if hourly is None or len(hourly) == 0:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    temp = hourly['temperature_2m'].to_numpy(dtype=float)
+    precip = np.nan_to_num(hourly['precipitation'].to_numpy(dtype=float))
+    snow = np.nan_to_num(hourly['snowfall'].to_numpy(dtype=float))
+    ice = hourly_ice_potential(temp, precip, snow, terrain_multiplier)
+    epoch = ((hourly['time'] - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+
+    wet = (snow > 0) | (ice > 0)
+    if not wet.any():
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    # An event starts at a wet hour more than EVENT_GAP_HOURS after the previous wet hour
+    wet_idx = np.flatnonzero(wet)
+    gaps = np.diff(epoch[wet_idx]) > EVENT_GAP_HOURS * 3600
+    starts = wet_idx[np.concatenate([[True], gaps])]
+    ends = wet_idx[np.concatenate([gaps, [True]])]
+
+    def span_sum(values):
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        return cumulative[ends + 1] - cumulative[starts]
+
+    # Hours outside any event get label -1 so per-event min/max ignore them
+    labels = np.full(len(temp), -1)
+    labels[np.concatenate([np.arange(a, b + 1) for a, b in zip(starts, ends)])] = np.repeat(
+        np.arange(len(starts)), ends - starts + 1)
+    in_event = pd.DataFrame({'event': labels, 'temp': temp, 'snow': snow})
+    in_event = in_event[in_event['event'] >= 0].groupby('event')
+
+    events = pd.DataFrame({
+        'start': epoch[starts],
+        'end': epoch[ends],
+        'hours': ends - starts + 1,
+        'total_snow': span_sum(snow),
+        'total_ice': span_sum(ice),
+        'total_precip': span_sum(precip),
+        'peak_rate': in_event['snow'].max().to_numpy(),
+        'min_temp': in_event['temp'].min().to_numpy()
+    })
+    has_snow = events['total_snow'] >= MIN_EVENT_SNOW
+    has_ice = events['total_ice'] >= MIN_EVENT_ICE
+    events['kind'] = np.select([has_snow & has_ice, has_snow], ['mixed', 'snow'], default='ice')
+    return events.loc[has_snow | has_ice, EVENT_COLUMNS].reset_index(drop=True)
+
+
+def storm_vectors(hourly, starts):
+    """(len(starts) x len(FEATURES) * BLOCKS) float32 storm vectors from an hourly frame.
+
+    Feature-major: all blocks of the first feature, then the next. A feature
+    missing from the frame (e.g. wind in older payloads) takes its fill value.
+    """
+    hour = (hourly['time'] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(hours=1)
+    start_hour = np.asarray(starts, dtype=float) // 3600
+    wanted = (start_hour[:, None] + np.arange(ANALOG_HOURS)).ravel()
+    position = pd.Index(hour.to_numpy()).get_indexer(wanted).reshape(len(start_hour), ANALOG_HOURS)
+
+    parts = []
+    for field, spec in FEATURES.items():
+        values = hourly[field].to_numpy(dtype=float) if field in hourly else np.full(len(hourly), np.nan)
+        hours = np.where(position >= 0, values[position], np.nan).reshape(len(start_hour), BLOCKS, BLOCK_HOURS)
+        known = np.isfinite(hours)
+        total = np.where(known, hours, 0).sum(axis=2)
+        count = known.sum(axis=2)
+        if spec['block'] == 'mean':
+            block = np.where(count > 0, total / np.maximum(count, 1), spec['fill'])
+        else:
+            block = np.where(count > 0, total, spec['fill'])
+        parts.append((block - spec['offset']) / spec['scale'])
+    return np.concatenate(parts, axis=1).astype(np.float32)
+
+
+class EventIndex:
+    """SQLite-backed storm event table with an observation watermark"""
+
+    def __init__(self, path=EVENTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._connect(), params=params)
+
+    def _meta(self, key):
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def watermark(self):
+        """Epoch seconds of the last observed hour already processed, or None"""
+        return self._meta('observed_through')
+
+    def update(self, now=None):
+        """Fetch observations past the watermark and (re)detect events; returns events written"""
+        now = pd.Timestamp.now(tz='US/Eastern') if now is None else now
+        watermark = self.watermark()
+
+        # Re-detect from the start of an event that may still have been running at the watermark;
+        # an index from before storm vectors existed is rebuilt once from the archive start
+        if watermark is None or self._meta('vectors') is None:
+            since = pd.Timestamp(HISTORY_START, tz='US/Eastern')
+        else:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT MIN(start) FROM events WHERE end >= ?", (watermark - EVENT_GAP_HOURS * 3600,)
+                ).fetchone()
+            reopen = row[0] if row and row[0] is not None else watermark - EVENT_GAP_HOURS * 3600
+            since = pd.Timestamp(min(reopen, watermark - EVENT_GAP_HOURS * 3600), unit='s', tz='UTC').tz_convert('US/Eastern')
+
+        frames = []
+        chunk_start = since.normalize()
+        while chunk_start <= now:
+            chunk_end = min(chunk_start + pd.Timedelta(days=FETCH_CHUNK_DAYS - 1), now.normalize())
+            frames.append(get_hourly_observations(chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+            chunk_start = chunk_end + pd.Timedelta(days=1)
+        hourly = pd.concat([f for f in frames if not f.empty], ignore_index=True) if any(not f.empty for f in frames) else None
+        if hourly is None:
+            return 0
+        hourly = hourly[hourly['time'] >= since]
+
+        events = detect_events(hourly)
+        vectors = storm_vectors(hourly, events['start'])
+        observed_through = hourly['time'].iloc[-1].timestamp()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM events WHERE start >= ?", (since.timestamp(),))
+            conn.execute("DELETE FROM event_vectors WHERE start >= ?", (since.timestamp(),))
+            conn.executemany(
+                f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})",
+                events[EVENT_COLUMNS].itertuples(index=False, name=None)
+            )
+            conn.executemany("INSERT OR REPLACE INTO event_vectors (start, vector) VALUES (?, ?)",
+                             zip(events['start'], (vector.tobytes() for vector in vectors)))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('observed_through', ?)", (observed_through,))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('vectors', 1)")
+            conn.commit()
+        return len(events)
+
+    def events_over(self, min_snow=0.0, min_ice=0.0, limit=50):
+        """Events with at least min_snow inches of snow and min_ice of ice (indexed range scan)"""
+        if min_ice > 0 and min_snow <= 0:
+            return self._query(
+                "SELECT * FROM events WHERE total_ice >= ? ORDER BY total_ice DESC LIMIT ?", (min_ice, limit))
+        return self._query(
+            "SELECT * FROM events WHERE total_snow >= ? AND total_ice >= ? ORDER BY total_snow DESC LIMIT ?",
+            (min_snow, min_ice, limit))
+
+    def vectors(self):
+        """(events, matrix): every event with a storm vector, in start order, and its vectors as rows"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join('e.' + c for c in EVENT_COLUMNS)}, v.vector FROM events e "
+                "JOIN event_vectors v ON v.start = e.start ORDER BY e.start").fetchall()
+        events = pd.DataFrame([row[:-1] for row in rows], columns=EVENT_COLUMNS)
+        matrix = np.array([np.frombuffer(row[-1], dtype=np.float32) for row in rows], dtype=np.float32)
+        return events, matrix.reshape(len(rows), len(FEATURES) * BLOCKS)
+
+
+event_index = EventIndex()
+
+
+def _update_event_index():
+    try:
+        event_index.update()
+    except Exception as e:
+        logger.exception("Storm event index update failed: %s", e)
+
+
+@bounded_cache(ttl=6 * 3600, max_entries=1, max_bytes=1024)
+def refresh_event_index():
+    """Start an incremental event index update, at most once per 6 h per process.
+
+    Runs on a daemon thread: a cold index fetches years of hourly archive data,
+    which must not hold up the first render.
+    """
+    thread = threading.Thread(target=_update_event_index, name="storm-event-index", daemon=True)
+    thread.start()
+    return True
+
+
+def event_index_updating():
+    """True while a background index update is running"""
+    return any(thread.name == "storm-event-index" for thread in threading.enumerate())
+
+
+def format_events(events):
+    """Numeric display frame for the dashboard"""
+    return pd.DataFrame({
+        'Start': pd.to_datetime(events['start'], unit='s', utc=True).dt.tz_convert('US/Eastern'),
+        'Type': events['kind'].str.title(),
+        'Hours': events['hours'],
+        'Snow': events['total_snow'],
+        'Ice': events['total_ice'],
+        'Peak Rate': events['peak_rate'],
+        'Min Temp': events['min_temp']
+    })
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import alert_index
+from alert_index import _in_ring
+
+# Rings are closed (lon, lat) sequences, as in GeoJSON
+SQUARE = np.array([[-83.5, 35.0], [-83.0, 35.0], [-83.0, 35.5], [-83.5, 35.5], [-83.5, 35.0]])
+# An L shape: the square with its north-east quarter cut away
+NOTCHED = np.array([[-83.5, 35.0], [-83.0, 35.0], [-83.0, 35.25], [-83.25, 35.25], [-83.25, 35.5],
+                    [-83.5, 35.5], [-83.5, 35.0]])
+
+
+@pytest.mark.parametrize('lat, lon, inside', [
+    (35.25, -83.25, True),
+    (35.49, -83.49, True),
+    (35.6, -83.25, False),     # north
+    (35.25, -82.9, False),     # east
+    (34.9, -83.25, False),     # south
+    (35.25, -83.6, False),     # west
+])
+def test_square(lat, lon, inside):
+    assert _in_ring(SQUARE, lat, lon) is inside
+
+
+@pytest.mark.parametrize('lat, lon, inside', [
+    (35.1, -83.1, True),       # south arm
+    (35.4, -83.4, True),       # west arm
+    (35.4, -83.1, False),      # the cut-away corner
+    (35.25, -83.1, False),     # level with the notch's lower edge
+])
+def test_concave_ring(lat, lon, inside):
+    assert _in_ring(NOTCHED, lat, lon) is inside
+
+
+def test_ray_through_a_vertex_counts_once():
+    diamond = np.array([[0.0, -1.0], [1.0, 0.0], [0.0, 1.0], [-1.0, 0.0], [0.0, -1.0]])
+    assert _in_ring(diamond, 0.0, 0.5)
+    assert not _in_ring(diamond, 0.0, 1.5)
+    assert not _in_ring(diamond, 1.0, -0.5)
+
+
+class FakeFeed:
+    def __init__(self, features):
+        self.features = features
+
+    def json(self):
+        return {'features': self.features}
+
+
+ZONE = 'https://api.weather.gov/zones/forecast/NCZ058'
+ZONE_ALERT = {'id': 'w1', 'geometry': None,
+              'properties': {'event': 'Winter Storm Warning', 'affectedZones': [ZONE]}}
+POLYGON_ALERT = {'id': 'f1', 'geometry': {'type': 'Polygon', 'coordinates': [(SQUARE + [0.0, 1.0]).tolist()]},
+                 'properties': {'event': 'Flood Warning', 'affectedZones': []}}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = alert_index.AlertIndex()
+    fresh.register('Webster', 35.25, -83.25)
+    monkeypatch.setattr(alert_index, 'alert_index', fresh)
+    monkeypatch.setattr(alert_index, 'guarded_get', lambda *args, **kwargs: FakeFeed([ZONE_ALERT, POLYGON_ALERT]))
+    return fresh
+
+
+def test_zone_only_alerts_match_through_their_zones(index, monkeypatch):
+    monkeypatch.setattr(alert_index, 'zone_geometry', lambda url: {'type': 'Polygon', 'coordinates': [SQUARE.tolist()]})
+    assert alert_index.refresh_alert_index() == 2
+    assert [alert['id'] for alert in index.alerts_for('Webster')] == ['w1']
+    assert [alert['id'] for alert in index.alerts_at(36.25, -83.25)] == ['f1']
+
+
+def test_failed_zone_keeps_the_previous_index(index, monkeypatch):
+    def unavailable(url):
+        raise RuntimeError("503")
+    monkeypatch.setattr(alert_index, 'zone_geometry', unavailable)
+    with pytest.raises(alert_index.ZoneLookupError):
+        alert_index.refresh_alert_index()
+    assert index.alerts_for('Webster') == []  # nothing was indexed yet, and no partial index replaced it
+
+
+def test_failed_zone_reuses_its_previous_shape(index, monkeypatch):
+    monkeypatch.setattr(alert_index, 'zone_geometry', lambda url: {'type': 'Polygon', 'coordinates': [SQUARE.tolist()]})
+    alert_index.refresh_alert_index()
+
+    def unavailable(url):
+        raise RuntimeError("circuit open")
+    monkeypatch.setattr(alert_index, 'zone_geometry', unavailable)
+    assert alert_index.refresh_alert_index() == 2
+    assert [alert['id'] for alert in index.alerts_for('Webster')] == ['w1']
@@ -0,0 +1,104 @@
+import pytest
+
+import cache_refresh
+from cache_refresh import request_refresh
+from api_budget import UpstreamBudget, BudgetExceeded
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Source ages (seconds, None = never fetched) and the sources invalidated"""
+    ages = {name: 0 for name in cache_refresh.SOURCES}
+    cleared = []
+    monkeypatch.setattr(cache_refresh, 'source_age', lambda name, *args: ages[name])
+    monkeypatch.setattr(cache_refresh, 'invalidate_source', cleared.append)
+    monkeypatch.setattr(cache_refresh, '_last_global_refresh', 0.0)
+    return ages, cleared
+
+
+def test_only_sources_past_their_min_age_are_refreshed(sources):
+    ages, cleared = sources
+    ages.update({'alerts': 30, 'current': None, 'ecmwf': 600})
+    report = request_refresh({}, ['alerts', 'current', 'ecmwf'], now=1000)
+    assert cleared == ['current', 'ecmwf']
+    assert report == {'refreshed': ['current'], 'checked': ['ecmwf'], 'fresh': ['alerts'], 'retry_in': 0}
+
+
+def test_a_session_waits_out_its_cooldown(sources):
+    ages, cleared = sources
+    ages['current'] = None
+    session = {}
+    request_refresh(session, ['current'], now=1000)
+    report = request_refresh(session, ['current'], now=1010)
+    assert report['retry_in'] == cache_refresh.SESSION_REFRESH_COOLDOWN - 10 + 1
+    assert cleared == ['current']
+
+
+def test_sessions_share_the_global_interval(sources):
+    ages, cleared = sources
+    ages['current'] = None
+    request_refresh({}, ['current'], now=1000)
+    assert request_refresh({}, ['current'], now=1004)['retry_in'] == cache_refresh.GLOBAL_REFRESH_INTERVAL - 4 + 1
+    assert request_refresh({}, ['current'], now=1000 + cache_refresh.GLOBAL_REFRESH_INTERVAL)['retry_in'] == 0
+    assert cleared == ['current', 'current']
+
+
+def test_nothing_stale_does_not_start_the_global_interval(sources):
+    ages, cleared = sources
+    assert request_refresh({}, ['alerts'], now=1000)['fresh'] == ['alerts']
+    ages['alerts'] = None
+    assert request_refresh({}, ['alerts'], now=1001)['refreshed'] == ['alerts']
+    assert cleared == ['alerts']
+
+
+def test_weather_regime():
+    winter_alert = [{'properties': {'event': "Winter Storm Warning"}}]
+    assert cache_refresh.weather_regime({}, winter_alert) == 'storm'
+    assert cache_refresh.weather_regime({'snowfall': 0.2}, []) == 'storm'
+    assert cache_refresh.weather_regime({'precipitation': 0.1, 'temperature_2m': 0}, []) == 'storm'
+    assert cache_refresh.weather_regime({'precipitation': 0.1, 'temperature_2m': 45}, []) == 'normal'
+    assert cache_refresh.weather_regime({'weather_code': 0, 'precipitation': 0}, []) == 'calm'
+    assert cache_refresh.weather_regime(None, None) == 'normal'
+
+
+@pytest.fixture
+def quota(monkeypatch):
+    """Sets the NWS daily quota (Open-Meteo gets plenty) with a full day left"""
+    def set_quota(nws, used=0):
+        budget = UpstreamBudget({'open-meteo': 10 ** 9, 'nws': nws})
+        budget.count('nws', used)
+        monkeypatch.setattr(cache_refresh, 'budget', budget)
+    monkeypatch.setattr(cache_refresh, 'seconds_left_today', lambda: 86400)
+    return set_quota
+
+
+def test_ttls_follow_the_regime_within_quota(quota):
+    quota(10 ** 6)
+    assert cache_refresh.active_ttls('storm')['alerts'] == 120
+    assert cache_refresh.active_ttls('calm')['alerts'] == 900
+
+
+def test_ttls_stretch_to_fit_the_remaining_quota(quota):
+    # Storm plan for NWS: 86400 / 120 alert calls + 86400 / 600 * 3 station calls = 1152 calls,
+    # twice what a 720-call quota lets the refresher plan (80%)
+    quota(720)
+    ttls = cache_refresh.active_ttls('storm')
+    assert ttls['alerts'] == pytest.approx(240)
+    assert ttls['observations'] == pytest.approx(1200)
+    assert ttls['current'] == 120  # Open-Meteo has room
+
+
+def test_ttls_hold_cached_data_once_the_quota_is_spent(quota):
+    quota(1000, used=1000)
+    ttls = cache_refresh.active_ttls('normal')
+    assert ttls['alerts'] == ttls['observations'] == float('inf')
+
+
+def test_budget_rolls_over_each_day():
+    budget = UpstreamBudget({'nws': 2})
+    budget.count('nws', 2)
+    with pytest.raises(BudgetExceeded):
+        budget.count('nws')
+    budget._day = '2000-01-01'
+    assert budget.remaining('nws') == 2
+    budget.count('nws')
@@ -0,0 +1,52 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import compute_pool
+from compute_pool import compute
+from power_risk import score_rows
+
+
+def slow_double(values, delay):
+    """A job that outlives the test's timeout"""
+    time.sleep(delay)
+    return values * 2
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(compute_pool, 'COMPUTE_WORKERS', 1)
+    monkeypatch.setattr(compute_pool, 'MIN_OFFLOAD_ELEMENTS', 0)
+    monkeypatch.setattr(compute_pool, '_pool', None)
+    monkeypatch.setattr(compute_pool, '_pool_failed', False)
+    started = compute_pool.start_compute_pool()
+    assert started is not None
+    yield started
+    compute_pool._reset_pool(started)
+
+
+def job_segments():
+    return [name for name in os.listdir(compute_pool.SHM_DIR) if name.startswith(f"snow{os.getpid():x}j")]
+
+
+def test_pool_result_matches_inline(pool):
+    rng = np.random.default_rng(3)
+    inputs = dict(temp=rng.normal(31, 3, (20, 96)), precip=rng.uniform(0, 0.2, (20, 96)),
+                  snow=rng.uniform(0, 0.5, (20, 96)), wind=rng.uniform(0, 40, (20, 96)),
+                  multiplier=np.ones((20, 1)), ptype=None)
+    ice, index = compute(score_rows, None, **inputs)
+    expected_ice, expected_index = score_rows(**inputs)
+    np.testing.assert_array_equal(ice, expected_ice)
+    np.testing.assert_array_equal(index, expected_index)
+    assert job_segments() == []
+
+
+def test_timeout_computes_inline_and_frees_the_late_result(pool, monkeypatch):
+    compute(slow_double, None, values=np.ones(4), delay=0)  # worker up and importing this module
+    monkeypatch.setattr(compute_pool, 'JOB_TIMEOUT', 0.2)
+    result = compute(slow_double, None, values=np.arange(4.0), delay=1.5)
+    np.testing.assert_array_equal(result, [0, 2, 4, 6])
+    time.sleep(3)  # the worker finishes and writes its result after the parent moved on
+    assert job_segments() == []
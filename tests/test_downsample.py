@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from downsample import lttb, downsample_series
+
+
+def reference_lttb(x, y, threshold):
+    """The textbook point-by-point LTTB, to check the vectorized one against"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(start, end)]
+        a = start + areas.index(max(areas))
+        selected.append(a)
+    return selected + [n - 1]
+
+
+def test_keeps_peak_and_trough():
+    y = [0, 0, 0, 10, 0, 0, 0, 0, -5, 0]
+    assert lttb(np.arange(10), y, 5).tolist() == [0, 2, 3, 8, 9]
+
+
+def test_matches_reference():
+    rng = np.random.default_rng(7)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 500))
+    y = np.cumsum(rng.normal(0, 1, 500))
+    for threshold in (3, 10, 37, 250, 499):
+        assert lttb(x, y, threshold).tolist() == reference_lttb(x.tolist(), y.tolist(), threshold)
+
+
+def test_short_series_and_tiny_thresholds_keep_everything():
+    assert lttb([0, 1, 2], [1, 2, 3], 10).tolist() == [0, 1, 2]
+    assert lttb(np.arange(10), np.arange(10), 2).tolist() == list(range(10))
+
+
+def test_nan_values_do_not_break_selection():
+    y = np.sin(np.arange(100) / 5)
+    y[40:45] = np.nan
+    keep = lttb(np.arange(100), y, 20)
+    assert len(keep) == 20 and keep[0] == 0 and keep[-1] == 99
+    assert (np.diff(keep) > 0).all()
+
+
+def test_downsample_series_limits_points_inside_window():
+    times = pd.date_range('2026-01-01', periods=1000, freq='h', tz='US/Eastern')
+    df = pd.DataFrame({'time': times, 'snow': np.arange(1000.0)})
+    window = (times[100], times[599])
+    series = downsample_series(df, 'time', ['snow'], window, max_points=50)
+    kept_times, values = series['snow']
+    assert len(values) == 50
+    assert kept_times.iloc[0] == times[100] and kept_times.iloc[-1] == times[599]
@@ -0,0 +1,96 @@
+import pickle
+
+import pytest
+
+import memory_cache
+from memory_cache import bounded_cache, cache_stats
+
+
+def counted(**limits):
+    calls = []
+
+    @bounded_cache(**limits)
+    def square(x, pad=0):
+        calls.append(x)
+        return [x * x] + [0] * pad
+    return square, calls
+
+
+def test_hits_return_fresh_copies():
+    square, calls = counted()
+    first = square(3)
+    first.append('mutated')
+    assert square(3) == [9]
+    assert calls == [3]
+
+
+def test_least_recently_used_entry_is_evicted():
+    square, calls = counted(max_entries=2)
+    square(1), square(2), square(1), square(3)
+    square(1)
+    square(2)
+    assert calls == [1, 2, 3, 2]
+    assert square.evictions == 2
+
+
+def test_byte_budget_evicts(monkeypatch):
+    size = len(pickle.dumps([0] * 1001, protocol=pickle.HIGHEST_PROTOCOL))
+    square, calls = counted(max_bytes=2 * size + 10)
+    for x in range(3):
+        square(x, pad=1000)
+    assert len(square._entries) == 2 and square.bytes <= 2 * size + 10
+    square(0, pad=1000)
+    assert calls == [0, 1, 2, 0]
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memory_cache.time, 'monotonic', lambda: now[0])
+    square, calls = counted(ttl=10)
+    square(2)
+    now[0] += 5
+    square(2)
+    now[0] += 6
+    square(2)
+    assert calls == [2, 2]
+    assert square.expirations == 1
+
+
+def test_oversize_values_are_not_cached(caplog):
+    square, calls = counted(max_bytes=64)
+    square(1, pad=100)
+    square(1, pad=100)
+    assert calls == [1, 1] and square.oversize == 2 and not square._entries
+    assert sum('exceeds' in record.message for record in caplog.records) == 1
+
+
+def test_global_budget_evicts_across_functions(monkeypatch):
+    monkeypatch.setattr(memory_cache, '_registry', [])
+    size = len(pickle.dumps([0] * 1001, protocol=pickle.HIGHEST_PROTOCOL))
+    monkeypatch.setattr(memory_cache, 'GLOBAL_MAX_BYTES', 2 * size + 10)
+    first, _ = counted()
+    second, _ = counted()
+    first(1, pad=1000)
+    second(2, pad=1000)
+    second(3, pad=1000)
+    assert not first._entries and len(second._entries) == 2
+    assert cache_stats()[-1]['bytes'] <= 2 * size + 10
+
+
+def test_clear_one_call_signature():
+    square, calls = counted()
+    square(1), square(2)
+    square.clear(1)
+    square(1), square(2)
+    assert calls == [1, 2, 1]
+
+
+def test_failing_calls_leave_no_key_lock():
+    @bounded_cache()
+    def broken(x):
+        raise RuntimeError(x)
+
+    for x in range(5):
+        with pytest.raises(RuntimeError):
+            broken(x)
+    assert broken._key_locks == {}
@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+import pytest
+
+from payload_codec import encode_payload, decode_payload, is_encoded, MIN_COLUMN
+
+
+def round_trip(payload, **kwargs):
+    data = encode_payload(payload)
+    assert is_encoded(data)
+    return decode_payload(data, **kwargs)
+
+
+def hours(day, first, count):
+    return [f"{day}T{hour:02d}:00" for hour in range(first, first + count)]
+
+
+def test_open_meteo_payload_round_trips():
+    payload = {
+        'latitude': 35.35,
+        'timezone': 'America/New_York',
+        'hourly': {
+            'time': hours('2026-01-10', 0, 24),
+            'temperature_2m': [round(20 + 0.7 * i, 1) for i in range(24)],
+            'snowfall': [0.0] * 12 + [0.35, 0.42, 0.28] + [0.0] * 9,
+            'weather_code': [0, 3, 71, 73, 75, 61, 66, 3] * 3,
+            'surface_pressure': [930.4 + 0.1 * (i % 5) for i in range(24)],
+        },
+        'daily': {'time': ['2026-01-%02d' % day for day in range(10, 20)], 'snowfall_sum': [1.25] * 10},
+    }
+    assert round_trip(payload) == json.loads(json.dumps(payload))
+
+
+def test_nulls_come_back_as_none():
+    values = [1.5, None, 2.25, None, -3.0, 0.0, None, 4.75]
+    assert round_trip({'v': values}) == {'v': values}
+
+
+def test_all_null_and_short_lists_stay_in_the_skeleton():
+    payload = {'nulls': [None] * 10, 'short': [1, None, 2], 'flags': [True, False] * 5, 'names': ['a', 'b'] * 5}
+    assert round_trip(payload) == payload
+
+
+def test_nulls_are_nan_in_arrays():
+    decoded = round_trip({'v': [1.5, None, 2.0, 3.0, None, 4.0, 5.0, 6.0]}, arrays=True)['v']
+    assert isinstance(decoded, np.ndarray)
+    np.testing.assert_array_equal(np.isnan(decoded), [False, True, False, False, True, False, False, False])
+    assert decoded[0] == 1.5
+
+
+@pytest.mark.parametrize('values', [
+    list(range(-4, 4)),                          # int16
+    [0, 70_000, -70_000] + [1] * 5,              # int32
+    [0, 2 ** 40, -(2 ** 40)] + [1] * 5,          # int64
+    [3, None, -7, 12, None, 0, 1, 2],            # ints with nulls
+])
+def test_ints_keep_their_type_and_value(values):
+    decoded = round_trip({'v': values})['v']
+    assert decoded == values
+    assert all(type(v) is int for v in decoded if v is not None)
+
+
+@pytest.mark.parametrize('values', [
+    [0.1 * i for i in range(8)],                  # float noise survives as float64
+    [123456.5, 0.25] * 4,                         # too large for int16 fixed point
+    [1e30, -1e30, 3.0, 0.5] * 2,
+])
+def test_floats_round_trip_exactly(values):
+    assert round_trip({'v': values}) == {'v': values}
+
+
+def test_time_axis_across_spring_forward_gap():
+    # Local wall-clock hours skip 02:00 on the night DST starts, so the axis is irregular
+    times = hours('2026-03-08', 0, 2) + hours('2026-03-08', 3, 8)
+    assert round_trip({'time': times}) == {'time': times}
+    decoded = round_trip({'time': times}, arrays=True)['time']
+    np.testing.assert_array_equal(decoded, np.array(times, dtype='datetime64[m]'))
+
+
+def test_time_axis_across_fall_back_repeat():
+    # 01:00 occurs twice on the night DST ends
+    times = hours('2026-11-01', 0, 2) + hours('2026-11-01', 1, 8)
+    assert round_trip({'time': times}) == {'time': times}
+
+
+def test_time_axis_across_midnight_and_month_end():
+    times = hours('2026-01-31', 20, 4) + hours('2026-02-01', 0, 6)
+    assert round_trip([{'time': times}, None]) == [{'time': times}, None]
+
+
+def test_tuples_come_back_as_lists():
+    payload = ({'v': tuple(range(MIN_COLUMN))}, None)
+    assert round_trip(payload) == [{'v': list(range(MIN_COLUMN))}, None]
+
+
+def test_decodes_from_a_buffer_slice():
+    data = encode_payload({'v': [0.5] * 16})
+    buffer = memoryview(b'\0' * 8 + data)[8:]
+    assert decode_payload(buffer) == {'v': [0.5] * 16}
+
+
+def test_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_payload(b'\0' * 16)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from power_risk import radial_ice, spia_index
+
+
+def test_jones_accretion_for_an_hour_of_freezing_rain():
+    # 0.1 in (2.54 mm) of freezing rain: 2.54 / (0.9 * pi) mm calm, more with a 10 mph wind
+    calm = radial_ice(np.array([[25.0]]), np.array([[0.1]]), np.zeros((1, 1)), np.zeros((1, 1)))
+    windy = radial_ice(np.array([[25.0]]), np.array([[0.1]]), np.zeros((1, 1)), np.array([[10.0]]))
+    assert calm[0, 0] == pytest.approx(0.035368, rel=1e-4)
+    assert windy[0, 0] == pytest.approx(0.048397, rel=1e-4)
+
+
+def test_accretion_accumulates_and_restarts_after_a_melt():
+    temp = np.array([[25.0, 25.0, 35.0, 25.0]])
+    ice = radial_ice(temp, np.full((1, 4), 0.1), np.zeros((1, 4)), np.zeros((1, 4)))
+    hour = ice[0, 0]
+    assert ice[0].tolist() == pytest.approx([hour, 2 * hour, 0.0, hour])
+
+
+def test_snow_and_rain_above_freezing_add_no_ice():
+    ice = radial_ice(np.array([[25.0, 40.0]]), np.array([[0.1, 0.1]]), np.array([[0.1, 0.0]]), np.zeros((1, 2)))
+    assert ice.tolist() == [[0.0, 0.0]]
+
+
+def test_spia_lookup():
+    ice = np.array([0.05, 0.10, 0.30, 0.80, 2.00, 0.30])
+    wind = np.array([40.0, 0.0, 20.0, 30.0, 0.0, np.nan])
+    assert spia_index(ice, wind).tolist() == [0, 0, 2, 5, 5, 1]
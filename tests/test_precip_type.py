@@ -0,0 +1,35 @@
+import numpy as np
+
+from precip_type import classify, SNOW, SLEET, FREEZING_RAIN, RAIN, UNKNOWN
+
+# Temperatures (°F) at 1000, 975, 950, 925, 900, 850, 800, 700 and 600 hPa
+COLD = [24, 22, 20, 18, 15, 10, 5, -5, -15]
+SOUNDINGS = {
+    'snow': (25, COLD),
+    'freezing rain': (30, [30, 31, 40, 45, 45, 42, 35, 20, 5]),   # deep warm nose, shallow cold layer
+    'sleet': (28, [25, 22, 22, 24, 30, 38, 36, 20, 5]),           # warm nose over a deep cold layer
+    'rain': (45, [44, 42, 40, 38, 36, 34, 30, 20, 5]),
+}
+
+
+def test_known_soundings():
+    surface, levels = zip(*SOUNDINGS.values())
+    ptype = classify(np.array(levels, dtype=float), np.array(surface, dtype=float), np.full(len(surface), 1010.0))
+    assert ptype.tolist() == [SNOW, FREEZING_RAIN, SLEET, RAIN]
+
+
+def test_levels_below_the_ground_are_ignored():
+    # A mountain station at 900 hPa: the warm 1000-925 hPa values are underground
+    levels = np.array([[50, 50, 50, 50] + COLD[4:]], dtype=float)
+    assert classify(levels, np.array([28.0]), np.array([910.0])).tolist() == [SNOW]
+
+
+def test_missing_surface_values_are_unknown():
+    levels = np.array([COLD, COLD], dtype=float)
+    ptype = classify(levels, np.array([np.nan, 25.0]), np.array([1010.0, np.nan]))
+    assert ptype.tolist() == [UNKNOWN, UNKNOWN]
+
+
+def test_leading_axes_are_kept():
+    levels = np.broadcast_to(np.array(COLD, dtype=float), (3, 4, len(COLD)))
+    assert classify(levels, np.full((3, 4), 25.0), np.full((3, 4), 1010.0)).shape == (3, 4)
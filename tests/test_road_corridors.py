@@ -0,0 +1,37 @@
+import numpy as np
+
+from road_corridors import score_hazards, REFREEZE_HOURS
+
+
+def forecast(hours=1, **fields):
+    """Corridor forecast for one point per value of each given field; unset fields are dry and 40 °F"""
+    rows = max(len(values) for values in fields.values())
+    base = {'temperature_2m': 40.0, 'precipitation': 0.0, 'snowfall': 0.0, 'wind_gusts_10m': 0.0, 'visibility': 10000.0}
+    return {name: np.tile(np.asarray(fields.get(name, [value] * rows), dtype=float)[:, None], (1, hours))
+            for name, value in base.items()}
+
+
+def test_each_hazard_sets_its_level():
+    levels = score_hazards(forecast(
+        snowfall=[0.0, 0.05, 0.2, 0.6, 0.0, 0.0, 0.0, 0.0, 0.0],
+        precipitation=[0.0, 0.05, 0.2, 0.6, 0.05, 0.0, 0.0, 0.0, 0.0],
+        temperature_2m=[40, 30, 30, 30, 30, 40, 40, 40, 40],
+        wind_gusts_10m=[0, 0, 0, 0, 0, 40, 55, 0, 0],
+        visibility=[10000, 10000, 10000, 10000, 10000, 10000, 10000, 1000, 300]
+    ))[:, 0]
+    # clear, light snow, snow, heavy snow, freezing rain, gusts, strong gusts, fog, dense fog
+    assert levels.tolist() == [0, 1, 2, 3, 3, 1, 2, 1, 2]
+
+
+def test_wet_roads_refreezing_are_a_caution():
+    hours = REFREEZE_HOURS + 2
+    data = forecast(hours, temperature_2m=[30.0])
+    data['precipitation'][0, 0] = 0.1
+    data['temperature_2m'][0, 0] = 40.0  # rain, then below freezing and dry
+    assert score_hazards(data)[0].tolist() == [0] + [1] * (REFREEZE_HOURS - 1) + [0, 0]
+
+
+def test_missing_fields_score_as_clear():
+    data = forecast(2, temperature_2m=[40.0])
+    del data['wind_gusts_10m'], data['visibility'], data['snowfall']
+    assert score_hazards(data).tolist() == [[0, 0]]
@@ -0,0 +1,102 @@
+import sqlite3
+import zlib
+import json
+
+import numpy as np
+
+from snapshot_archive import SnapshotArchive
+
+
+def test_seek_returns_the_payload_as_of_a_time(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / 'archive.db'))
+    first = {'hourly': {'snowfall': [0.25] * 24}}
+    second = {'hourly': {'snowfall': [0.5] * 24}}
+    archive.write('ecmwf', first, 100)
+    archive.write('ecmwf', second, 200)
+    assert archive.seek('ecmwf', 150) == (100, first)
+    assert archive.seek('ecmwf', 250) == (200, second)
+    assert archive.seek('ecmwf', 50) == (None, None)
+
+
+def test_loaded_payloads_are_not_shared(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / 'archive.db'))
+    archive.write('alerts', {'features': [1, 2, 3]}, 100)
+    archive.seek('alerts', 100)[1]['features'].append(4)
+    assert archive.seek('alerts', 100)[1] == {'features': [1, 2, 3]}
+
+
+def test_array_columns_are_read_only_views(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / 'archive.db'))
+    archive.write('gfs', {'code': list(range(16))}, 100)
+    archive.write('gfs', {'code': list(range(1, 17))}, 200)
+    (_, first), (_, second) = archive.payloads('gfs', arrays=True)
+    assert first['code'].tolist() == list(range(16)) and second['code'].tolist() == list(range(1, 17))
+    assert not second['code'].flags.writeable
+
+
+def test_reads_rows_from_before_the_segment_file(tmp_path):
+    path = str(tmp_path / 'archive.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE payloads (id INTEGER PRIMARY KEY, source TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                 "digest TEXT NOT NULL, payload BLOB NOT NULL)")
+    conn.execute("INSERT INTO payloads (source, fetched_at, digest, payload) VALUES ('current', 100, 'x', ?)",
+                 (zlib.compress(json.dumps({'temperature_2m': 28.5}).encode('utf-8')),))
+    conn.commit()
+    conn.close()
+
+    archive = SnapshotArchive(path)
+    archive.write('current', {'temperature_2m': 30.1}, 200)
+    assert archive.seek('current', 150) == (100, {'temperature_2m': 28.5})
+    assert archive.seek('current', 250) == (200, {'temperature_2m': 30.1})
+
+
+def test_compaction_keeps_the_window_and_one_payload_per_run(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / 'archive.db'))
+    day = 86400
+    for i, run in enumerate(['00z', '00z', '12z', '12z']):
+        archive.write('ecmwf', [{'model_run': run}, {'model_run': run, 'snowfall': [float(i)] * 8}], i * day)
+    for i in range(4):
+        archive.write('current', {'temperature_2m': 20.0 + i}, i * day)
+    archive.write('current', {'temperature_2m': 30.0}, 10 * day)
+
+    assert archive.compact(retention_days=2, now=11 * day) == 6
+    assert [at for at, _ in archive.payloads('ecmwf')] == [1 * day, 3 * day]
+    assert archive.payloads('current') == [(10 * day, {'temperature_2m': 30.0})]
+    assert archive.seek('ecmwf', 2 * day) == (1 * day, [{'model_run': '00z'}, {'model_run': '00z', 'snowfall': [1.0] * 8}])
+
+    # New payloads go to the compacted file; the superseded one is deleted by the next compaction
+    archive.write('current', {'temperature_2m': 31.0}, 11 * day)
+    assert archive.seek('current', 11 * day) == (11 * day, {'temperature_2m': 31.0})
+    assert archive.segment_path == str(tmp_path / 'archive.1.segment')
+    assert archive.compact(retention_days=2, now=13 * day) == 1
+    assert not (tmp_path / 'archive.segment').exists()
+
+
+def test_other_processes_follow_a_compaction(tmp_path):
+    path = str(tmp_path / 'archive.db')
+    writer, reader = SnapshotArchive(path), SnapshotArchive(path)
+    writer.write('gfs', {'code': list(range(16))}, 100)
+    writer.write('gfs', {'code': list(range(1, 17))}, 200)
+    assert reader.seek('gfs', 300) == (200, {'code': list(range(1, 17))})
+
+    assert writer.compact(retention_days=1, now=200 + 86400) == 1
+    assert reader.seek('gfs', 300) == (200, {'code': list(range(1, 17))})
+    reader.write('gfs', {'code': list(range(2, 18))}, 300)
+    assert writer.seek('gfs', 300) == (300, {'code': list(range(2, 18))})
+
+
+def test_compaction_reads_the_run_of_rows_archived_before_the_column(tmp_path):
+    path = str(tmp_path / 'archive.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE payloads (id INTEGER PRIMARY KEY, source TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                 "digest TEXT NOT NULL, payload BLOB NOT NULL)")
+    for at, run in ((100, '00z'), (200, '06z')):
+        conn.execute("INSERT INTO payloads (source, fetched_at, digest, payload) VALUES ('ecmwf', ?, ?, ?)",
+                     (at, run, zlib.compress(json.dumps([{}, {'model_run': run}]).encode('utf-8'))))
+    conn.commit()
+    conn.close()
+
+    archive = SnapshotArchive(path)
+    archive.write('ecmwf', [{}, {'model_run': '06z', 'snowfall': [1.0]}], 300)
+    assert archive.compact(retention_days=1, now=300 + 86400) == 1
+    assert [at for at, _ in archive.payloads('ecmwf')] == [100, 300]
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+import station_observations
+from station_observations import ObservationStore
+
+
+def feature(time, temp_c):
+    return {'properties': {'timestamp': time, 'temperature': {'value': temp_c}, 'textDescription': 'Light Snow'}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ObservationStore(str(tmp_path / 'observations.db'))
+
+
+def serve(monkeypatch, pages):
+    requests = []
+
+    def fetch_json(upstream, url, params=None, headers=None):
+        requests.append((url, params))
+        return pages.pop(0)
+    monkeypatch.setattr(station_observations, 'fetch_json', fetch_json)
+    return requests
+
+
+def test_cursor_advances_and_overlap_is_deduplicated(store, monkeypatch):
+    now = pd.Timestamp('2026-01-10 12:00', tz='UTC')
+    requests = serve(monkeypatch, [
+        {'features': [feature('2026-01-10T10:51:00+00:00', -2.0), feature('2026-01-10T11:51:00+00:00', -1.5)]},
+        # The API may repeat the newest reading; only the new one is stored
+        {'features': [feature('2026-01-10T11:51:00+00:00', -1.5), feature('2026-01-10T12:51:00+00:00', -1.0)]},
+    ])
+    assert store.poll('K24A', now) == 2
+    assert requests[0][1]['start'] == '2026-01-03T12:00:00Z'  # first poll backfills
+    cursor = store.cursor('K24A')
+    assert cursor == int(pd.Timestamp('2026-01-10T11:51:00+00:00').timestamp())
+
+    assert store.poll('K24A', now) == 1
+    assert requests[1][1]['start'] == '2026-01-10T11:51:01Z'
+    readings = store.readings(['K24A'], 0)
+    assert len(readings) == 3
+    assert readings['temperature'].round(1).tolist() == [28.4, 29.3, 30.2]
+
+
+def test_empty_poll_keeps_the_cursor(store, monkeypatch):
+    serve(monkeypatch, [{'features': [feature('2026-01-10T10:51:00+00:00', 0.0)]}, {'features': []}])
+    store.poll('KAVL')
+    cursor = store.cursor('KAVL')
+    assert store.poll('KAVL') == 0
+    assert store.cursor('KAVL') == cursor
+
+
+def test_one_failing_station_does_not_stop_the_others(monkeypatch):
+    polled = []
+
+    class Store:
+        def poll(self, station):
+            if station == 'KBAD':
+                raise RuntimeError("503")
+            polled.append(station)
+            return 1
+
+    stations = [{'id': station} for station in ('KBAD', 'K24A', 'KAVL')]
+    monkeypatch.setattr(station_observations, 'nearest_stations', lambda: stations)
+    monkeypatch.setattr(station_observations, 'observation_store', Store())
+    station_observations.fetch_station_observations.clear()
+    assert station_observations.poll_station_observations() == 0
+    assert polled == ['K24A', 'KAVL']
+    # The failed poll was not cached: the next call polls again
+    assert station_observations.poll_station_observations() == 0
+    assert polled == ['K24A', 'KAVL'] * 2
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from storm_analogs import AnalogIndex
+from storm_events import FEATURES, BLOCKS
+
+WIDTH = len(FEATURES) * BLOCKS
+
+
+def vector(*values):
+    v = np.zeros(WIDTH, dtype=np.float32)
+    v[:len(values)] = values
+    return v
+
+
+@pytest.fixture
+def analogs(tmp_path, monkeypatch):
+    """An index of three observed storms and one verified forecast run"""
+    table = pd.DataFrame({'start': [1, 2, 3, 4], 'run': [None, None, None, '2026011500'],
+                          'total_snow': [1.0, 4.0, 8.0, 3.0]})
+    matrix = np.stack([vector(1.0), vector(4.0), vector(8.0), vector(3.0, 0.5)])
+    squares = (matrix.astype(np.float64) ** 2).reshape(len(matrix), len(FEATURES), BLOCKS).sum(axis=2)
+    index = AnalogIndex(str(tmp_path / 'analogs.db'))
+    monkeypatch.setattr(index, 'index', lambda: {'table': table, 'matrix': matrix, 'squares': squares})
+    return index
+
+
+def test_nearest_first_with_distances(analogs):
+    found = analogs.search(vector(3.0, 0.5), k=3)
+    assert found['start'].tolist() == [4, 2, 1]
+    assert found['distance'].tolist() == pytest.approx([0.0, np.hypot(1.0, 0.5), np.hypot(2.0, 0.5)])
+
+
+def test_a_forecast_is_never_its_own_analog(analogs):
+    found = analogs.search(vector(3.0, 0.5), k=3, exclude_run='2026011500')
+    assert found['start'].tolist() == [2, 1, 3]
+    assert analogs.search(vector(3.0), k=10, exclude_run='2026011500')['run'].isna().all()
+
+
+def test_features_the_forecast_lacks_are_ignored(analogs):
+    # As forecast_storm builds it: whole features, here only the first
+    mask = np.repeat(np.arange(len(FEATURES)) == 0, BLOCKS)
+    query = vector(3.0, 0.5)
+    query[BLOCKS:] = 99.0
+    found = analogs.search(query, k=2, mask=mask)
+    assert found['start'].tolist() == [4, 2]
+    assert found['distance'].tolist() == pytest.approx([0.0, np.hypot(1.0, 0.5)])
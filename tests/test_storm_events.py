@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from storm_events import detect_events, EVENT_GAP_HOURS
+
+
+def hourly(snow, temp=25.0, precip=None):
+    """Hourly frame from 2026-01-05 00 UTC; precip defaults to the snowfall (all snow)"""
+    snow = np.asarray(snow, dtype=float)
+    return pd.DataFrame({
+        'time': pd.date_range('2026-01-05', periods=len(snow), freq='h', tz='UTC'),
+        'temperature_2m': np.broadcast_to(np.asarray(temp, dtype=float), snow.shape),
+        'precipitation': snow if precip is None else np.asarray(precip, dtype=float),
+        'snowfall': snow
+    })
+
+
+def test_wet_hours_up_to_the_gap_apart_stay_in_one_event():
+    snow = [0.5, 0.5] + [0.0] * (EVENT_GAP_HOURS - 1) + [0.25]
+    events = detect_events(hourly(snow))
+    assert len(events) == 1
+    assert events.loc[0, 'hours'] == EVENT_GAP_HOURS + 2
+    assert events.loc[0, 'total_snow'] == pytest.approx(1.25)
+    assert events.loc[0, 'peak_rate'] == 0.5
+
+
+def test_a_longer_gap_splits_the_events():
+    snow = [0.5, 0.5] + [0.0] * EVENT_GAP_HOURS + [0.25]
+    events = detect_events(hourly(snow))
+    assert events['total_snow'].tolist() == pytest.approx([1.0, 0.25])
+    assert events.loc[1, 'start'] - events.loc[0, 'end'] == (EVENT_GAP_HOURS + 1) * 3600
+    assert events['kind'].tolist() == ['snow', 'snow']
+
+
+def test_freezing_rain_is_an_ice_event():
+    # 0.1 in/h of liquid at 30 °F accretes 0.08 in/h
+    events = detect_events(hourly([0.0] * 3, temp=30.0, precip=[0.1] * 3))
+    assert events['kind'].tolist() == ['ice']
+    assert events.loc[0, 'total_ice'] == pytest.approx(0.24)
+    assert events.loc[0, 'total_snow'] == 0
+
+
+def test_rain_above_freezing_and_trace_snow_are_not_events():
+    assert detect_events(hourly([0.0] * 4, temp=40.0, precip=[0.2] * 4)).empty
+    assert detect_events(hourly([0.02, 0.03])).empty
+    assert detect_events(None).empty
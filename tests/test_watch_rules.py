@@ -0,0 +1,45 @@
+import numpy as np
+
+import watch_rules
+from watch_rules import _compare, OPS
+
+
+def test_each_operator():
+    ops = np.arange(len(OPS))
+    thresholds = np.full(len(OPS), 2.0)
+    assert dict(zip(OPS, _compare(ops, thresholds, 2.0).tolist())) == {
+        '>': False, '>=': True, '<': False, '<=': True, '==': True}
+    assert dict(zip(OPS, _compare(ops, thresholds, 3.0).tolist())) == {
+        '>': True, '>=': True, '<': False, '<=': False, '==': False}
+    assert dict(zip(OPS, _compare(ops, thresholds, 1.0).tolist())) == {
+        '>': False, '>=': False, '<': True, '<=': True, '==': False}
+
+
+def test_missing_value_matches_nothing():
+    ops = np.arange(len(OPS))
+    assert not _compare(ops, np.zeros(len(OPS)), np.nan).any()
+
+
+def test_deliveries_get_each_batch_and_a_failing_one_does_not_stop_the_rest(monkeypatch):
+    received = []
+
+    def broken(notes):
+        raise ConnectionError("endpoint down")
+
+    monkeypatch.setattr(watch_rules, '_deliveries', [broken, received.append])
+    notes = [{'rule_id': 1, 'subscriber': 'amy', 'sent_at': 0.0, 'message': "Snowfall > 2 in: now 3.1 in"}]
+    watch_rules.deliver(notes).join()
+    assert received == [notes]
+    assert watch_rules.deliver([]) is None
+
+
+def test_scheduler_starts_only_once_a_rule_exists(tmp_path, monkeypatch):
+    book = watch_rules.WatchBook(str(tmp_path / 'watch.db'))
+    monkeypatch.setattr(watch_rules, 'watch_book', book)
+    monkeypatch.setattr(watch_rules, 'run_watch_loop', lambda: None)
+    monkeypatch.setattr(watch_rules, '_scheduler', None)
+    monkeypatch.setattr(watch_rules, 'WATCH_ENABLED', True)
+    assert watch_rules.start_watch_scheduler() is None
+
+    book.add_rule('amy', 'snowfall', watch_rules.LOCATION_NAME, '>', 2.0)
+    assert watch_rules.start_watch_scheduler() is not None
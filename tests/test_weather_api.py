@@ -0,0 +1,94 @@
+import gzip
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import weather_api
+
+PRODUCTS = {'travel': {'status': "✅ NORMAL CONDITIONS"}, 'alerts': [{'event': 'Winter Storm Warning'}] * 40}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    state = {'products': PRODUCTS, 'fail': False}
+
+    def build_products():
+        if state['fail']:
+            raise RuntimeError("https://internal.example/upstream exploded")
+        meta = {'generated_at': 'now'}
+        bundle = {name: {'meta': meta, 'data': data} for name, data in state['products'].items()}
+        bundle['all'] = {'meta': meta, 'data': state['products']}
+        return bundle
+
+    monkeypatch.setattr(weather_api, 'build_products', build_products)
+    monkeypatch.setattr(weather_api, 'apply_adaptive_ttls', lambda: None)
+    monkeypatch.setattr(weather_api, 'snapshot', weather_api.ProductSnapshot())
+    server = weather_api.run_api_server('127.0.0.1', 0)
+    port = server.server_address[1]
+
+    def get(path, **headers):
+        request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    yield get, state
+    server.shutdown()
+    server.server_close()
+
+
+def test_product_body_and_etag(api):
+    get, _ = api
+    status, headers, body = get('/api/v1/travel')
+    assert status == 200
+    assert json.loads(body)['data'] == PRODUCTS['travel']
+    assert headers['ETag'].startswith('"') and 'Access-Control-Allow-Origin' not in headers
+
+
+def test_gzip_when_accepted(api):
+    get, _ = api
+    status, headers, body = get('/api/v1/all', **{'Accept-Encoding': 'gzip'})
+    assert status == 200 and headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(body))['data'] == PRODUCTS
+    assert headers['ETag'].endswith('-gz"')
+
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip'])
+def test_if_none_match_gives_304(api, encoding):
+    get, _ = api
+    _, headers, _ = get('/api/v1/all', **{'Accept-Encoding': encoding})
+    status, _, body = get('/api/v1/all', **{'Accept-Encoding': encoding, 'If-None-Match': headers['ETag']})
+    assert status == 304 and body == b''
+
+
+def test_etag_follows_the_data_not_the_meta(api):
+    get, state = api
+    first = get('/api/v1/travel')[1]['ETag']
+    weather_api.snapshot.invalidate()
+    assert get('/api/v1/travel')[1]['ETag'] == first
+    state['products'] = {**PRODUCTS, 'travel': {'status': "⚠️ USE CAUTION"}}
+    weather_api.snapshot.invalidate()
+    assert get('/api/v1/travel')[1]['ETag'] != first
+
+
+def test_unknown_product_is_404(api):
+    get, _ = api
+    assert get('/api/v1/nope')[0] == 404
+
+
+def test_failure_is_a_generic_503(api):
+    get, state = api
+    state['fail'] = True
+    status, _, body = get('/api/v1/travel')
+    assert status == 503
+    assert json.loads(body) == {'error': "data unavailable"}
+
+
+def test_cors_origin_is_configurable(api, monkeypatch):
+    get, _ = api
+    monkeypatch.setattr(weather_api, 'API_CORS_ORIGIN', 'https://kiosk.example')
+    assert get('/api/v1/travel')[1]['Access-Control-Allow-Origin'] == 'https://kiosk.example'
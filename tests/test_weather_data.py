@@ -0,0 +1,16 @@
+import pandas as pd
+
+from weather_data import hourly_frame
+
+
+def test_hourly_frame_keeps_local_wall_clock():
+    frame = hourly_frame({'time': ['2026-01-10T06:00', '2026-01-10T07:00'], 'snowfall': [0.1, 0.2], 'model_run': 'x'})
+    assert frame['time'].iloc[0] == pd.Timestamp('2026-01-10 06:00', tz='US/Eastern')
+    assert list(frame.columns) == ['time', 'snowfall']
+
+
+def test_hourly_frame_drops_hours_dst_makes_ambiguous():
+    times = ['2026-11-01T00:00', '2026-11-01T01:00', '2026-11-01T01:00', '2026-11-01T02:00']
+    frame = hourly_frame({'time': times, 'snowfall': [0.1, 0.2, 0.3, 0.4]})
+    assert frame['snowfall'].tolist() == [0.1, 0.4]
+    assert frame['time'].dt.hour.tolist() == [0, 2]
@@ -0,0 +1,202 @@
+"""Deadlines, hedged requests and circuit breakers for upstream HTTP calls.
+
+A page load sets one overall deadline (set_deadline) shared by every fetch on
+its thread: each request's timeout is the smaller of REQUEST_TIMEOUT and the
+time left, and once the deadline has passed fetches fail at once so the
+fetchers fall back to their last good payload. A single-location GET still
+outstanding after the upstream's recent p90 latency is hedged with a duplicate
+request and the first answer wins. A per-upstream circuit breaker opens after
+BREAKER_FAILURES consecutive failures and fails calls immediately for
+BREAKER_COOLDOWN seconds, then lets one trial request through.
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import requests
+
+from api_budget import budget, BudgetExceeded
+
+# --- CONFIGURATION ---
+PAGE_DEADLINE = float(os.environ.get("SNOW_PAGE_DEADLINE", "10"))  # seconds for all fetches of one page load
+REQUEST_TIMEOUT = 10          # seconds per request without a deadline
+HEDGE_MAX_CALLS = 1           # multi-location requests are billed per location; never duplicate them
+HEDGE_DELAY_DEFAULT = 1.5     # seconds before hedging, until LATENCY_SAMPLES latencies are known
+HEDGE_DELAY_RANGE = (0.5, 3.0)
+LATENCY_SAMPLES = 10
+LATENCY_WINDOW = 50
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30         # seconds a tripped circuit stays open
+POOL_SIZE = 16
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised instead of starting a request after the page-load deadline has passed"""
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+_local = threading.local()
+
+
+def set_deadline(seconds=PAGE_DEADLINE):
+    """Start an overall deadline for the fetches made on this thread; None removes it"""
+    _local.deadline = None if seconds is None else time.monotonic() + seconds
+
+
+def time_left():
+    """Seconds until this thread's deadline, or None without one"""
+    deadline = getattr(_local, 'deadline', None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Per-upstream consecutive-failure breaker: closed, open for a cooldown, then one trial"""
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._count = {}
+        self._opened_at = {}
+        self._trial = set()
+
+    def allow(self, upstream):
+        """Whether a request may go out now; after the cooldown only one trial at a time"""
+        with self._lock:
+            opened_at = self._opened_at.get(upstream)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.cooldown or upstream in self._trial:
+                return False
+            self._trial.add(upstream)
+            return True
+
+    def success(self, upstream):
+        with self._lock:
+            self._count[upstream] = 0
+            self._opened_at.pop(upstream, None)
+            self._trial.discard(upstream)
+
+    def failure(self, upstream):
+        with self._lock:
+            self._count[upstream] = self._count.get(upstream, 0) + 1
+            if upstream in self._trial or self._count[upstream] >= self.failures:
+                self._opened_at[upstream] = time.monotonic()
+            self._trial.discard(upstream)
+
+    def release(self, upstream):
+        """Give back a trial that ended without telling us anything about the upstream"""
+        with self._lock:
+            self._trial.discard(upstream)
+
+    def retry_in(self, upstream):
+        """Seconds until the upstream may be tried again; 0 when the circuit is closed"""
+        with self._lock:
+            opened_at = self._opened_at.get(upstream)
+            if opened_at is None:
+                return 0
+            return max(self.cooldown - (time.monotonic() - opened_at), 0)
+
+    def report(self):
+        """{upstream: seconds until retry} for every open circuit"""
+        with self._lock:
+            upstreams = list(self._opened_at)
+        return {upstream: self.retry_in(upstream) for upstream in upstreams}
+
+
+class LatencyTracker:
+    """Recent successful request latencies per upstream, for the hedging delay"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.window = window
+
+    def record(self, upstream, seconds):
+        with self._lock:
+            self._samples.setdefault(upstream, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, upstream):
+        """Seconds to wait before hedging: the upstream's p90 latency, within HEDGE_DELAY_RANGE"""
+        with self._lock:
+            samples = list(self._samples.get(upstream, ()))
+        if len(samples) < LATENCY_SAMPLES:
+            return HEDGE_DELAY_DEFAULT
+        return float(np.clip(np.percentile(samples, 90), *HEDGE_DELAY_RANGE))
+
+
+breaker = CircuitBreaker()
+latency = LatencyTracker()
+_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='upstream')
+
+
+def _timed_get(url, timeout, kwargs):
+    started = time.monotonic()
+    response = requests.get(url, timeout=timeout, **kwargs)
+    # Overload and server errors count against the upstream; other statuses are the caller's business
+    if response.status_code >= 500 or response.status_code == 429:
+        raise requests.HTTPError(f"{response.status_code} from {url}", response=response)
+    return response, time.monotonic() - started
+
+
+def guarded_get(upstream, url, calls=1, **kwargs):
+    """GET within this thread's deadline and the upstream's circuit breaker, hedging slow small requests.
+
+    Every request sent, hedges included, is counted against the upstream's daily budget.
+    """
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"page deadline passed before {upstream} request")
+    if not breaker.allow(upstream):
+        raise CircuitOpen(f"{upstream} circuit open, retry in {breaker.retry_in(upstream):.0f}s")
+    try:
+        budget.count(upstream, calls)
+    except BudgetExceeded:
+        breaker.release(upstream)
+        raise
+
+    timeout = REQUEST_TIMEOUT if left is None else min(REQUEST_TIMEOUT, left)
+    give_up_at = time.monotonic() + timeout
+    hedge = calls <= HEDGE_MAX_CALLS
+    pending = {_pool.submit(_timed_get, url, timeout, kwargs)}
+    sent = 1
+    error = None
+    while pending:
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            error = requests.Timeout(f"no answer from {upstream} within {timeout:.1f}s")
+            break
+        hedge_now = hedge and sent == 1
+        done, pending = wait(pending, return_when=FIRST_COMPLETED,
+                             timeout=min(remaining, latency.hedge_delay(upstream)) if hedge_now else remaining)
+        for future in done:
+            try:
+                response, elapsed = future.result()
+            except Exception as e:
+                error = e
+                continue
+            latency.record(upstream, elapsed)
+            breaker.success(upstream)
+            return response
+        if not done and hedge_now:
+            # Still waiting on a request that is usually answered by now: race a duplicate
+            try:
+                budget.count(upstream, calls)
+            except BudgetExceeded:
+                hedge = False
+                continue
+            pending.add(_pool.submit(_timed_get, url, max(give_up_at - time.monotonic(), 0.1), kwargs))
+            sent += 1
+
+    # A timeout cut short by the page deadline says nothing about the upstream's health
+    if isinstance(error, requests.Timeout) and timeout < REQUEST_TIMEOUT:
+        breaker.release(upstream)
+    else:
+        breaker.failure(upstream)
+    raise error
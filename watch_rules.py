@@ -0,0 +1,439 @@
+"""User-defined threshold watches on the forecast products, evaluated incrementally.
+
+Subscribers register rules such as "24 h snowfall > 2 in at Balsam Gap" or
+"ice risk >= Moderate at Webster". Rules are stored in SQLite and grouped in
+memory by (product, location, hours): a group keeps its rules' operators,
+thresholds and on/off states as arrays, so checking every subscriber's rule
+against a new value is one vectorized comparison. On each data refresh
+evaluate_watches() recomputes product values only for the sources whose data
+changed, and only groups whose value changed (or that gained a rule) are
+re-checked. A rule notifies once when it turns true and re-arms when it turns
+false; the state is stored with the rule, so a restart repeats nothing.
+
+Notifications are stored in the notifications table, which the dashboard shows
+to each subscriber, and handed to the registered deliveries: add_delivery()
+takes any callback, and SNOW_WATCH_WEBHOOK posts each batch as JSON. A failed
+delivery is logged and not retried. The background evaluator runs only while
+at least one rule is registered.
+"""
+import os
+import logging
+import time
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import requests
+
+from weather_data import (
+    LOCATION_NAME, SOURCE_FETCHED_AT, get_euro_snow_ice, calculate_ice_accumulation, get_travel_status,
+    hourly_ice_potential, ice_risk_level
+)
+from road_corridors import get_corridor_forecast, POINTS as CORRIDOR_POINTS
+from precip_type import hourly_precip_type
+from field_registry import activate
+from cache_refresh import apply_adaptive_ttls
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+WATCH_PATH = os.environ.get("SNOW_WATCH_PATH", os.path.join("archive", "watch_rules.db"))
+WATCH_ENABLED = os.environ.get("SNOW_WATCH_ENABLED", "1") == "1"
+WATCH_INTERVAL = 60          # seconds between background evaluations
+WATCH_WEBHOOK = os.environ.get("SNOW_WATCH_WEBHOOK", "")  # POST new notifications here as JSON (unset: off)
+WEBHOOK_TIMEOUT = 10         # seconds
+DEFAULT_HOURS = 24
+MAX_HOURS = 72               # corridor forecasts cover 72 h
+
+ICE_RISK_LEVELS = ('None', 'Low', 'Moderate', 'High')
+TRAVEL_LEVELS = ("✅ NORMAL CONDITIONS", "🔵 USE CAUTION", "🟡 CAUTION ADVISED", "🔴 AVOID TRAVEL")
+# Numeric products have a unit, categorical ones their levels in increasing severity;
+# windowed products cover the next `hours`, travel status is today's at Webster
+PRODUCTS = {
+    'snowfall': {'label': "Snowfall", 'unit': "in", 'windowed': True},
+    'ice_accum': {'label': "Ice accumulation", 'unit': "in", 'windowed': True},
+    'wind': {'label': "Peak wind", 'unit': "mph", 'windowed': True},
+    'ice_risk': {'label': "Ice risk", 'levels': ICE_RISK_LEVELS, 'windowed': True},
+    'travel': {'label': "Travel status", 'levels': TRAVEL_LEVELS, 'windowed': False}
+}
+OPS = ('>', '>=', '<', '<=', '==')
+LOCATIONS = (LOCATION_NAME,) + tuple(dict.fromkeys(CORRIDOR_POINTS['near']))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    subscriber TEXT NOT NULL,
+    product TEXT NOT NULL,
+    location TEXT NOT NULL,
+    op TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    hours INTEGER NOT NULL,
+    active INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    UNIQUE (subscriber, product, location, op, threshold, hours)
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    rule_id INTEGER NOT NULL,
+    subscriber TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notifications_subscriber ON notifications (subscriber, sent_at);
+"""
+
+
+def format_value(product, value):
+    """A product value as shown in rules and notifications ('2.4 in', 'Moderate')"""
+    spec = PRODUCTS[product]
+    if 'levels' in spec:
+        return spec['levels'][int(value)]
+    return f"{value:.2f} {spec['unit']}" if spec['unit'] == "in" else f"{value:.0f} {spec['unit']}"
+
+
+def describe_rule(product, location, op, threshold, hours):
+    """'24 h snowfall > 2.00 in at Balsam Gap (3,370')'"""
+    window = f"{hours} h " if PRODUCTS[product]['windowed'] else ""
+    return f"{window}{PRODUCTS[product]['label'].lower()} {op} {format_value(product, threshold)} at {location}"
+
+
+def _compare(ops, thresholds, value):
+    """Whether each rule (operator index into OPS, threshold) holds for the value"""
+    return np.select(
+        [ops == 0, ops == 1, ops == 2, ops == 3],
+        [value > thresholds, value >= thresholds, value < thresholds, value <= thresholds],
+        default=value == thresholds
+    )
+
+
+class WatchBook:
+    """SQLite rule store with an in-memory index of rule groups and their last evaluated values"""
+
+    def __init__(self, path=WATCH_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._groups = None      # (product, location, hours) -> {'ids', 'subscribers', 'ops', 'thresholds', 'active'}
+        self._values = {}        # group key -> value at its last evaluation
+        self._pending = set()    # groups to re-check even if their value is unchanged
+        self._inputs = {}        # source -> version its values were last computed from
+        self.generation = 0      # bumped on every rule change
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _index(self):
+        if self._groups is None:
+            self._groups = {}
+            keys = self._connect().execute("SELECT DISTINCT product, location, hours FROM rules").fetchall()
+            for key in keys:
+                self._load_group(key)
+        return self._groups
+
+    def _load_group(self, key):
+        rows = self._connect().execute(
+            "SELECT id, subscriber, op, threshold, active FROM rules WHERE product = ? AND location = ? AND hours = ? "
+            "ORDER BY id", key).fetchall()
+        if not rows:
+            self._groups.pop(key, None)
+            return
+        ids, subscribers, ops, thresholds, active = zip(*rows)
+        self._groups[key] = {
+            'ids': np.array(ids),
+            'subscribers': np.array(subscribers, dtype=object),
+            'ops': np.array([OPS.index(op) for op in ops]),
+            'thresholds': np.array(thresholds, dtype=float),
+            'active': np.array(active, dtype=bool)
+        }
+        self._pending.add(key)
+
+    def add_rule(self, subscriber, product, location, op, threshold, hours=DEFAULT_HOURS):
+        """Register a rule and return its id (the existing one for an identical rule).
+
+        Categorical thresholds may be given as a level name ('Moderate') or index.
+        """
+        spec = PRODUCTS.get(product)
+        if spec is None:
+            raise ValueError(f"unknown product '{product}', try one of {list(PRODUCTS)}")
+        if location not in LOCATIONS or (product == 'travel' and location != LOCATION_NAME):
+            raise ValueError(f"no {product} forecast for '{location}'")
+        if op not in OPS:
+            raise ValueError(f"unknown operator '{op}', try one of {list(OPS)}")
+        if 'levels' in spec and isinstance(threshold, str):
+            threshold = spec['levels'].index(threshold)
+        hours = min(max(int(hours), 1), MAX_HOURS) if spec['windowed'] else 0
+
+        key = (product, location, hours)
+        with self._lock:
+            self._index()
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR IGNORE INTO rules (subscriber, product, location, op, threshold, hours, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (subscriber, product, location, op, float(threshold), hours, time.time()))
+            conn.commit()
+            rule_id = conn.execute(
+                "SELECT id FROM rules WHERE subscriber = ? AND product = ? AND location = ? AND op = ? "
+                "AND threshold = ? AND hours = ?", (subscriber, product, location, op, float(threshold), hours)
+            ).fetchone()[0]
+            self._load_group(key)
+            self.generation += 1
+        return rule_id
+
+    def remove_rule(self, rule_id, subscriber):
+        with self._lock:
+            self._index()
+            conn = self._connect()
+            key = conn.execute("SELECT product, location, hours FROM rules WHERE id = ? AND subscriber = ?",
+                               (rule_id, subscriber)).fetchone()
+            if key is None:
+                return
+            conn.execute("DELETE FROM rules WHERE id = ?", (rule_id,))
+            conn.commit()
+            self._load_group(key)
+            self.generation += 1
+
+    def rules(self, subscriber):
+        """A subscriber's rules as dicts with a readable description and whether each currently holds"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, product, location, op, threshold, hours, active FROM rules WHERE subscriber = ? ORDER BY id",
+                (subscriber,)).fetchall()
+        return [
+            {'id': rule_id, 'description': describe_rule(product, location, op, threshold, hours), 'active': bool(active)}
+            for rule_id, product, location, op, threshold, hours, active in rows
+        ]
+
+    def notifications(self, subscriber, limit=20):
+        """A subscriber's newest notifications as (sent_at epoch seconds, message)"""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT sent_at, message FROM notifications WHERE subscriber = ? ORDER BY sent_at DESC LIMIT ?",
+                (subscriber, limit)).fetchall()
+
+    def group_keys(self):
+        with self._lock:
+            return list(self._index())
+
+    def input_changed(self, source, version):
+        """Whether a source's input version differs from the one its values were last computed from"""
+        with self._lock:
+            return self._inputs.get(source) != version
+
+    def record_inputs(self, versions):
+        """Remember the input version of each source whose values were computed and evaluated"""
+        with self._lock:
+            self._inputs.update(versions)
+
+    def evaluate(self, values):
+        """Re-check the groups whose value changed; returns the notifications sent, one per rule turning true"""
+        sent = []
+        with self._lock:
+            groups = self._index()
+            conn = self._connect()
+            now = time.time()
+            for key, value in values.items():
+                group = groups.get(key)
+                if group is None or not np.isfinite(value):
+                    continue
+                if key not in self._pending and self._values.get(key) == value:
+                    continue
+                holds = _compare(group['ops'], group['thresholds'], value)
+                turned_on = holds & ~group['active']
+                turned_off = group['active'] & ~holds
+                if turned_on.any() or turned_off.any():
+                    flipped = group['ids'][turned_on | turned_off]
+                    conn.executemany("UPDATE rules SET active = ? WHERE id = ?",
+                                     [(int(on), int(rule_id)) for rule_id, on in zip(flipped, holds[turned_on | turned_off])])
+                    product, location, hours = key
+                    new = [
+                        {'rule_id': int(rule_id), 'subscriber': subscriber, 'sent_at': now,
+                         'message': f"{describe_rule(product, location, OPS[op], threshold, hours)}: "
+                                    f"now {format_value(product, value)}"}
+                        for rule_id, subscriber, op, threshold in zip(
+                            group['ids'][turned_on], group['subscribers'][turned_on],
+                            group['ops'][turned_on], group['thresholds'][turned_on])
+                    ]
+                    conn.executemany("INSERT INTO notifications (rule_id, subscriber, sent_at, message) VALUES (?, ?, ?, ?)",
+                                     [(note['rule_id'], note['subscriber'], now, note['message']) for note in new])
+                    sent.extend(new)
+                    group['active'] = holds.astype(bool)
+                self._values[key] = value
+                self._pending.discard(key)
+            conn.commit()
+        return sent
+
+
+watch_book = WatchBook()
+
+
+def window_values(times, now, hours, snow, ice, wind):
+    """{product: per-row value} over the `hours` from `now` for (rows x hours) inputs; NaN without data"""
+    window = np.asarray((times >= now) & (times < now + pd.Timedelta(hours=hours)))
+    rows = snow.shape[0]
+    if not window.any():
+        return {product: np.full(rows, np.nan) for product in ('snowfall', 'ice_accum', 'ice_risk', 'wind')}
+    ice_total = ice[:, window].sum(axis=1)
+    return {
+        'snowfall': np.nansum(snow[:, window], axis=1),
+        'ice_accum': ice_total,
+        'ice_risk': pd.Index(ICE_RISK_LEVELS).get_indexer(ice_risk_level(ice_total)).astype(float),
+        # max skips missing hours and stays NaN when the field wasn't fetched
+        'wind': pd.DataFrame(wind[:, window]).max(axis=1).to_numpy() if wind is not None else np.full(rows, np.nan)
+    }
+
+
+def webster_values(keys, now, euro_daily, euro_hourly):
+    """{group key: value} for Webster's groups from the ECMWF payload"""
+    hourly = pd.DataFrame({k: v for k, v in euro_hourly.items() if isinstance(v, list)})
+    times = pd.DatetimeIndex(pd.to_datetime(hourly['time'])).tz_localize('US/Eastern', ambiguous='NaT', nonexistent='NaT')
+    snow = np.nan_to_num(hourly['snowfall'].to_numpy(dtype=float))[None, :]
+    ice = hourly_ice_potential(hourly['temperature_2m'].to_numpy(dtype=float),
+                               np.nan_to_num(hourly['precipitation'].to_numpy(dtype=float)), snow[0],
+                               ptype=hourly_precip_type(euro_hourly, 'ecmwf'))[None, :]
+    wind = hourly['wind_speed_10m'].to_numpy(dtype=float)[None, :] if 'wind_speed_10m' in hourly else None
+
+    values = {}
+    for hours in {hours for product, _, hours in keys if PRODUCTS[product]['windowed']}:
+        for product, value in window_values(times, now, hours, snow, ice, wind).items():
+            values[(product, LOCATION_NAME, hours)] = value[0]
+    if ('travel', LOCATION_NAME, 0) in keys:
+        ice_data = calculate_ice_accumulation(euro_hourly, 'ecmwf')
+        if euro_daily and ice_data:
+            status = get_travel_status(euro_daily, ice_data, now.strftime('%Y-%m-%d'))['status']
+            values[('travel', LOCATION_NAME, 0)] = float(TRAVEL_LEVELS.index(status))
+    return {key: value for key, value in values.items() if key in keys}
+
+
+def corridor_values(keys, now, forecast):
+    """{group key: value} for corridor waypoints, each the worst of the points sampled near it"""
+    shape = forecast['temperature_2m'].shape
+    snow = np.nan_to_num(forecast.get('snowfall', np.zeros(shape)))
+    precip = np.nan_to_num(forecast.get('precipitation', np.zeros(shape)))
+    ice = hourly_ice_potential(forecast['temperature_2m'], precip, snow, 1, hourly_precip_type(forecast, 'corridors'))
+    names = CORRIDOR_POINTS['near'].to_numpy()
+
+    values = {}
+    for hours in {hours for _, _, hours in keys}:
+        by_name = pd.DataFrame(window_values(forecast['time'], now, hours, snow, ice, forecast.get('wind_speed_10m')))
+        for name, row in by_name.groupby(names).max().to_dict(orient='index').items():
+            for product, value in row.items():
+                values[(product, name, hours)] = value
+    return {key: value for key, value in values.items() if key in keys}
+
+
+# --- DELIVERY ---
+_deliveries = []
+
+
+def add_delivery(callback):
+    """Register callback(notes) for each batch of new notifications (dicts of rule_id, subscriber, sent_at, message)"""
+    _deliveries.append(callback)
+
+
+def post_webhook(notes):
+    """Delivery that POSTs a batch to SNOW_WATCH_WEBHOOK as {"notifications": [...]}"""
+    requests.post(WATCH_WEBHOOK, json={'notifications': notes}, timeout=WEBHOOK_TIMEOUT).raise_for_status()
+
+
+if WATCH_WEBHOOK:
+    add_delivery(post_webhook)
+
+
+def _deliver(notes):
+    for callback in list(_deliveries):
+        try:
+            callback(notes)
+        except Exception as e:
+            logger.warning("Watch delivery %s failed for %d notifications: %s",
+                           getattr(callback, '__name__', callback), len(notes), e)
+
+
+def deliver(notes):
+    """Hand new notifications to the deliveries on a background thread, so a slow endpoint never holds up a page"""
+    if notes and _deliveries:
+        thread = threading.Thread(target=_deliver, args=(notes,), name="watch-delivery", daemon=True)
+        thread.start()
+        return thread
+
+
+def evaluate_watches(now=None):
+    """Evaluate the rules against the current data; returns the notifications sent.
+
+    Values are recomputed only for sources whose data (or the hour, or the rule set)
+    changed since the last call, so calling this on every page load is cheap.
+    """
+    keys = set(watch_book.group_keys())
+    if not keys:
+        return []
+    activate('watch')
+    now = (pd.Timestamp.now(tz='US/Eastern') if now is None else now).floor('h')
+    webster_keys = {key for key in keys if key[1] == LOCATION_NAME}
+    corridor_keys = keys - webster_keys
+
+    values = {}
+    versions = {}
+    if webster_keys:
+        euro_daily, euro_hourly = get_euro_snow_ice()
+        version = (now, watch_book.generation, (euro_hourly or {}).get('model_run'),
+                   SOURCE_FETCHED_AT.get(('ecmwf', LOCATION_NAME)))
+        if euro_hourly and watch_book.input_changed('ecmwf', version):
+            values.update(webster_values(webster_keys, now, euro_daily, euro_hourly))
+            versions['ecmwf'] = version
+    if corridor_keys:
+        forecast = get_corridor_forecast()
+        version = (now, watch_book.generation, (forecast or {}).get('model_run'),
+                   SOURCE_FETCHED_AT.get(('corridors', LOCATION_NAME)))
+        if forecast is not None and watch_book.input_changed('corridors', version):
+            values.update(corridor_values(corridor_keys, now, forecast))
+            versions['corridors'] = version
+    sent = watch_book.evaluate(values)
+    # Only now: had anything above raised, the next call recomputes these sources
+    watch_book.record_inputs(versions)
+    deliver(sent)
+    return sent
+
+
+_scheduler_lock = threading.Lock()
+_scheduler = None
+
+
+def _keep_watching():
+    """Whether any rule is left; if not, marks the evaluator stopped so the next rule starts it again"""
+    global _scheduler
+    with _scheduler_lock:
+        try:
+            if watch_book.group_keys():
+                return True
+        except Exception as e:
+            logger.exception("Watch rules unavailable: %s", e)
+            return True
+        _scheduler = None
+        return False
+
+
+def run_watch_loop(interval=WATCH_INTERVAL):
+    """Evaluate the watches every `interval` seconds, refreshing sources on their adaptive TTLs, until no rule is left"""
+    while _keep_watching():
+        try:
+            apply_adaptive_ttls()
+            for note in evaluate_watches():
+                logger.info("Watch for %s: %s", note['subscriber'], note['message'])
+        except Exception as e:
+            logger.exception("Watch evaluation failed: %s", e)
+        time.sleep(interval)
+
+
+def start_watch_scheduler():
+    """Start the background evaluator once a rule is registered, so watches fire without a page load"""
+    global _scheduler
+    with _scheduler_lock:
+        if WATCH_ENABLED and _scheduler is None and watch_book.group_keys():
+            _scheduler = threading.Thread(target=run_watch_loop, name="watch-rules", daemon=True)
+            _scheduler.start()
+        return _scheduler
@@ -0,0 +1,238 @@
+"""Read-only JSON API for Stephanie's Snow & Ice Forecaster.
+
+Serves the same cached products the dashboard shows (current conditions,
+ECMWF daily/hourly forecast, ice accumulation, travel status, NWS alerts)
+without running the Streamlit UI. Responses are pre-encoded once per snapshot
+(JSON + gzip + ETag) so repeat requests are just a dictionary lookup.
+
+Runs inside the Streamlit process (started once by the dashboard, opt-in with
+SNOW_API_ENABLED=1) so it shares the warm data cache, or standalone with
+`python weather_api.py`. It has no authentication, so it listens on localhost
+unless SNOW_API_HOST says otherwise; browsers on other origins may read it only
+when SNOW_API_CORS_ORIGIN names them (or is "*").
+"""
+import os
+import gzip
+import logging
+import json
+import hashlib
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import streamlit as st
+import pandas as pd
+
+from weather_data import LAT, LON, LOCATION_NAME, ELEVATION_FT, TERRAIN_MULTIPLIER, get_products
+from cache_refresh import apply_adaptive_ttls
+from field_registry import activate
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+API_ENABLED = os.environ.get("SNOW_API_ENABLED", "0") == "1"
+API_HOST = os.environ.get("SNOW_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("SNOW_API_PORT", "8502"))
+API_CORS_ORIGIN = os.environ.get("SNOW_API_CORS_ORIGIN", "")  # Access-Control-Allow-Origin; empty sends none
+SNAPSHOT_TTL = 30  # seconds between product rebuilds from the data cache
+GZIP_MIN_BYTES = 512
+
+API_PREFIX = "/api/v1"
+# Products that publish the raw forecast records; the first request for one
+# activates the 'api_forecast' view so its full field set is fetched
+FORECAST_PRODUCTS = ('forecast/daily', 'forecast/hourly', 'all')
+
+
+def build_products():
+    """Wrap every product from the cached fetchers in a response envelope"""
+    products = get_products()
+
+    generated_at = pd.Timestamp.now(tz='US/Eastern').isoformat()
+    meta = {
+        'location': LOCATION_NAME,
+        'latitude': LAT,
+        'longitude': LON,
+        'elevation_ft': ELEVATION_FT,
+        'terrain_multiplier': TERRAIN_MULTIPLIER,
+        'generated_at': generated_at
+    }
+
+    bundle = {name: {'meta': meta, 'data': data} for name, data in products.items()}
+    bundle['all'] = {'meta': meta, 'data': products}
+    return bundle
+
+
+class EncodedResponse:
+    """JSON body pre-rendered as identity and gzip bytes with a content ETag"""
+
+    __slots__ = ('body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        # Tag the data only, so the ETag survives a rebuild that changed nothing but meta
+        data = json.dumps(payload.get('data'), separators=(',', ':'), default=str).encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        if len(self.body) >= GZIP_MIN_BYTES:
+            self.gzip_body = gzip.compress(self.body, compresslevel=6)
+            self.gzip_etag = f'"{digest}-gz"'
+        else:
+            self.gzip_body = None
+            self.gzip_etag = None
+
+
+class ProductSnapshot:
+    """Holds the encoded responses and rebuilds them at most once per SNAPSHOT_TTL.
+
+    Readers never wait on a rebuild once a first snapshot exists: the thread that
+    wins the lock rebuilds, everyone else keeps serving the previous snapshot.
+    """
+
+    def __init__(self, ttl=SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._responses = None
+        self._built_at = 0.0
+
+    def _rebuild(self):
+        """Build and publish a new set of responses (caller holds the lock); returns it"""
+        apply_adaptive_ttls()
+        bundle = build_products()
+        responses = {name: EncodedResponse(payload) for name, payload in bundle.items()}
+        self._responses = responses
+        self._built_at = time.monotonic()
+        return responses
+
+    def get(self, name):
+        # One read of the shared reference: invalidate() may reset it while this request runs
+        responses = self._responses
+        if responses is None:
+            with self._lock:
+                responses = self._responses
+                if responses is None:
+                    responses = self._rebuild()
+        elif time.monotonic() - self._built_at > self.ttl and self._lock.acquire(blocking=False):
+            try:
+                responses = self._rebuild()
+            except Exception as e:
+                logger.warning("API snapshot rebuild failed, serving the previous one: %s", e)
+            finally:
+                self._lock.release()
+        return responses.get(name)
+
+    def names(self):
+        responses = self._responses
+        return sorted(responses) if responses else []
+
+    def invalidate(self):
+        """Force the next get() to rebuild (and wait for it)"""
+        with self._lock:
+            self._responses = None
+
+
+snapshot = ProductSnapshot()
+
+
+class WeatherAPIHandler(BaseHTTPRequestHandler):
+    server_version = "SnowForecasterAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep the Streamlit console quiet
+
+    def _send_json_error(self, code, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _serve(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+
+        if path == '/healthz':
+            body = b'{"status":"ok"}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+            return
+
+        if not path.startswith(API_PREFIX):
+            self._send_json_error(404, "not found")
+            return
+
+        name = path[len(API_PREFIX):].lstrip('/') or 'all'
+        if name in FORECAST_PRODUCTS and activate('api_forecast'):
+            snapshot.invalidate()
+        try:
+            response = snapshot.get(name)
+        except Exception:
+            # The details (upstream URLs, internal errors) go to the log, not to clients
+            logger.exception("API snapshot build failed")
+            self._send_json_error(503, "data unavailable")
+            return
+        if response is None:
+            self._send_json_error(404, f"unknown product '{name}', try one of {snapshot.names()}")
+            return
+
+        use_gzip = response.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = response.gzip_body if use_gzip else response.body
+        etag = response.gzip_etag if use_gzip else response.etag
+
+        if_none_match = self.headers.get('If-None-Match', '')
+        not_modified = if_none_match.strip() == '*' or any(
+            tag.strip().removeprefix('W/') in (response.etag, response.gzip_etag)
+            for tag in if_none_match.split(',')
+        )
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={snapshot.ttl}')
+        self.send_header('Vary', 'Accept-Encoding')
+        if API_CORS_ORIGIN:
+            self.send_header('Access-Control-Allow-Origin', API_CORS_ORIGIN)
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-Type', 'application/json')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_GET = _serve
+    do_HEAD = _serve
+
+
+def run_api_server(host=API_HOST, port=API_PORT):
+    """Start the API on a daemon thread; returns the server or None if the port is taken"""
+    try:
+        server = ThreadingHTTPServer((host, port), WeatherAPIHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="weather-api", daemon=True)
+    thread.start()
+    return server
+
+
+@st.cache_resource
+def start_api_server():
+    """Start the API once per Streamlit process"""
+    if not API_ENABLED:
+        return None
+    return run_api_server()
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((API_HOST, API_PORT), WeatherAPIHandler)
+    server.daemon_threads = True
+    print(f"Serving {LOCATION_NAME} weather API on http://{API_HOST}:{API_PORT}{API_PREFIX}")
+    server.serve_forever()
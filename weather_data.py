@@ -0,0 +1,525 @@
+"""Shared data layer for Stephanie's Snow & Ice Forecaster.
+
+Fetchers, derived products and configuration live here so that the Streamlit
+page and the side services (JSON API, etc.) read from the same cached data.
+"""
+import pandas as pd
+import numpy as np
+import time
+import logging
+from datetime import datetime, timedelta
+
+from snapshot_archive import archive, archive_payload
+from upstream_guard import guarded_get
+from alert_index import alert_index, register_location, refresh_alert_index
+from memory_cache import bounded_cache
+from field_registry import activate, requested_fields, missing_fields, PRODUCT_VIEWS
+from precip_type import hourly_precip_type, UNKNOWN, SLEET, FREEZING_RAIN
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+LAT = 35.351630
+LON = -83.210029
+LOCATION_NAME = "Webster, NC"
+ELEVATION_FT = 2360  # Webster elevation for terrain correction
+NCDOT_DIVISION = 14
+
+# Terrain snow enhancement factor (mountains get ~20-30% more snow than valleys)
+TERRAIN_MULTIPLIER = 1.25
+
+WEATHER_CODES = {
+    0: "Clear", 1: "Mainly Clear", 2: "Partly Cloudy", 3: "Overcast",
+    45: "Foggy", 48: "Rime Fog",
+    51: "Light Drizzle", 53: "Drizzle", 55: "Heavy Drizzle",
+    61: "Light Rain", 63: "Rain", 65: "Heavy Rain",
+    71: "Light Snow", 73: "Snow", 75: "Heavy Snow",
+    77: "Snow Grains", 80: "Light Showers", 81: "Showers", 82: "Heavy Showers",
+    85: "Light Snow Showers", 86: "Snow Showers",
+    95: "Thunderstorm", 96: "Thunderstorm w/ Hail", 99: "Heavy Thunderstorm w/ Hail"
+}
+
+WIND_DIRECTIONS = np.array(['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+                            'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW'])
+
+# Model run schedules: Open-Meteo metadata name, synoptic cycles (UTC) and the usual
+# delay before a cycle is served, used when the metadata endpoint is unreachable
+MODEL_RUNS = {
+    'ecmwf': {'meta_model': 'ecmwf_ifs025', 'cycles': (0, 6, 12, 18), 'delay_hours': 8},
+    'gfs': {'meta_model': 'ncep_gfs025', 'cycles': (0, 6, 12, 18), 'delay_hours': 5}
+}
+MODEL_RUN_POLL = 300  # seconds between metadata checks for a new run, per model
+
+# GFS runs to 384 h; the comparison uses the first 7 days, the extended view all 16
+GFS_FORECAST_DAYS = 16
+
+# Forecast endpoint and range per model section; which variables are requested
+# comes from field_registry (the union of the views active in this process)
+MODEL_FETCH = {
+    'ecmwf': {'url': "https://api.open-meteo.com/v1/forecast",
+              'daily_range': {"forecast_days": 7}, 'hourly_range': {"forecast_hours": 168}},
+    'gfs': {'url': "https://api.open-meteo.com/v1/gfs",
+            'daily_range': {"forecast_days": GFS_FORECAST_DAYS}, 'hourly_range': {"forecast_days": GFS_FORECAST_DAYS}}
+}
+
+ICE_RISK_LABELS = {
+    'High': "🔴 HIGH",
+    'Moderate': "🟡 MODERATE",
+    'Low': "🔵 LOW",
+    'None': "⚪ NONE"
+}
+
+# Webster is matched against the area-wide alert feed like any other watched site
+register_location(LOCATION_NAME, LAT, LON)
+
+# --- DATA FUNCTIONS ---
+# Decorator TTLs are the slowest (clear-weather) refresh intervals; during active
+# weather cache_refresh.apply_adaptive_ttls() clears sources sooner.
+# When each cached source last reached its upstream: {(source, location, *args): epoch seconds}
+SOURCE_FETCHED_AT = {}
+# (model, run, missing daily, missing hourly) field merges already tried
+MERGE_ATTEMPTS = set()
+# Newest good payload per archive key: {key: (fetched_at, payload)}
+LAST_GOOD = {}
+# Sources currently served from LAST_GOOD because their fetch failed: {archive key: fetched_at}
+STALE_SOURCES = {}
+
+def record_fetch(source, *args, payload=None, archived=True):
+    """Note a successful upstream fetch (runs only on a cache miss) and keep its payload, if given.
+
+    The payload becomes the source's last good one and goes to the snapshot archive
+    unless archived=False (payloads of numpy arrays, kept in memory only).
+    """
+    fetched_at = time.time()
+    SOURCE_FETCHED_AT[(source, LOCATION_NAME) + args] = fetched_at
+    if payload is not None:
+        LAST_GOOD[archive_key(source, *args)] = (fetched_at, payload)
+    if archived:
+        archive_payload(archive_key(source, *args), payload, fetched_at)
+
+def archive_key(source, *args):
+    """Archive source name for a fetcher and its call arguments, e.g. 'history:7'"""
+    return ':'.join([source, *map(str, args)])
+
+def fetch_json(upstream, url, calls=1, **kwargs):
+    """GET an upstream JSON document, counted against that upstream's daily budget.
+
+    Open-Meteo bills a multi-location request as one call per location; pass calls=.
+    The request honours the page deadline and circuit breaker (upstream_guard).
+    """
+    return guarded_get(upstream, url, calls, **kwargs).json()
+
+def last_good(key):
+    """(fetched_at, payload) of the newest good payload for an archive key, or (None, None).
+
+    Falls back to the snapshot archive after a restart; there fetched_at is when the
+    payload was first seen, since identical payloads are archived once.
+    """
+    if key in LAST_GOOD:
+        return LAST_GOOD[key]
+    try:
+        return archive.seek(key, time.time())
+    except Exception:
+        return None, None
+
+def serve_fetched(key, value, failed):
+    """`value` if the fetch succeeded, else the key's last good payload (noted in STALE_SOURCES)"""
+    if value != failed:
+        STALE_SOURCES.pop(key, None)
+        return value
+    fetched_at, payload = last_good(key)
+    if payload is None:
+        return value
+    STALE_SOURCES[key] = fetched_at
+    return payload
+
+def source_age(source, *args):
+    """Seconds since the source was last fetched, or None if never fetched successfully"""
+    fetched_at = SOURCE_FETCHED_AT.get((source, LOCATION_NAME) + args)
+    return None if fetched_at is None else time.time() - fetched_at
+
+@bounded_cache(ttl=900, max_entries=4, max_bytes=2 * 1024 * 1024)
+def fetch_nws_alerts():
+    """Alerts for Webster, matched locally after pulling the area feed (alert_index)"""
+    try:
+        refresh_alert_index()
+        features = alert_index.alerts_for(LOCATION_NAME)
+        record_fetch('alerts', payload=features)
+        return features
+    except Exception as e:
+        logger.warning("NWS alerts unavailable: %s", e)
+        return None
+
+def get_nws_alerts():
+    """Active alerts, the last good list while NWS is failing, or [] if there never was one"""
+    features = fetch_nws_alerts()
+    if features is None:
+        fetch_nws_alerts.clear()  # don't pin a failed fetch for the whole TTL
+    return serve_fetched('alerts', features, None) or []
+
+@bounded_cache(ttl=3600, max_entries=8, max_bytes=1024 * 1024)
+def fetch_historical_snow(days_back=7):
+    """Get observed snowfall from past days using Open-Meteo archive"""
+    try:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days_back)
+        
+        url = "https://archive-api.open-meteo.com/v1/archive"
+        params = {
+            "latitude": LAT,
+            "longitude": LON,
+            "start_date": start_date.strftime('%Y-%m-%d'),
+            "end_date": end_date.strftime('%Y-%m-%d'),
+            "daily": ["snowfall_sum", "temperature_2m_max", "temperature_2m_min", "precipitation_sum"],
+            "temperature_unit": "fahrenheit",
+            "precipitation_unit": "inch",
+            "timezone": "America/New_York"
+        }
+        
+        response = fetch_json('open-meteo', url, params=params)
+        daily = response.get('daily', None)
+        record_fetch('history', days_back, payload=daily)
+        return daily
+    except Exception as e:
+        logger.warning("Historical data unavailable: %s", e)
+        return None
+
+def get_historical_snow(days_back=7):
+    """Observed daily history, or the last good copy while the archive API is failing"""
+    daily = fetch_historical_snow(days_back)
+    if daily is None:
+        fetch_historical_snow.clear(days_back)
+    return serve_fetched(archive_key('history', days_back), daily, None)
+
+@bounded_cache(ttl=900, max_entries=4, max_bytes=256 * 1024)
+def fetch_current_conditions():
+    """Get current real-time conditions"""
+    try:
+        url = "https://api.open-meteo.com/v1/forecast"
+        params = {
+            "latitude": LAT,
+            "longitude": LON,
+            "current": ["temperature_2m", "precipitation", "snowfall", "weather_code", "wind_speed_10m"],
+            "temperature_unit": "fahrenheit",
+            "precipitation_unit": "inch",
+            "wind_speed_unit": "mph",
+            "timezone": "America/New_York"
+        }
+        
+        response = fetch_json('open-meteo', url, params=params)
+        current = response.get('current', None)
+        record_fetch('current', payload=current)
+        return current
+    except Exception as e:
+        logger.warning("Current conditions unavailable: %s", e)
+        return None
+
+def get_current_conditions():
+    """Current conditions, or the last good reading while the upstream is failing"""
+    current = fetch_current_conditions()
+    if current is None:
+        fetch_current_conditions.clear()
+    return serve_fetched('current', current, None)
+
+@bounded_cache(ttl=MODEL_RUN_POLL, max_entries=8, max_bytes=64 * 1024)
+def get_model_run(model):
+    """Latest available run of a model: {'run', 'available', 'source'} as UTC ISO strings.
+
+    Polls Open-Meteo's per-model metadata; falls back to the publication schedule.
+    """
+    schedule = MODEL_RUNS[model]
+    try:
+        url = f"https://api.open-meteo.com/data/{schedule['meta_model']}/static/meta.json"
+        meta = fetch_json('open-meteo', url)
+        run = pd.Timestamp(meta['last_run_initialisation_time'], unit='s', tz='UTC')
+        available = pd.Timestamp(meta['last_run_availability_time'], unit='s', tz='UTC')
+        return {'run': run.isoformat(), 'available': available.isoformat(), 'source': 'metadata'}
+    except Exception:
+        now = pd.Timestamp.now(tz='UTC')
+        ready = now - pd.Timedelta(hours=schedule['delay_hours'])
+        cycle = max(h for h in schedule['cycles'] if h <= ready.hour)
+        run = ready.normalize() + pd.Timedelta(hours=cycle)
+        available = run + pd.Timedelta(hours=schedule['delay_hours'])
+        return {'run': run.isoformat(), 'available': available.isoformat(), 'source': 'schedule'}
+
+def model_run_label(run_info):
+    """e.g. '12Z Mon 10/19 (available 4:05 PM ET)'; a bare run timestamp gives just '12Z Mon 10/19'"""
+    if not run_info:
+        return "unknown"
+    if isinstance(run_info, str):
+        return pd.Timestamp(run_info).strftime('%HZ %a %m/%d')
+    run = pd.Timestamp(run_info['run'])
+    available = pd.Timestamp(run_info['available']).tz_convert('US/Eastern')
+    estimated = ", estimated" if run_info.get('source') == 'schedule' else ""
+    return f"{run.strftime('%HZ %a %m/%d')} (available {available.strftime('%I:%M %p').lstrip('0')} ET{estimated})"
+
+def tag_model_run(payload, model_run):
+    """Stamp a daily/hourly payload with the model run it came from"""
+    if payload is not None:
+        payload['model_run'] = model_run
+    return payload
+
+def request_model_fields(model, hourly=(), daily=()):
+    """Fetch just the given hourly/daily variables of a model as (daily, hourly), terrain corrected.
+
+    Sections sharing a forecast range go in one request; an empty section is not requested.
+    """
+    spec = MODEL_FETCH[model]
+    base = {
+        "latitude": LAT,
+        "longitude": LON,
+        "timezone": "America/New_York",
+        "temperature_unit": "fahrenheit",
+        "precipitation_unit": "inch",
+        "wind_speed_unit": "mph"
+    }
+    wanted = {'daily': list(daily), 'hourly': list(hourly)}
+    if wanted['daily'] and wanted['hourly'] and spec['daily_range'] == spec['hourly_range']:
+        calls = [{**base, **spec['daily_range'], **wanted}]
+    else:
+        calls = [{**base, **spec[f'{section}_range'], section: fields} for section, fields in wanted.items() if fields]
+    
+    result = {'daily': None, 'hourly': None}
+    for params in calls:
+        response = fetch_json('open-meteo', spec['url'], params=params)
+        for section in result:
+            if section in params:
+                result[section] = response.get(section, None)
+    
+    # Apply terrain correction to snow amounts
+    for section, field in (('hourly', 'snowfall'), ('daily', 'snowfall_sum')):
+        if result[section] and field in result[section]:
+            result[section][field] = [s * TERRAIN_MULTIPLIER for s in result[section][field]]
+    
+    return result['daily'], result['hourly']
+
+def merge_missing_fields(model, fetcher, model_run, payload):
+    """Fetch the fields newly activated views need and merge them into the cached run's record"""
+    daily_data, hourly_data = payload
+    missing_daily = missing_fields(model, 'daily', daily_data)
+    missing_hourly = missing_fields(model, 'hourly', hourly_data)
+    attempt = (model, model_run, tuple(missing_daily), tuple(missing_hourly))
+    if not (missing_daily or missing_hourly) or attempt in MERGE_ATTEMPTS:
+        return payload
+    MERGE_ATTEMPTS.add(attempt)  # fields upstream can't serve are asked for once per run
+    try:
+        extra_daily, extra_hourly = request_model_fields(model, missing_hourly, missing_daily)
+    except Exception as e:
+        logger.warning("Fetching extra %s fields failed: %s", model, e)
+        return payload
+    
+    def merge(record, extra):
+        if not extra:
+            return record
+        if record is None:
+            return tag_model_run(extra, model_run)
+        return {**record, **{k: v for k, v in extra.items() if k not in record}}
+    
+    payload = (merge(daily_data, extra_daily), merge(hourly_data, extra_hourly))
+    fetcher.put(payload, model_run)
+    record_fetch(model, payload=payload)
+    return payload
+
+# Model payloads are keyed by run, so they refetch only when a newer run lands;
+# the TTL just bounds how long a superseded run stays in memory.
+@bounded_cache(ttl=6 * 3600, max_entries=2, max_bytes=8 * 1024 * 1024)
+def fetch_euro_snow_ice(model_run):
+    """Get the ECMWF fields the active views need, terrain corrected, for one model run"""
+    try:
+        daily_data, hourly_data = request_model_fields(
+            'ecmwf', requested_fields('ecmwf', 'hourly'), requested_fields('ecmwf', 'daily'))
+        payload = (tag_model_run(daily_data, model_run), tag_model_run(hourly_data, model_run))
+        record_fetch('ecmwf', payload=payload)
+        return payload
+    except Exception as e:
+        logger.warning("ECMWF forecast unavailable: %s", e)
+        return None, None
+
+def get_euro_snow_ice():
+    """ECMWF forecast for the latest available run, or the last good one while fetches fail"""
+    model_run = get_model_run('ecmwf')['run']
+    payload = fetch_euro_snow_ice(model_run)
+    if payload == (None, None):
+        fetch_euro_snow_ice.clear(model_run)  # don't pin a failed fetch for the whole run
+        return tuple(serve_fetched('ecmwf', payload, (None, None)))
+    STALE_SOURCES.pop('ecmwf', None)
+    return merge_missing_fields('ecmwf', fetch_euro_snow_ice, model_run, payload)
+
+@bounded_cache(ttl=6 * 3600, max_entries=2, max_bytes=4 * 1024 * 1024)
+def fetch_gfs_forecast(model_run):
+    """Get the GFS fields the active views need (16 days, terrain corrected) for one model run"""
+    try:
+        daily_data, hourly_data = request_model_fields(
+            'gfs', requested_fields('gfs', 'hourly'), requested_fields('gfs', 'daily'))
+        payload = (tag_model_run(daily_data, model_run), tag_model_run(hourly_data, model_run))
+        record_fetch('gfs', payload=payload)
+        return payload
+    except Exception as e:
+        logger.warning("GFS forecast unavailable: %s", e)
+        return None, None
+
+def get_gfs_forecast():
+    """GFS forecast for the latest available run, or the last good one while fetches fail"""
+    model_run = get_model_run('gfs')['run']
+    payload = fetch_gfs_forecast(model_run)
+    if payload == (None, None):
+        fetch_gfs_forecast.clear(model_run)  # don't pin a failed fetch for the whole run
+        return tuple(serve_fetched('gfs', payload, (None, None)))
+    STALE_SOURCES.pop('gfs', None)
+    return merge_missing_fields('gfs', fetch_gfs_forecast, model_run, payload)
+
+def freezing_rain_rate(temp, precip, snow, terrain_multiplier=TERRAIN_MULTIPLIER, ptype=None):
+    """Liquid (non-snow) precip in inches per hour falling below freezing, 0 otherwise.
+
+    Works on scalars or arrays; `snow` is divided by terrain_multiplier to undo the
+    terrain correction (pass 1 for uncorrected observations). With a precip type per
+    hour from the vertical profile (precip_type), freezing rain is all the precip of
+    the hours typed FREEZING_RAIN; hours typed UNKNOWN keep the 2 m rule.
+    """
+    temp = np.asarray(temp, dtype=float)
+    precip = np.asarray(precip, dtype=float)
+    non_snow_precip = precip - np.asarray(snow, dtype=float) / terrain_multiplier
+    freezing = (temp < 32) & (precip > 0) & (non_snow_precip > 0)
+    rate = np.where(freezing, non_snow_precip, 0.0)
+    if ptype is None:
+        return rate
+    ptype = np.asarray(ptype)
+    return np.where(ptype == UNKNOWN, rate, np.where((ptype == FREEZING_RAIN) & (precip > 0), precip, 0.0))
+
+def hourly_ice_potential(temp, precip, snow, terrain_multiplier=TERRAIN_MULTIPLIER, ptype=None):
+    """Ice accretion (inches) per hour from liquid precip falling below freezing (see freezing_rain_rate)"""
+    temp = np.asarray(temp, dtype=float)
+    ratio = np.select([temp <= 20, temp <= 28], [0.9, 0.85], default=0.8)
+    return freezing_rain_rate(temp, precip, snow, terrain_multiplier, ptype) * ratio
+
+def ice_risk_level(ice_accum):
+    """Ice risk label ('None', 'Low', 'Moderate', 'High') for ice accumulations (inches), elementwise"""
+    ice_accum = np.asarray(ice_accum, dtype=float)
+    return np.select([ice_accum >= 0.25, ice_accum >= 0.10, ice_accum > 0], ['High', 'Moderate', 'Low'], default='None')
+
+def calculate_ice_accumulation(hourly_data, source=None):
+    """Calculate ice accumulation from hourly data (source as for hourly_precip_type)"""
+    if not hourly_data:
+        return {}
+    
+    # Precip type from the pressure-level profile when the payload has it
+    ptype = hourly_precip_type(hourly_data, source)
+    precip = np.asarray(hourly_data['precipitation'], dtype=float)
+    df = pd.DataFrame({
+        'day': pd.to_datetime(hourly_data['time']).strftime('%Y-%m-%d'),
+        'temp': hourly_data['temperature_2m'],
+        'ice': hourly_ice_potential(hourly_data['temperature_2m'], precip, hourly_data['snowfall'], ptype=ptype),
+        'sleet': (ptype == SLEET) & (precip > 0) if ptype is not None else False
+    })
+    by_day = df.groupby('day', sort=False).agg(
+        ice_accum=('ice', 'sum'),
+        freezing_rain_hours=('ice', lambda x: int((x > 0).sum())),
+        sleet_hours=('sleet', lambda x: int(x.sum())),
+        min_temp=('temp', 'min'),
+        max_temp=('temp', 'max')
+    )
+    
+    # Determine ice risk level
+    by_day['ice_risk'] = ice_risk_level(by_day['ice_accum'])
+    
+    return by_day.to_dict(orient='index')
+
+def get_weather_description(code):
+    """Convert weather code to description"""
+    return WEATHER_CODES.get(code, "Unknown")
+
+def weather_descriptions(codes):
+    """Vectorized get_weather_description for a column of weather codes"""
+    return pd.Series(codes).map(WEATHER_CODES).fillna("Unknown")
+
+def snow_category(snow, light_threshold=0.1):
+    """Snow intensity labels for a column of snowfall amounts (inches)"""
+    return np.select(
+        [snow >= 3.0, snow >= 1.0, snow > light_threshold],
+        ["🔴 Heavy", "🟡 Moderate", "🔵 Light"],
+        default="⚪ None"
+    )
+
+def wind_direction_text(degrees):
+    """16-point compass labels for a column of wind directions"""
+    return WIND_DIRECTIONS[np.round(np.asarray(degrees, dtype=float) / 22.5).astype(int) % 16]
+
+def hourly_frame(hourly_data):
+    """Hourly payload as a numeric DataFrame with a US/Eastern 'time' column.
+
+    Open-Meteo times are naive America/New_York wall clock, so they are localized,
+    not parsed as UTC; hours made ambiguous or skipped by DST are dropped.
+    Columns may be lists or (archived, arrays=True) numpy arrays.
+    """
+    df = pd.DataFrame({k: v for k, v in hourly_data.items() if isinstance(v, (list, np.ndarray))})
+    df['time'] = pd.to_datetime(df['time']).dt.tz_localize('US/Eastern', ambiguous='NaT', nonexistent='NaT')
+    return df.dropna(subset=['time'])
+
+def get_travel_status(euro_daily, ice_data, today_key):
+    """Travel recommendation for today from ECMWF daily snow and ice accumulation"""
+    ice_risk = ice_data.get(today_key, {}).get('ice_risk', 'None')
+    ice_accum = ice_data.get(today_key, {}).get('ice_accum', 0)
+    today_snow = euro_daily['snowfall_sum'][0] if len(euro_daily['snowfall_sum']) > 0 else 0
+    today_low = euro_daily['temperature_2m_min'][0] if len(euro_daily['temperature_2m_min']) > 0 else 40
+    
+    if ice_risk == 'High' or ice_accum >= 0.25 or today_snow >= 3.0:
+        status = "🔴 AVOID TRAVEL"
+        desc = "Hazardous conditions expected."
+        css = "alert-red"
+    elif ice_risk == 'Moderate' or ice_accum >= 0.10 or today_snow >= 1.0 or today_low <= 28:
+        status = "🟡 CAUTION ADVISED"
+        desc = "Difficult conditions possible."
+        css = "alert-orange"
+    elif ice_risk == 'Low' or today_low <= 32:
+        status = "🔵 USE CAUTION"
+        desc = "Watch for icy spots."
+        css = "alert-ice"
+    else:
+        status = "✅ NORMAL CONDITIONS"
+        desc = "No significant hazards."
+        css = "alert-green"
+    
+    return {
+        'status': status,
+        'description': desc,
+        'css': css,
+        'ice_risk': ice_risk,
+        'ice_accum': ice_accum,
+        'snow': today_snow,
+        'low_temp': today_low
+    }
+
+def get_products():
+    """Current products shared by the JSON API and the static snapshot renderer"""
+    activate(*PRODUCT_VIEWS)
+    alerts = get_nws_alerts()
+    current = get_current_conditions()
+    euro_daily, euro_hourly = get_euro_snow_ice()
+    ice_data = calculate_ice_accumulation(euro_hourly, 'ecmwf') if euro_hourly else {}
+    
+    today_key = pd.Timestamp.now(tz='US/Eastern').strftime('%Y-%m-%d')
+    travel = get_travel_status(euro_daily, ice_data, today_key) if euro_daily and ice_data else None
+    
+    alert_list = []
+    for alert in alerts:
+        props = alert.get('properties', {})
+        alert_list.append({
+            'id': props.get('id'),
+            'event': props.get('event'),
+            'headline': props.get('headline'),
+            'severity': props.get('severity'),
+            'urgency': props.get('urgency'),
+            'onset': props.get('onset'),
+            'expires': props.get('expires'),
+            'description': props.get('description'),
+            'instruction': props.get('instruction')
+        })
+    
+    return {
+        'current': current,
+        'forecast/daily': euro_daily,
+        'forecast/hourly': euro_hourly,
+        'ice': ice_data,
+        'travel': travel,
+        'alerts': alert_list
+    }